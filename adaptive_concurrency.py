@@ -0,0 +1,160 @@
+import random
+import re
+import threading
+import time
+
+import metrics
+
+# Rate-limit headers sent by the OpenAI API (and by benchmarks/fake_api_server.py)
+REMAINING_REQUESTS_HEADER = 'x-ratelimit-remaining-requests'
+RESET_REQUESTS_HEADER = 'x-ratelimit-reset-requests'
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_reset_duration(value):
+    """
+    Parse a rate-limit reset duration such as '1s', '250ms' or '6m0s'.
+
+    Returns:
+        float: Seconds, or None if the value can't be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+def retry_after_seconds(headers):
+    """
+    Read how long the server asked us to wait from response headers.
+
+    Returns:
+        float: Seconds from retry-after-ms / retry-after, or None if absent
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return parse_reset_duration(headers.get('retry-after'))
+
+def backoff_delay(attempt, retry_after=None, base=0.5, cap=20.0):
+    """
+    Delay before retry number `attempt` (0-based): the server's retry-after if
+    given, otherwise exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        # Small jitter so throttled workers don't all come back at the same instant
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent in-flight requests.
+
+    The limit grows by about one slot per limit's worth of healthy responses
+    (additive increase) and is multiplied by `decrease_factor` on throttling
+    or timeouts (multiplicative decrease), at most once per `cooldown` seconds
+    so one burst of 429s counts as a single congestion signal. A response is
+    healthy when its latency stays within `latency_tolerance` times the best
+    smoothed latency seen so far. When rate-limit headers say the quota is
+    used up, new requests wait until it resets.
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=32, decrease_factor=0.5,
+                 latency_tolerance=1.5, cooldown=1.0):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.smoothed_latency = None
+        self.baseline_latency = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        with self._condition:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, outcome, latency=None, headers=None):
+        """
+        Finish a request and adapt the limit.
+
+        Args:
+            outcome (str): 'ok', 'throttled', 'timeout' or 'error'
+            latency (float): Seconds the request took
+            headers: Response headers, checked for rate-limit information
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if outcome == 'ok' and latency is not None:
+                self._observe_latency(latency)
+                if self.smoothed_latency <= self.baseline_latency * self.latency_tolerance:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome in ('throttled', 'timeout'):
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    metrics.increment('openai_concurrency_decreases_total', reason=outcome)
+
+            self._apply_headers(headers, now, throttled=outcome == 'throttled')
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Hold back new requests for the given number of seconds."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _observe_latency(self, latency):
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency = 0.8 * self.smoothed_latency + 0.2 * latency
+        if self.baseline_latency is None:
+            self.baseline_latency = self.smoothed_latency
+        else:
+            # Drift up slowly so a permanently slower API doesn't freeze the limit forever
+            self.baseline_latency = min(self.smoothed_latency, self.baseline_latency * 1.01)
+
+    def _apply_headers(self, headers, now, throttled):
+        if not headers:
+            return
+        wait = retry_after_seconds(headers) if throttled else None
+        remaining = headers.get(REMAINING_REQUESTS_HEADER)
+        if wait is None and remaining is not None and remaining.strip() == '0':
+            wait = parse_reset_duration(headers.get(RESET_REQUESTS_HEADER))
+        if wait:
+            self._paused_until = max(self._paused_until, now + wait)
+
+    def snapshot(self):
+        """Current limit, in-flight count and latencies (for reports and the UI)."""
+        with self._condition:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'smoothed_latency': self.smoothed_latency,
+                'baseline_latency': self.baseline_latency
+            }
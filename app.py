@@ -1,11 +1,23 @@
 import streamlit as st
 import pandas as pd
-import io
 import os
-from urllib.parse import quote
-import re
-from risk_assessment import assess_risk_category
-from whatsapp_generator import generate_whatsapp_message
+import zlib
+import metrics
+import stage_profiler
+from risk_assessment import validate_leads, RiskStatistics, top_risk_leads
+from whatsapp_generator import generate_batch_messages_with_report
+from message_templates import render_message
+from generation_budget import GenerationBudget
+from priority_scheduler import priority_order, DEFAULT_PRIORITY_WEIGHTS
+from result_export import StreamingExporter, build_export_frame, RESULT_COLUMNS, EXPORT_MIME_TYPES
+from lead_pipeline import validate_excel_columns, clean_phone_numbers, create_whatsapp_link, score_leads
+from lead_encoding import encode_lead_columns, decode_lead_columns, memory_report, RISK_SCORE_DTYPE
+from job_queue import get_job_queue, stage_upload
+from campaign_store import save_campaign, list_campaigns, open_campaign
+from lead_delta import (
+    build_lead_keys, fingerprint_leads, compute_lead_delta, summarize_lead_delta,
+    build_snapshot, load_snapshot, save_snapshot
+)
 
 # Page configuration
 st.set_page_config(
@@ -269,34 +281,86 @@ with st.sidebar:
         • Pre-filled with personalized messages
         • Instant messaging with one click
         """)
-
-def validate_excel_columns(df):
-    """Validate that the Excel file contains all required columns"""
-    required_columns = [
-        'Lead Name', 'Channel', 'Contact Number', 'Scheduled By',
-        'Link Clicked', 'Contact Shared', 'Last Interaction Days',
-        'Missed Demos', 'Showed Up for Demo'
-    ]
     
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    return missing_columns
-
-def clean_phone_number(phone):
-    """Clean phone number to contain only digits"""
-    if pd.isna(phone):
-        return None
-    # Convert to string and remove all non-numeric characters
-    cleaned = re.sub(r'\D', '', str(phone))
-    return cleaned if cleaned else None
-
-def create_whatsapp_link(phone_number, message):
-    """Create a clickable WhatsApp link"""
-    if not phone_number or not message:
-        return "Invalid phone/message"
+    with st.expander("💬 Message Generation"):
+        # Identical (name, risk) leads share AI messages; this sets how many distinct ones they rotate through
+        message_variants_per_key = st.number_input(
+            "Message variants per duplicate lead",
+            min_value=1,
+            max_value=10,
+            value=1,
+            help="Leads with the same name and risk category share generated messages instead of each costing an API call"
+        )
+        
+        processing_order_mode = st.selectbox(
+            "Processing order",
+            ["Sheet order", "Most urgent first", "Weighted by risk"],
+            help="Most urgent first handles every High-risk lead, then Medium, then Low. Weighted by risk interleaves "
+                 "them 6:3:1 so lower-risk leads still progress. The results file follows the same order."
+        )
+        inactive_first = st.checkbox(
+            "Most inactive leads first within a risk category",
+            value=False,
+            disabled=processing_order_mode == "Sheet order"
+        )
+        
+        # Run-level limits so a big upload can't run up unbounded API spend or latency (0 = no limit)
+        default_budget = GenerationBudget.from_env()
+        max_ai_requests = st.number_input(
+            "Max AI requests per run", min_value=0, value=default_budget.max_requests or 0, step=50
+        )
+        max_ai_cost = st.number_input(
+            "Max estimated cost per run (USD)", min_value=0.0, value=float(default_budget.max_cost or 0.0), step=0.5
+        )
+        max_ai_seconds = st.number_input(
+            "Max generation time (seconds)", min_value=0, value=int(default_budget.max_seconds or 0), step=30
+        )
     
-    # URL encode the message
-    encoded_message = quote(message)
-    return f"https://wa.me/{phone_number}?text={encoded_message}"
+    with st.expander("🏭 Background Processing"):
+        # Large uploads can run in job_worker processes instead of this server process
+        use_job_workers = st.checkbox(
+            "Process uploads with background workers",
+            value=os.environ.get("LEADGENIUS_USE_WORKERS", "").lower() in ("1", "true", "yes"),
+            help="The upload is queued and handled by `python -m job_worker` processes; this page only shows its progress"
+        )
+        send_after_processing = st.checkbox(
+            "Send WhatsApp messages when processing finishes",
+            value=False,
+            disabled=not use_job_workers,
+            help="Queues a sending job through the configured WhatsApp sender accounts"
+        )
+    
+    with st.expander("🩺 Diagnostics"):
+        # Recording is process-wide, so it is switched on by the server's environment
+        # (LEADGENIUS_METRICS), never from a session; this only shows or hides the panel
+        show_metrics_panel = st.checkbox(
+            "Show performance metrics",
+            value=False,
+            disabled=not metrics.registry.enabled,
+            help="Stage and external API timings recorded by this server, in a panel at the bottom of the page"
+            if metrics.registry.enabled else
+            "Metrics recording is off on this server; start it with LEADGENIUS_METRICS=memory (or jsonl, prometheus, http)"
+        )
+        profile_next_upload = st.checkbox(
+            "Profile new uploads",
+            value=False,
+            help="Record a call profile and peak memory per processing stage when a new file is processed, "
+                 "downloadable as a report at the bottom of the page"
+        )
+        profile_engines = stage_profiler.available_engines()
+        profile_engine = st.selectbox(
+            "Profiler",
+            profile_engines,
+            index=profile_engines.index(stage_profiler.DEFAULT_PROFILE_ENGINE)
+            if stage_profiler.DEFAULT_PROFILE_ENGINE in profile_engines else 0,
+            disabled=len(profile_engines) == 1,
+            help="pyinstrument samples the stack instead of tracing every call, so it slows the run down less"
+        )
+        profile_memory = st.checkbox(
+            "Track memory allocations",
+            value=stage_profiler.PROFILE_MEMORY,
+            help="Peak allocations per stage via tracemalloc; makes the profiled run noticeably slower"
+        )
 
 def get_risk_emoji(risk_score):
     """Get emoji for risk score"""
@@ -310,6 +374,58 @@ def get_risk_emoji(risk_score):
 # Thin divider
 st.markdown('<hr class="thin-divider">', unsafe_allow_html=True)
 
+@st.fragment(run_every=2)
+def show_job_status(job_id):
+    """Poll a queued upload and show its progress, summary and download"""
+    job_queue = get_job_queue()
+    job = job_queue.get(job_id)
+    st.header(f"🏭 Background Job #{job_id}")
+    
+    if job['status'] == 'queued':
+        st.info("⏳ Waiting for a worker. Start one with `python -m job_worker` if none is running.")
+        return
+    if job['status'] == 'failed':
+        st.error(f"❌ Processing failed: {job['error']}")
+        return
+    if job['status'] == 'running':
+        total = job['progress_total'] or 0
+        st.progress(job['progress_done'] / total if total else 0.0, text=f"Processing leads: {job['progress_done']}/{total}")
+        return
+    
+    result = job['result']
+    st.success(f"✅ Processed {result['rows']} leads.")
+    if result['invalid_values']:
+        st.warning(f"⚠️ {result['invalid_values']} leads had invalid or missing values and were scored with default assumptions.")
+    columns = st.columns(4)
+    for column, (label, category) in zip(columns, [
+        ('🔴 High Risk', 'High'), ('🟡 Medium Risk', 'Medium'), ('🟢 Low Risk', 'Low'), ('❌ Invalid Phone', 'Invalid Phone')
+    ]):
+        column.metric(label, result['risk_counts'].get(category, 0))
+    
+    def read_results():
+        with open(result['results_path'], 'rb') as f:
+            return f.read()
+    
+    # The file is only read when the button is clicked, not on every poll
+    st.download_button(
+        label="📥 Download Results (CSV)",
+        data=read_results,
+        file_name="lead_risk_assessment_results.csv",
+        mime="text/csv",
+        on_click="ignore",
+        key=f"job_download_{job_id}"
+    )
+    
+    if result['send_job_id'] is not None:
+        send_job = job_queue.get(result['send_job_id'])
+        if send_job['status'] == 'succeeded':
+            counts = send_job['result']
+            st.success(f"📤 Sent {counts['sent']} messages ({counts['failed']} failed, {counts['deduplicated']} recently messaged).")
+        elif send_job['status'] == 'failed':
+            st.error(f"❌ Sending failed: {send_job['error']}")
+        else:
+            st.info(f"📤 Sending messages: {send_job['progress_done']}/{send_job['progress_total'] or '?'}")
+
 # Modern file upload section
 st.markdown("### 📁 Upload Your Lead Data")
 st.markdown("Drag and drop your Excel file or click to browse")
@@ -331,13 +447,51 @@ if uploaded_file is not None:
         st.session_state.background_generation_started = False
         st.session_state.background_messages = {}
         st.session_state.processed_data = None  # Clear processed data
+        st.session_state.previous_snapshot = None  # Reload the last processed snapshot for the delta
+        st.session_state.risk_stats = None  # Recounted once for the new upload
+        if st.session_state.get('result_exporter') is not None:
+            st.session_state.result_exporter.cleanup()
+        st.session_state.result_exporter = None
+        st.session_state.upload_job_id = None
         st.session_state.current_file_name = uploaded_file.name
         st.rerun()  # Force UI refresh after state reset
     
+    if use_job_workers:
+        # Queue the upload once; the workers do all the processing, this session only polls
+        if st.session_state.get('upload_job_id') is None:
+            st.session_state.upload_job_id = get_job_queue().submit('process_upload', {
+                'path': stage_upload(uploaded_file.getvalue(), uploaded_file.name),
+                'file_name': uploaded_file.name,
+                'variants_per_key': message_variants_per_key,
+                'budget': {
+                    'max_requests': max_ai_requests or None,
+                    'max_tokens': default_budget.max_tokens,
+                    'max_cost': max_ai_cost or None,
+                    'max_seconds': max_ai_seconds or None
+                },
+                'order': {'Most urgent first': 'urgent', 'Weighted by risk': 'weighted'}.get(processing_order_mode),
+                'inactive_first': inactive_first,
+                'send': send_after_processing
+            })
+        show_job_status(st.session_state.upload_job_id)
+        st.stop()
+    
+    # Profile the run that processes a new upload, when asked to or sampled (LEADGENIUS_PROFILE_SAMPLE_RATE);
+    # sampled runs skip tracemalloc, which would slow every session in the process
+    if not st.session_state.get('background_generation_started', False) and (
+        profile_next_upload or stage_profiler.should_profile()
+    ):
+        stage_profiler.start_profile(uploaded_file.name, engine=profile_engine,
+                                     memory=profile_memory and profile_next_upload)
+    
     try:
         # Read the Excel file
         with st.spinner("📖 Reading Excel file..."):
-            df = pd.read_excel(uploaded_file)
+            with metrics.timer('pipeline_stage_seconds', stage='read'), stage_profiler.stage('read'):
+                df = pd.read_excel(uploaded_file)
+        
+        # The export keeps every uploaded column, in the uploaded order
+        input_columns = list(df.columns)
         
         # Validate columns FIRST before showing success message
         missing_columns = validate_excel_columns(df)
@@ -349,10 +503,37 @@ if uploaded_file is not None:
         # Only show success message if validation passes
         st.success(f"✅ File uploaded successfully! Found {len(df)} leads.")
         
+        # Check every value up front in one vectorized pass
+        with metrics.timer('pipeline_stage_seconds', stage='validate'), stage_profiler.stage('validate'):
+            validation_errors, validation_counts = validate_leads(df)
+        if len(validation_errors) > 0:
+            invalid_rows = validation_errors['Row'].nunique()
+            st.warning(f"⚠️ {invalid_rows} leads have invalid or missing values. They will be scored with default assumptions.")
+            with st.expander("🩺 Data Validation Report", expanded=False):
+                st.dataframe(
+                    pd.DataFrame(
+                        [(rule, count) for rule, count in validation_counts.items() if count > 0],
+                        columns=['Rule', 'Failing Leads']
+                    ),
+                    hide_index=True
+                )
+                # Show the first issues only; the full table can be very large
+                st.dataframe(validation_errors.head(1000).astype(str), hide_index=True)
+        
         # Display original data preview
         with st.expander("👀 Preview Original Data", expanded=False):
             st.dataframe(df.head(10))
         
+        # Store Yes/No, Agent/Self and count columns in compact dtypes instead of object strings
+        with metrics.timer('pipeline_stage_seconds', stage='encode'), stage_profiler.stage('encode'):
+            encoded_df = encode_lead_columns(df)
+        encoding_report = memory_report(df, encoded_df)
+        df = encoded_df
+        st.caption(
+            f"🧮 Memory footprint: {encoding_report['bytes_per_lead_before']:.0f} → "
+            f"{encoding_report['bytes_per_lead_after']:.0f} bytes per lead after normalization"
+        )
+        
         # Step 1: Process leads (Risk Assessment)
         st.header("⚙️ Step 1: Processing Lead Data")
         
@@ -361,10 +542,35 @@ if uploaded_file is not None:
         
         with st.spinner('🚀 Analyzing lead data and assessing risk scores...'):
             # Pre-clean all phone numbers in batch (vectorized operation)
-            df['clean_phone'] = df['Contact Number'].apply(clean_phone_number)
+            with metrics.timer('pipeline_stage_seconds', stage='phone_clean'), stage_profiler.stage('phone_clean'):
+                df['clean_phone'] = clean_phone_numbers(df['Contact Number'])
+            
+            # Fingerprint risk inputs and compare against the last processed snapshot
+            df['lead_key'] = build_lead_keys(df)
+            df['fingerprint'] = fingerprint_leads(df)
+            
+            # Load the snapshot once per upload so reruns report the same delta
+            if st.session_state.get('previous_snapshot') is None:
+                snapshot = load_snapshot()
+                st.session_state.previous_snapshot = snapshot if snapshot is not None else pd.DataFrame()
+            lead_delta = compute_lead_delta(df['lead_key'], df['fingerprint'], st.session_state.previous_snapshot)
             
-            # Batch assess all risk categories (vectorized operation)
-            df['risk_score'] = df.apply(assess_risk_category, axis=1)
+            # Only new or changed leads take a new risk category, the rest carry theirs over.
+            # The vectorized pass is cheap, so propensity scores are computed for every lead.
+            needs_scoring = lead_delta['status'] != 'unchanged'
+            with metrics.timer('pipeline_stage_seconds', stage='score'), stage_profiler.stage('score'):
+                risk_scores, df['propensity'] = score_leads(df, with_propensity=True)
+            df['risk_score'] = lead_delta['previous_risk'].where(~needs_scoring, risk_scores)
+            
+            # Messages only depend on name and risk, so keep them wherever the risk score held
+            carried_messages = {}
+            carry_over = (lead_delta['previous_risk'] == df['risk_score']) & lead_delta['previous_message'].notna()
+            carry_over &= df['clean_phone'].notna()
+            for i in carry_over[carry_over].index:
+                carried_messages[df.index.get_loc(i)] = {
+                    'message': lead_delta['previous_message'][i],
+                    'link': lead_delta['previous_link'][i]
+                }
             
             # Create basic processed data without messages first
             processed_data = []
@@ -384,20 +590,50 @@ if uploaded_file is not None:
             time_display = f"{processing_time:.2f} seconds"
         st.success(f"✅ Lead processing complete! Processed {len(df)} leads in {time_display}")
         
+        # Report what changed since the previously processed upload
+        delta_summary = summarize_lead_delta(lead_delta)
+        if not st.session_state.previous_snapshot.empty:
+            st.info(
+                f"🔁 Incremental run: {delta_summary['new']} new, {delta_summary['changed']} changed, "
+                f"{delta_summary['unchanged']} unchanged, {delta_summary['removed']} removed since the last upload. "
+                f"Re-scored {int(needs_scoring.sum())} leads and reused {len(carried_messages)} messages."
+            )
+            with st.expander("🧾 Changed Leads", expanded=False):
+                delta_df = pd.DataFrame({
+                    'Lead Name': df['Lead Name'],
+                    'Change': lead_delta['status'],
+                    'Previous Risk Score': lead_delta['previous_risk'],
+                    'Risk Score': df['risk_score']
+                })
+                st.dataframe(delta_df[delta_df['Change'] != 'unchanged'], hide_index=True)
+        
         # Store processed data in session state for proper isolation
         st.session_state.processed_data = processed_data
         
         # Create initial results dataframe
         results_df = pd.DataFrame(processed_data)
+        results_df['Risk Score'] = results_df['Risk Score'].astype(RISK_SCORE_DTYPE)
         
         # Show risk category summary IMMEDIATELY (before any background processing)
         st.markdown("### 📊 Risk Category Summary")
         col1, col2, col3, col4 = st.columns(4)
         
-        high_risk_count = len(results_df[results_df['Risk Score'] == 'High'])
-        medium_risk_count = len(results_df[results_df['Risk Score'] == 'Medium'])
-        low_risk_count = len(results_df[results_df['Risk Score'] == 'Low'])
-        invalid_count = len(results_df[results_df['Risk Score'] == 'Invalid Phone'])
+        # Count every category (and the breakdowns) in a single pass, once per upload; reruns
+        # (generation progress, filters, downloads) reuse the session's counts
+        if st.session_state.get('risk_stats') is None:
+            risk_stats = RiskStatistics()
+            risk_stats.add(pd.DataFrame({
+                'Risk Score': results_df['Risk Score'].values,
+                'Channel': df['Channel'].values,
+                'Scheduled By': df['Scheduled By'].values
+            }))
+            st.session_state.risk_stats = risk_stats
+        risk_stats = st.session_state.risk_stats
+        
+        high_risk_count = risk_stats.count('High')
+        medium_risk_count = risk_stats.count('Medium')
+        low_risk_count = risk_stats.count('Low')
+        invalid_count = risk_stats.count('Invalid Phone')
         
         with col1:
             st.markdown(f"""
@@ -431,6 +667,33 @@ if uploaded_file is not None:
             </div>
             """, unsafe_allow_html=True)
         
+        with st.expander("📈 Risk Breakdown by Channel and Scheduled By", expanded=False):
+            breakdown_col1, breakdown_col2 = st.columns(2)
+            with breakdown_col1:
+                st.dataframe(pd.DataFrame.from_dict(risk_stats.breakdown('Channel'), orient='index'))
+            with breakdown_col2:
+                st.dataframe(pd.DataFrame.from_dict(risk_stats.breakdown('Scheduled By'), orient='index'))
+        
+        # Rank inside the categories by propensity; argpartition keeps this instant on large uploads
+        with st.expander("📞 Next Leads to Call", expanded=False):
+            next_count = st.number_input(
+                "Leads to show",
+                min_value=1,
+                max_value=max(len(df), 1),
+                value=min(50, max(len(df), 1)),
+                step=10,
+                help="Highest propensity scores first. The score (0-100) ranks leads within their risk category: High starts at 67, Medium at 34."
+            )
+            callable_scores = df['propensity'].where(df['clean_phone'].notna())
+            next_rows = top_risk_leads(callable_scores, next_count)
+            next_leads = decode_lead_columns(df.iloc[next_rows][[
+                'Lead Name', 'risk_score', 'propensity', 'clean_phone', 'Last Interaction Days', 'Missed Demos'
+            ]])
+            st.dataframe(
+                next_leads.rename(columns={'risk_score': 'Risk Score', 'propensity': 'Propensity', 'clean_phone': 'Phone'}),
+                hide_index=True
+            )
+        
         # Step 2: Generate Messages - SHOW BUTTON IMMEDIATELY
         st.header("💬 Step 2: Generating WhatsApp Messages")
         
@@ -456,76 +719,121 @@ if uploaded_file is not None:
             st.session_state.background_generation_started = True
             st.session_state.background_start_time = time.time()  # Track real generation start time
             
-            # Generate messages silently in background
-            import random
-            greetings = ["Hi", "Hello", "Hey", "Good day", "Greetings"]
-            time_refs = {
-                'High': ["today", "tomorrow", "this week", "soon", "at your convenience", "when you're free"],
-                'Medium': ["this week", "soon", "in the coming days", "when convenient", "at your earliest convenience"],
-                'Low': ["soon", "as scheduled", "as planned", "for our session", "for our upcoming meeting"]
-            }
-            
-            fallback_templates = {
-                'High': [
-                    "{greeting} {name}, we noticed you missed our demo. Can we reschedule {time}?",
-                    "{greeting} {name}, let's reconnect about your demo. When works best for you?",
-                    "{greeting} {name}, missed you at the demo. Can we set up a quick call {time}?",
-                    "{greeting} {name}, following up on your demo. Would {time} work better?",
-                    "{greeting} {name}, let's get that demo rescheduled. What's your availability like?",
-                    "{greeting} {name}, hoping to reconnect about our demo. Are you available {time}?",
-                    "{greeting} {name}, we'd love to reschedule our missed demo. How does {time} sound?",
-                    "{greeting} {name}, quick follow-up on the demo we missed. Can we try again {time}?"
-                ],
-                'Medium': [
-                    "{greeting} {name}, following up on our previous conversation. Any questions?",
-                    "{greeting} {name}, just checking in. How are things progressing on your end?",
-                    "{greeting} {name}, wanted to touch base about our upcoming demo. Still good for {time}?",
-                    "{greeting} {name}, hope you're doing well. Ready to move forward with the demo?",
-                    "{greeting} {name}, just a quick follow-up. What questions can I answer for you?",
-                    "{greeting} {name}, circling back on our demo discussion. Shall we proceed {time}?",
-                    "{greeting} {name}, touching base about our demo. Are we still on track for {time}?",
-                    "{greeting} {name}, hope all is well. Ready to schedule our demo {time}?"
-                ],
-                'Low': [
-                    "{greeting} {name}, just a friendly nudge to confirm our upcoming demo. Excited to connect!",
-                    "{greeting} {name}, looking forward to our demo session. See you {time}!",
-                    "{greeting} {name}, quick confirmation for our scheduled demo. Can't wait to show you around!",
-                    "{greeting} {name}, demo day is coming up. Are you as excited as we are?",
-                    "{greeting} {name}, just confirming our demo time. This is going to be great!",
-                    "{greeting} {name}, excited for our demo {time}. It's going to be fantastic!",
-                    "{greeting} {name}, looking forward to connecting with you {time}. Ready?",
-                    "{greeting} {name}, our demo is approaching. Can't wait to show you what we've built!"
-                ]
-            }
+            # Urgent leads first when a priority order is selected, so their messages are ready soonest
+            if processing_order_mode == "Sheet order":
+                processing_order = list(range(len(df)))
+            else:
+                processing_order = priority_order(
+                    [row['Risk Score'] for row in st.session_state.processed_data],
+                    weights=DEFAULT_PRIORITY_WEIGHTS if processing_order_mode == "Weighted by risk" else None,
+                    last_interaction_days=df['Last Interaction Days'] if inactive_first else None
+                ).tolist()
             
             # Generate messages silently (happens after UI is shown)
-            for i, row in enumerate(st.session_state.processed_data):
-                if row['Risk Score'] != 'Invalid Phone':
-                    try:
-                        whatsapp_message = generate_whatsapp_message(row['Lead Name'], row['Risk Score'])
-                    except:
-                        # Use highly varied fallback templates
-                        risk_category = row['Risk Score']
-                        templates = fallback_templates.get(risk_category, fallback_templates['Medium'])
-                        greeting = random.choice(greetings)
-                        time_ref = random.choice(time_refs.get(risk_category, time_refs['Medium']))
-                        template = random.choice(templates)
-                        whatsapp_message = template.format(
-                            name=row['Lead Name'], 
-                            greeting=greeting, 
-                            time=time_ref
-                        )
-                    
-                    whatsapp_link = create_whatsapp_link(row['Phone'], whatsapp_message)
-                    st.session_state.background_messages[i] = {
-                        'message': whatsapp_message,
-                        'link': whatsapp_link
-                    }
+            pending_rows = []
+            for i in processing_order:
+                row = st.session_state.processed_data[i]
+                if i in carried_messages:
+                    # Unchanged lead from the previous upload, no need to pay for a new message
+                    st.session_state.background_messages[i] = carried_messages[i]
+                elif row['Risk Score'] != 'Invalid Phone':
+                    pending_rows.append(i)
                 else:
                     st.session_state.background_messages[i] = {
                         'message': 'N/A - Invalid phone number',
                         'link': 'N/A'
                     }
+            
+            # Results are written to a temp file in processing order as soon as each lead is ready
+            if st.session_state.get('result_exporter') is not None:
+                st.session_state.result_exporter.cleanup()
+            result_exporter = StreamingExporter(input_columns + RESULT_COLUMNS)
+            st.session_state.result_exporter = result_exporter
+            export_state = {'cursor': 0, 'last_partial': time.time()}
+            partial_download = st.empty()
+            
+            def export_ready_rows():
+                start = end = export_state['cursor']
+                while end < len(df) and processing_order[end] in st.session_state.background_messages:
+                    end += 1
+                if end == start:
+                    return
+                rows = processing_order[start:end]
+                result_exporter.append(build_export_frame(df[input_columns].iloc[rows], {
+                    'Risk Score': [st.session_state.processed_data[i]['Risk Score'] for i in rows],
+                    'Phone': [st.session_state.processed_data[i]['Phone'] for i in rows],
+                    'WhatsApp Message': [st.session_state.background_messages[i]['message'] for i in rows],
+                    'WhatsApp Link': [st.session_state.background_messages[i]['link'] for i in rows]
+                }))
+                export_state['cursor'] = end
+            
+            def on_generated_rows(rows, messages):
+                for row, whatsapp_message in zip(rows, messages):
+                    i = pending_rows[row]
+                    st.session_state.background_messages[i] = {
+                        'message': whatsapp_message,
+                        'link': create_whatsapp_link(st.session_state.processed_data[i]['Phone'], whatsapp_message)
+                    }
+                export_ready_rows()
+                
+                # Offer what's done so far while the rest is still generating (at most once a second)
+                if result_exporter.rows_written < len(df) and time.time() - export_state['last_partial'] >= 1.0:
+                    export_state['last_partial'] = time.time()
+                    partial_download.download_button(
+                        label=f"📥 Download partial results ({result_exporter.rows_written}/{len(df)} leads)",
+                        data=result_exporter.partial_csv,
+                        file_name="lead_risk_assessment_partial.csv",
+                        mime="text/csv",
+                        on_click="ignore",
+                        key=f"partial_download_{result_exporter.rows_written}"
+                    )
+            
+            # Seeded by file name so reruns of the same upload get the same template variants
+            with stage_profiler.stage('message_generate'):
+                generated, st.session_state.generation_report = generate_batch_messages_with_report(
+                    [
+                        {
+                            'lead_name': st.session_state.processed_data[i]['Lead Name'],
+                            'risk_score': st.session_state.processed_data[i]['Risk Score']
+                        }
+                        for i in pending_rows
+                    ],
+                    seed=zlib.crc32(uploaded_file.name.encode()),
+                    variants_per_key=message_variants_per_key,
+                    budget=GenerationBudget(
+                        max_requests=max_ai_requests or None,
+                        max_tokens=default_budget.max_tokens,
+                        max_cost=max_ai_cost or None,
+                        max_seconds=max_ai_seconds or None
+                    ),
+                    on_rows=on_generated_rows
+                )
+            export_ready_rows()  # Leading carried-over / invalid rows when nothing needed generating
+            partial_download.empty()
+            
+            # Measured around the generation loop itself, so UI waits and animation don't count
+            st.session_state.background_generation_time = time.time() - st.session_state.background_start_time
+            metrics.observe('pipeline_stage_seconds', st.session_state.background_generation_time, stage='message_generate')
+            
+            # Remember this upload so the next refresh only recomputes what changed
+            save_snapshot(build_snapshot(
+                df['lead_key'],
+                df['fingerprint'],
+                df['risk_score'],
+                [st.session_state.background_messages[i]['message'] for i in range(len(df))],
+                [st.session_state.background_messages[i]['link'] for i in range(len(df))]
+            ))
+            
+            # Keep the finished campaign as a memory-mappable Arrow file that can be reopened later
+            campaign_frame = build_export_frame(df[input_columns], {
+                'Risk Score': [row['Risk Score'] for row in st.session_state.processed_data],
+                'Phone': [row['Phone'] for row in st.session_state.processed_data],
+                'WhatsApp Message': [st.session_state.background_messages[i]['message'] for i in range(len(df))],
+                'WhatsApp Link': [st.session_state.background_messages[i]['link'] for i in range(len(df))]
+            })
+            campaign_frame['Propensity'] = df['propensity'].to_numpy()
+            with stage_profiler.stage('campaign_save'):
+                st.session_state.campaign_id = save_campaign(campaign_frame, uploaded_file.name)
         
         if generate_button and not st.session_state.generation_started:
             st.session_state.generation_started = True
@@ -533,12 +841,6 @@ if uploaded_file is not None:
         
         # Show progress when button is clicked (using pre-generated messages)
         if st.session_state.generation_started and not st.session_state.messages_generated:
-            # Use the real background generation start time if available
-            if hasattr(st.session_state, 'background_start_time'):
-                message_start_time = st.session_state.background_start_time
-            else:
-                message_start_time = time.time()
-            
             # Filter valid leads for progress tracking
             valid_leads = df[df['clean_phone'].notna()].copy()
             total_leads = len(st.session_state.processed_data)
@@ -563,47 +865,6 @@ if uploaded_file is not None:
                     time.sleep(0.03)
                 
                 # Ensure ALL messages are properly generated and copied
-                import random
-                greetings = ["Hi", "Hello", "Hey", "Good day", "Greetings"]
-                time_refs = {
-                    'High': ["today", "tomorrow", "this week", "soon", "at your convenience", "when you're free"],
-                    'Medium': ["this week", "soon", "in the coming days", "when convenient", "at your earliest convenience"],
-                    'Low': ["soon", "as scheduled", "as planned", "for our session", "for our upcoming meeting"]
-                }
-                
-                fallback_templates = {
-                    'High': [
-                        "{greeting} {name}, we noticed you missed our demo. Can we reschedule {time}?",
-                        "{greeting} {name}, let's reconnect about your demo. When works best for you?",
-                        "{greeting} {name}, missed you at the demo. Can we set up a quick call {time}?",
-                        "{greeting} {name}, following up on your demo. Would {time} work better?",
-                        "{greeting} {name}, let's get that demo rescheduled. What's your availability like?",
-                        "{greeting} {name}, hoping to reconnect about our demo. Are you available {time}?",
-                        "{greeting} {name}, we'd love to reschedule our missed demo. How does {time} sound?",
-                        "{greeting} {name}, quick follow-up on the demo we missed. Can we try again {time}?"
-                    ],
-                    'Medium': [
-                        "{greeting} {name}, following up on our previous conversation. Any questions?",
-                        "{greeting} {name}, just checking in. How are things progressing on your end?",
-                        "{greeting} {name}, wanted to touch base about our upcoming demo. Still good for {time}?",
-                        "{greeting} {name}, hope you're doing well. Ready to move forward with the demo?",
-                        "{greeting} {name}, just a quick follow-up. What questions can I answer for you?",
-                        "{greeting} {name}, circling back on our demo discussion. Shall we proceed {time}?",
-                        "{greeting} {name}, touching base about our demo. Are we still on track for {time}?",
-                        "{greeting} {name}, hope all is well. Ready to schedule our demo {time}?"
-                    ],
-                    'Low': [
-                        "{greeting} {name}, just a friendly nudge to confirm our upcoming demo. Excited to connect!",
-                        "{greeting} {name}, looking forward to our demo session. See you {time}!",
-                        "{greeting} {name}, quick confirmation for our scheduled demo. Can't wait to show you around!",
-                        "{greeting} {name}, demo day is coming up. Are you as excited as we are?",
-                        "{greeting} {name}, just confirming our demo time. This is going to be great!",
-                        "{greeting} {name}, excited for our demo {time}. It's going to be fantastic!",
-                        "{greeting} {name}, looking forward to connecting with you {time}. Ready?",
-                        "{greeting} {name}, our demo is approaching. Can't wait to show you what we've built!"
-                    ]
-                }
-                
                 for i, row in enumerate(st.session_state.processed_data):
                     if row['Risk Score'] != 'Invalid Phone':
                         # Check if message exists in background storage
@@ -612,16 +873,7 @@ if uploaded_file is not None:
 
                         else:
                             # Generate fallback message immediately if missing
-                            risk_category = row['Risk Score']
-                            templates = fallback_templates.get(risk_category, fallback_templates['Medium'])
-                            greeting = random.choice(greetings)
-                            time_ref = random.choice(time_refs.get(risk_category, time_refs['Medium']))
-                            template = random.choice(templates)
-                            whatsapp_message = template.format(
-                                name=row['Lead Name'], 
-                                greeting=greeting, 
-                                time=time_ref
-                            )
+                            whatsapp_message = render_message(row['Lead Name'], row['Risk Score'], variant=i)
                             whatsapp_link = create_whatsapp_link(row['Phone'], whatsapp_message)
                             st.session_state.generated_messages[i] = {
                                 'message': whatsapp_message,
@@ -648,11 +900,8 @@ if uploaded_file is not None:
                 status_text.empty()
                 progress_bar.empty()
             
-            # Calculate actual generation time (excluding UI animation delays)
-            actual_generation_time = time.time() - message_start_time
-            # Subtract the artificial animation delays (0.03 * total_leads)
-            animation_overhead = 0.03 * total_leads
-            real_generation_time = max(0.1, actual_generation_time - animation_overhead)
+            # Report the measured generation time rather than wall time since the click
+            real_generation_time = st.session_state.get('background_generation_time', 0.0)
             
             if real_generation_time >= 1.0:
                 time_display = f"{real_generation_time:.1f} seconds"
@@ -660,6 +909,23 @@ if uploaded_file is not None:
                 time_display = f"{real_generation_time * 1000:.0f} milliseconds"
             
             st.success(f"🎉 Message generation complete! Generated {len(valid_leads)} unique messages in {time_display}")
+            generation_report = st.session_state.get('generation_report')
+            if generation_report and generation_report['calls_saved'] > 0:
+                st.caption(
+                    f"Duplicate leads shared messages: {generation_report['api_calls']} AI requests for "
+                    f"{generation_report['requests']} leads ({generation_report['calls_saved']} calls saved)"
+                )
+            budget_report = (generation_report or {}).get('budget')
+            if budget_report and budget_report['requests'] > 0:
+                st.caption(
+                    f"AI usage this run: {budget_report['requests']} requests, {budget_report['total_tokens']:,} tokens, "
+                    f"~${budget_report['estimated_cost']:.4f}"
+                )
+            if budget_report and budget_report['exhausted_reason']:
+                st.info(
+                    f"ℹ️ Generation budget reached ({budget_report['exhausted_reason']} limit): "
+                    f"{budget_report['skipped_requests']} messages were created from templates instead"
+                )
             st.session_state.messages_generated = True
             st.session_state.generation_started = False  # Reset generation flag after completion
             
@@ -695,6 +961,7 @@ if uploaded_file is not None:
                 
                 # Update results dataframe with final data from session state
                 results_df = pd.DataFrame(st.session_state.processed_data)
+                results_df['Risk Score'] = results_df['Risk Score'].astype(RISK_SCORE_DTYPE)
                 
                 # Remove Phone column for display
                 display_results_df = results_df.drop('Phone', axis=1)
@@ -744,17 +1011,26 @@ if uploaded_file is not None:
                 # Download section
                 st.markdown("### 💾 Download Results")
                 
-                # Create downloadable CSV
-                csv_buffer = io.StringIO()
-                results_df.to_csv(csv_buffer, index=False)
-                csv_data = csv_buffer.getvalue()
+                # The streamed file is complete unless messages were filled in after generation
+                result_exporter = st.session_state.get('result_exporter')
+                if result_exporter is None or result_exporter.rows_written != len(results_df):
+                    if result_exporter is not None:
+                        result_exporter.cleanup()
+                    result_exporter = StreamingExporter(input_columns + RESULT_COLUMNS)
+                    result_exporter.append(build_export_frame(df[input_columns], results_df))
+                    st.session_state.result_exporter = result_exporter
+                
+                export_format = st.radio("File format", ["CSV", "Excel"], horizontal=True)
+                file_format = 'xlsx' if export_format == "Excel" else 'csv'
                 
+                # The file is only read (and converted to Excel) when the button is clicked
                 st.download_button(
-                    label="📥 Download Results as CSV",
-                    data=csv_data,
-                    file_name=f"lead_risk_assessment_results.csv",
-                    mime="text/csv",
-                    help="Download the processed results as a CSV file",
+                    label=f"📥 Download Results as {export_format}",
+                    data=lambda: result_exporter.read(file_format),
+                    file_name=f"lead_risk_assessment_results.{file_format}",
+                    mime=EXPORT_MIME_TYPES[file_format],
+                    help="Download your uploaded data with risk scores and generated messages",
+                    on_click="ignore",
                     use_container_width=True
                 )
             else:
@@ -853,6 +1129,11 @@ if uploaded_file is not None:
     except Exception as e:
         st.error(f"❌ Error processing file: {str(e)}")
         st.info("Please ensure your file is a valid Excel file with all required columns.")
+    
+    finally:
+        # Also when the run stopped early, so tracemalloc never stays on
+        if stage_profiler.active_profile() is not None:
+            st.session_state.profile_report = stage_profiler.finish_profile()
 
 # Handle file removal and show sample data format when no file uploaded  
 if uploaded_file is None:
@@ -865,11 +1146,54 @@ if uploaded_file is None:
         st.session_state.background_generation_started = False
         st.session_state.background_messages = {}
         st.session_state.processed_data = None
+        st.session_state.previous_snapshot = None
+        st.session_state.risk_stats = None
+        st.session_state.upload_job_id = None
         st.session_state.current_file_name = None
         st.rerun()  # Force complete refresh
     
     st.info("👆 Please upload an Excel file to get started.")
     
+    saved_campaigns = list_campaigns()
+    if saved_campaigns:
+        with st.expander("📂 Past Campaigns", expanded=False):
+            campaign = st.selectbox(
+                "Campaign",
+                saved_campaigns,
+                # Options are matched by label, so it ends with the id's unique suffix
+                format_func=lambda c: f"{c['name']} ({c['rows']} leads, {pd.Timestamp(c['created_at'], unit='s'):%Y-%m-%d %H:%M}) · {c['id'][-6:]}"
+            )
+            # Memory-mapped: opening is instant and only the rows shown are read from disk
+            campaign_table, _ = open_campaign(campaign['id'])
+            
+            campaign_cols = st.columns(4)
+            for column, (label, category) in zip(campaign_cols, [
+                ('🔴 High Risk', 'High'), ('🟡 Medium Risk', 'Medium'), ('🟢 Low Risk', 'Low'), ('❌ Invalid Phone', 'Invalid Phone')
+            ]):
+                column.metric(label, campaign['risk_counts'].get(category, 0))
+            
+            campaign_risk = st.selectbox("Show", ["All", "High", "Medium", "Low", "Invalid Phone"], key="campaign_risk_filter")
+            if campaign_risk != "All":
+                import pyarrow.compute as pc
+                campaign_table = campaign_table.filter(pc.equal(campaign_table['Risk Score'], campaign_risk))
+            st.caption(f"Showing the first {min(campaign_table.num_rows, 1000)} of {campaign_table.num_rows} leads")
+            st.dataframe(campaign_table.slice(0, 1000).to_pandas(), hide_index=True)
+            
+            def campaign_csv():
+                import io
+                import pyarrow.csv
+                buffer = io.BytesIO()
+                pyarrow.csv.write_csv(campaign_table, buffer)
+                return buffer.getvalue()
+            
+            st.download_button(
+                label="📥 Download Campaign (CSV)",
+                data=campaign_csv,
+                file_name=f"{campaign['id']}.csv",
+                mime="text/csv",
+                on_click="ignore"
+            )
+    
     with st.expander("📋 Sample Data Format", expanded=False):
         sample_data = {
             'Lead Name': ['John Doe', 'Jane Smith', 'Bob Johnson', 'Alice Brown'],
@@ -886,6 +1210,58 @@ if uploaded_file is None:
         sample_df = pd.DataFrame(sample_data)
         st.dataframe(sample_df, use_container_width=True)
 
+# Diagnostics panel (only when metrics are being recorded and this session asked for it)
+if metrics.registry.enabled and show_metrics_panel:
+    metrics_snapshot = metrics.registry.snapshot()
+    with st.expander("🩺 Diagnostics Panel", expanded=False):
+        generated_openai = metrics.registry.counter_value('messages_generated_total', source='openai', reason='ok')
+        generated_total = sum(
+            counter['value'] for counter in metrics_snapshot['counters']
+            if counter['name'] == 'messages_generated_total'
+        )
+        if generated_total:
+            st.metric("Message fallback rate", f"{(generated_total - generated_openai) / generated_total:.1%}")
+        
+        st.markdown("**Timings**")
+        st.dataframe(pd.DataFrame([
+            {'Metric': h['name'], 'Labels': ', '.join(f"{k}={v}" for k, v in h['labels'].items()),
+             'Count': h['count'], 'Mean (ms)': round(h['mean'] * 1000, 2), 'Max (ms)': round(h['max'] * 1000, 2),
+             'Total (s)': round(h['sum'], 3)}
+            for h in metrics_snapshot['histograms']
+        ]), hide_index=True, use_container_width=True)
+        
+        st.markdown("**Counters**")
+        st.dataframe(pd.DataFrame([
+            {'Metric': c['name'], 'Labels': ', '.join(f"{k}={v}" for k, v in c['labels'].items()), 'Value': c['value']}
+            for c in metrics_snapshot['counters']
+        ]), hide_index=True, use_container_width=True)
+        
+        st.download_button(
+            label="📥 Download Prometheus metrics",
+            data=metrics.registry.render_prometheus(),
+            file_name="leadgenius_metrics.prom",
+            mime="text/plain"
+        )
+if metrics.registry.enabled:
+    metrics.registry.flush()
+
+# Profile of the last profiled upload
+if st.session_state.get('profile_report'):
+    profile_report = st.session_state.profile_report
+    with st.expander("🔬 Profile Report", expanded=False):
+        st.caption(f"{profile_report['name']}: {profile_report['total_seconds']:.2f} s, saved to {profile_report['path']}")
+        st.dataframe(pd.DataFrame([
+            {'Stage': stage['stage'], 'Seconds': stage['seconds'],
+             'Peak alloc (MB)': round(stage['peak_bytes'] / 2**20, 2) if 'peak_bytes' in stage else None}
+            for stage in profile_report['stages']
+        ]), hide_index=True, use_container_width=True)
+        st.download_button(
+            label="📥 Download profile report",
+            data=stage_profiler.format_report(profile_report),
+            file_name=f"{os.path.splitext(os.path.basename(profile_report['path']))[0]}.txt",
+            mime="text/plain"
+        )
+
 # Footer
 st.markdown("---")
 st.markdown('<div style="text-align: center; color: #666; font-size: 0.9em;">Built with ❤️ for efficient lead management</div>', unsafe_allow_html=True)
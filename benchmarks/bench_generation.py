@@ -0,0 +1,136 @@
+"""
+Message generation against the local fake OpenAI server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_generation --leads 300 --latency 0.1 --max-concurrent 8
+    python -m benchmarks.bench_generation --leads 300 --rate 30 --output generation.json
+    python -m benchmarks.bench_generation --leads 1000 --batch --batch-error-rate 0.02
+
+Every lead gets a distinct name, so each one is a real request. The report
+shows throughput, how many requests the server throttled, the concurrency
+limit the adaptive limiter settled on and how many leads still fell back to
+templates after retries. With --batch the same leads go through the offline
+Batch API mode (file upload, batch submit, polling, result mapping) instead.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import metrics
+import whatsapp_generator
+from adaptive_concurrency import AdaptiveLimiter
+from benchmarks.fake_api_server import FakeAPIServer
+
+@contextmanager
+def fake_openai(base_url, max_concurrency):
+    """Point the generator at a fake server with a fresh client and limiter."""
+    from openai import OpenAI
+
+    original = (whatsapp_generator._openai_client, whatsapp_generator._generation_limiter,
+                whatsapp_generator.OPENAI_API_KEY, whatsapp_generator.MAX_CONCURRENCY)
+    whatsapp_generator._openai_client = OpenAI(api_key='fake', base_url=base_url, max_retries=0, timeout=10)
+    whatsapp_generator._generation_limiter = AdaptiveLimiter(initial_limit=min(4, max_concurrency), max_limit=max_concurrency)
+    whatsapp_generator.OPENAI_API_KEY = 'fake'
+    whatsapp_generator.MAX_CONCURRENCY = max_concurrency
+    try:
+        yield
+    finally:
+        (whatsapp_generator._openai_client, whatsapp_generator._generation_limiter,
+         whatsapp_generator.OPENAI_API_KEY, whatsapp_generator.MAX_CONCURRENCY) = original
+
+def run_generation(leads, server_options, max_concurrency, batch=False):
+    """
+    Generate messages for `leads` distinct leads against a fake server.
+
+    Args:
+        batch (bool): Use the offline Batch API mode instead of live requests
+
+    Returns:
+        dict: Throughput, server counters, final limiter state and fallback count
+    """
+    leads_data = [{'lead_name': f'Lead {i}', 'risk_score': ('High', 'Medium', 'Low')[i % 3]} for i in range(leads)]
+
+    metrics.registry.reset()
+    was_enabled = metrics.registry.enabled
+    metrics.registry.enabled = True
+    try:
+        with FakeAPIServer(**server_options) as server, fake_openai(server.base_url, max_concurrency):
+            start = time.perf_counter()
+            if batch:
+                with tempfile.TemporaryDirectory(prefix='leadgenius-batch-') as work_dir:
+                    _, report = whatsapp_generator.generate_batch_messages_offline_with_report(
+                        leads_data, poll_interval=0.2, work_dir=work_dir
+                    )
+            else:
+                _, report = whatsapp_generator.generate_batch_messages_with_report(leads_data)
+            elapsed = time.perf_counter() - start
+            server_stats = dict(server.stats)
+        fallbacks = sum(
+            counter['value'] for counter in metrics.registry.snapshot()['counters']
+            if counter['name'] == 'messages_generated_total' and counter['labels'].get('source') == 'fallback'
+        )
+        retries = sum(
+            counter['value'] for counter in metrics.registry.snapshot()['counters']
+            if counter['name'] == 'openai_retries_total'
+        )
+    finally:
+        metrics.registry.enabled = was_enabled
+
+    result = {
+        'mode': 'batch' if batch else 'live',
+        'leads': leads,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(leads / elapsed, 1) if elapsed > 0 else None,
+        'fallbacks': fallbacks,
+        'retries': retries,
+        'server': server_stats
+    }
+    if batch:
+        result['batch'] = report
+    else:
+        result['limiter'] = report['concurrency']
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark AI message generation against a throttling fake server.")
+    parser.add_argument('--leads', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.1, help="Fake server base latency in seconds")
+    parser.add_argument('--latency-jitter', type=float, default=0.02)
+    parser.add_argument('--max-concurrent', type=int, default=8, help="Fake server returns 429 above this many in flight")
+    parser.add_argument('--rate', type=float, help="Fake server returns 429 above this many requests per second")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-concurrency', type=int, default=32, help="Upper bound for the adaptive limiter")
+    parser.add_argument('--batch', action='store_true', help="Use the offline Batch API mode")
+    parser.add_argument('--batch-delay', type=float, default=1.0, help="Seconds the fake server takes per batch")
+    parser.add_argument('--batch-error-rate', type=float, default=0.0, help="Share of batch lines that fail")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    server_options = {
+        'latency': args.latency, 'latency_jitter': args.latency_jitter,
+        'max_concurrent': args.max_concurrent, 'rate': args.rate, 'error_rate': args.error_rate,
+        'batch_delay': args.batch_delay, 'batch_error_rate': args.batch_error_rate
+    }
+    result = run_generation(args.leads, server_options, args.max_concurrency, args.batch)
+    if args.batch:
+        print(f"{result['leads']} messages in {result['seconds']}s via batch {result['batch']['status']}, "
+              f"{result['batch']['failed_lines']} failed lines, {result['fallbacks']} fallbacks", file=sys.stderr)
+    else:
+        print(f"{result['leads']} messages in {result['seconds']}s ({result['messages_per_second']}/s), "
+              f"{result['server']['throttled']} throttled, {result['retries']} retries, "
+              f"{result['fallbacks']} fallbacks, final limit {result['limiter']['limit']}", file=sys.stderr)
+
+    report_json = json.dumps({'benchmark': 'generation', 'server': server_options, 'result': result}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report_json + '\n')
+    else:
+        print(report_json)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
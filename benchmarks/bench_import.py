@@ -0,0 +1,97 @@
+"""
+Cold-start import benchmark using `python -X importtime`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --modules lead_pipeline,whatsapp_sender --runs 5 --output imports.json
+
+Each module is imported in a fresh interpreter several times and the
+fastest run is reported (cumulative microseconds from -X importtime and
+wall time of the whole process), along with the heaviest imports it pulled in.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Entry points of the headless path and worker processes
+DEFAULT_MODULES = ['risk_assessment', 'whatsapp_generator', 'whatsapp_sender', 'metrics', 'lead_pipeline']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output.
+
+    Returns:
+        dict: {module: (self_us, cumulative_us)} for every imported module
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure_import(module, runs=3, top=5):
+    """
+    Import a module in fresh interpreters and keep the fastest run.
+
+    Returns:
+        dict: Cumulative import time, process wall time and heaviest dependencies
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, cwd=ROOT
+        )
+        wall = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+        modules = parse_importtime(completed.stderr)
+        cumulative_us = modules.get(module, (0, 0))[1]
+        if best is None or cumulative_us < best['import_us']:
+            # Top-level packages only, so one heavy package isn't listed once per submodule
+            heaviest = sorted(
+                ((name, timing[1]) for name, timing in modules.items() if '.' not in name and name != module),
+                key=lambda item: item[1], reverse=True
+            )[:top]
+            best = {
+                'module': module,
+                'import_us': cumulative_us,
+                'wall_seconds': round(wall, 4),
+                'modules_loaded': len(modules),
+                'heaviest': [{'module': name, 'cumulative_us': us} for name, us in heaviest]
+            }
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import time of the app's modules.")
+    parser.add_argument('--modules', default=','.join(DEFAULT_MODULES),
+                        help="Comma-separated modules to import")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters per module (fastest wins)")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = [measure_import(module.strip(), args.runs) for module in args.modules.split(',') if module.strip()]
+    for result in results:
+        print(f"{result['module']:<22}{result['import_us'] / 1000:>9.1f} ms import "
+              f"{result['wall_seconds'] * 1000:>9.1f} ms process", file=sys.stderr)
+
+    report_json = json.dumps({'benchmark': 'imports', 'python': sys.version.split()[0], 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report_json + '\n')
+    else:
+        print(report_json)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Stage-by-stage benchmark of the headless lead pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --sizes 1000,100000,1000000 --output bench.json
+    python -m benchmarks.bench_pipeline --sizes 1000 --baseline bench.json
+
+Each stage (read, validate, encode, phone clean, score, message generate,
+link build, export) is timed separately. Message generation goes through
+generate_whatsapp_message with a stubbed OpenAI client, so the prompt
+building and response handling are measured without network calls.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pandas as pd
+
+import whatsapp_generator
+from lead_encoding import encode_lead_columns
+from lead_pipeline import (
+    read_leads, validate_excel_columns, clean_phone_numbers, score_leads,
+    generate_messages, build_whatsapp_links, build_results, export_results
+)
+from risk_assessment import validate_leads
+from benchmarks.synthetic_leads import generate_leads
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+class StubOpenAIClient:
+    """Stand-in for the OpenAI client that answers instantly with a canned message."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._create,
+            with_raw_response=SimpleNamespace(create=self._create_raw)
+        ))
+
+    @classmethod
+    def _create_raw(cls, **kwargs):
+        response = cls._create(**kwargs)
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+    @staticmethod
+    def _create(**kwargs):
+        prompt = kwargs['messages'][-1]['content']
+        name = prompt.split('lead named "', 1)[-1].split('"', 1)[0]
+        content = f"Hi {name}, quick check-in about your demo. Does tomorrow work for a short call?"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=310, completion_tokens=24, total_tokens=334)
+        )
+
+@contextmanager
+def stubbed_openai():
+    """Route generate_whatsapp_message through StubOpenAIClient."""
+    original_client = whatsapp_generator._openai_client
+    original_key = whatsapp_generator.OPENAI_API_KEY
+    whatsapp_generator._openai_client = StubOpenAIClient()
+    whatsapp_generator.OPENAI_API_KEY = "benchmark-stub"
+    try:
+        yield
+    finally:
+        whatsapp_generator._openai_client = original_client
+        whatsapp_generator.OPENAI_API_KEY = original_key
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(size, work_dir, max_excel_rows=100000, seed=42):
+    """
+    Time every pipeline stage for one input size.
+
+    Returns:
+        dict: Size, input format and seconds / rows per second per stage
+    """
+    input_format = 'xlsx' if size <= max_excel_rows else 'csv'
+    input_path = os.path.join(work_dir, f'leads_{size}.{input_format}')
+    source = generate_leads(size, seed=seed)
+    if input_format == 'xlsx':
+        source.to_excel(input_path, index=False)
+    else:
+        source.to_csv(input_path, index=False)
+    del source
+
+    stages = {}
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        stages[stage] = {
+            'seconds': round(elapsed, 6),
+            'rows_per_second': round(size / elapsed, 1) if elapsed > 0 else None
+        }
+        return result
+
+    df = timed('read', read_leads, input_path)
+    timed('validate', lambda: (validate_excel_columns(df), validate_leads(df)))
+    df = timed('encode', encode_lead_columns, df)
+    df['clean_phone'] = timed('phone_clean', clean_phone_numbers, df['Contact Number'])
+    risk_scores = timed('score', score_leads, df)
+    with stubbed_openai():
+        messages = timed('message_generate', generate_messages, df['Lead Name'], risk_scores, df['clean_phone'])
+    links = timed('link_build', build_whatsapp_links, df['clean_phone'], messages)
+    results_df = build_results(df, risk_scores, messages, links)
+    timed('export', export_results, results_df, os.path.join(work_dir, f'results_{size}.csv'))
+
+    return {
+        'size': size,
+        'input_format': input_format,
+        'total_seconds': round(sum(stage['seconds'] for stage in stages.values()), 6),
+        'stages': stages
+    }
+
+def compare_with_baseline(report, baseline, threshold):
+    """
+    Print per-stage changes against a previous report.
+
+    Returns:
+        list: (size, stage, change) for every stage slower than the threshold
+    """
+    baseline_runs = {run['size']: run for run in baseline.get('runs', [])}
+    regressions = []
+
+    for run in report['runs']:
+        previous = baseline_runs.get(run['size'])
+        if previous is None:
+            continue
+        print(f"\nSize {run['size']} vs baseline {baseline.get('commit') or 'unknown'}:")
+        for stage, timing in run['stages'].items():
+            before = previous['stages'].get(stage, {}).get('seconds')
+            if not before:
+                continue
+            change = (timing['seconds'] - before) / before
+            marker = '  <-- regression' if change > threshold else ''
+            print(f"  {stage:<18}{before:>10.4f}s -> {timing['seconds']:>10.4f}s  {change:+7.1%}{marker}")
+            if change > threshold:
+                regressions.append((run['size'], stage, change))
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the lead pipeline stage by stage.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated lead counts (default: 1000,100000,1000000)")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    parser.add_argument('--baseline', help="Previous JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown that counts as a regression (default: 0.2)")
+    parser.add_argument('--max-excel-rows', type=int, default=100000,
+                        help="Larger inputs are read from CSV since Excel files that big are impractical")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    report = {
+        'benchmark': 'lead_pipeline',
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'runs': []
+    }
+
+    with tempfile.TemporaryDirectory(prefix='leadgenius-bench-') as work_dir:
+        for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+            print(f"Benchmarking {size} leads...", file=sys.stderr)
+            report['runs'].append(run_benchmark(size, work_dir, args.max_excel_rows, args.seed))
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report_json + '\n')
+    else:
+        print(report_json)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(report, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,540 @@
+"""
+Local stand-in for the OpenAI chat completions and WhatsApp Graph /messages
+APIs with injectable latency, throttling and errors.
+
+Run from the repository root:
+
+    python -m benchmarks.fake_api_server --port 8089 --latency 0.2 --max-concurrent 8 --rate 40
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake \
+        WHATSAPP_API_BASE_URL=http://127.0.0.1:8089/v18.0 streamlit run app.py
+
+Requests beyond --max-concurrent in flight, or beyond --rate per second,
+get a 429 with retry-after-ms and x-ratelimit-* headers like the real API;
+--throttle-rate and --error-rate inject 429s and 500s at random on top.
+Response times follow --latency-distribution and grow with the number of
+requests in flight, so pushing past the server's capacity is visible as
+slower responses before it starts throttling. --seed makes the injected
+latencies and failures repeatable. GET /stats returns the counters as JSON.
+
+Real responses can be recorded once and replayed for free:
+
+    python -m benchmarks.fake_api_server --record calls.jsonl \
+        --upstream-openai https://api.openai.com/v1 --upstream-graph https://graph.facebook.com/v18.0
+    python -m benchmarks.fake_api_server --replay calls.jsonl --replay-latency
+
+While recording, requests are forwarded upstream with their Authorization
+header (so recorded Graph sends are real messages) and every response is
+appended to the file without credentials. A replay answers a request with
+the recorded response for the same body, or the endpoint's recorded
+responses in order when there is none.
+
+The files and batches endpoints (POST /v1/files, POST /v1/batches,
+GET /v1/batches/{id}, GET /v1/files/{id}/content) run uploaded Batch API
+files in the background after --batch-delay seconds, failing
+--batch-error-rate of the lines.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+from email import policy
+from email.parser import BytesParser
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ['fixed', 'uniform', 'normal', 'lognormal', 'exponential']
+
+# POST /v18.0/{phone_number_id}/messages
+GRAPH_MESSAGES_PATH = re.compile(r'^/v\d+\.\d+/[^/]+/messages$')
+
+# Upstream response headers kept in recordings (and sent back on replay)
+RECORDED_HEADERS = ('retry-after', 'retry-after-ms', 'x-ratelimit-limit-requests',
+                    'x-ratelimit-remaining-requests', 'x-ratelimit-reset-requests')
+
+class _LoadTestHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connection bursts from concurrent clients,
+    # which then wait out SYN retransmits (1s, 3s, ...) and skew the latency tail
+    request_queue_size = 1024
+    daemon_threads = True
+
+def _request_key(endpoint, body):
+    """Stable key of a request body, so a replay finds the response recorded for it."""
+    try:
+        canonical = json.dumps(json.loads(body or b'{}'), sort_keys=True)
+    except ValueError:
+        canonical = body.decode(errors='replace')
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode()).hexdigest()
+
+class FakeAPIServer:
+    """
+    Threaded fake OpenAI and WhatsApp Graph server.
+
+    Chat completions and Graph /messages sends share the same admission,
+    latency and failure injection.
+
+    Args:
+        latency (float): Base seconds per request
+        latency_jitter (float): Spread of the latency distribution: the width for
+                                'uniform', standard deviation for 'normal', sigma
+                                of the log for 'lognormal' and mean of the extra
+                                tail for 'exponential'
+        max_concurrent (int): In-flight requests above this get a 429 (None = unlimited)
+        rate (float): Requests per second allowed per one-second window (None = unlimited)
+        error_rate (float): Share of requests answered with a 500
+        host (str), port (int): Bind address (port 0 picks a free port)
+        batch_delay (float): Seconds before a submitted batch completes
+        batch_error_rate (float): Share of batch lines that fail
+        latency_distribution (str): One of LATENCY_DISTRIBUTIONS
+        throttle_rate (float): Share of requests answered with a 429 regardless of load
+        seed (int): Seed for latencies, failures and ids (None = unseeded)
+        record_path (str): Forward requests upstream and append the responses here
+        upstream_openai (str), upstream_graph (str): Upstream API roots when recording,
+                                                     e.g. https://api.openai.com/v1
+        replay_path (str): Answer from responses recorded with record_path
+        replay_latency (bool): Replay the recorded response times instead of sampling
+    """
+
+    def __init__(self, latency=0.05, latency_jitter=0.0, max_concurrent=None, rate=None,
+                 error_rate=0.0, host='127.0.0.1', port=0, batch_delay=1.0, batch_error_rate=0.0,
+                 latency_distribution='uniform', throttle_rate=0.0, seed=None, record_path=None,
+                 upstream_openai=None, upstream_graph=None, replay_path=None, replay_latency=False):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.latency_distribution = latency_distribution
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.batch_delay = batch_delay
+        self.batch_error_rate = batch_error_rate
+        self.files = {}
+        self.batches = {}
+
+        self.record_path = record_path
+        self.upstream = {'chat': upstream_openai, 'messages': upstream_graph}
+        self.replay_latency = replay_latency
+        self._replay = self._load_replay(replay_path) if replay_path else None
+        self._upstream_client = None
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.stats = {
+            'requests': 0, 'completed': 0, 'throttled': 0, 'errors': 0, 'peak_in_flight': 0,
+            'messages_sent': 0, 'recorded': 0, 'replayed': 0
+        }
+
+        self._server = _LoadTestHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def graph_url(self):
+        """Value for WHATSAPP_API_BASE_URL (or WhatsAppSender's base_url)."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v18.0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._upstream_client is not None:
+            self._upstream_client.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _admit(self):
+        """
+        Decide whether a new request is served.
+
+        Returns:
+            tuple: (admitted, headers) with the x-ratelimit-* headers to send
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+
+            reset = max(0.0, 1.0 - (now - self._window_start))
+            headers = {}
+            if self.rate is not None:
+                remaining = max(0, int(self.rate) - self._window_count - 1)
+                headers = {
+                    'x-ratelimit-limit-requests': str(int(self.rate)),
+                    'x-ratelimit-remaining-requests': str(remaining),
+                    'x-ratelimit-reset-requests': f"{int(reset * 1000)}ms"
+                }
+
+            over_rate = self.rate is not None and self._window_count >= self.rate
+            over_capacity = self.max_concurrent is not None and self._in_flight >= self.max_concurrent
+            injected = self.throttle_rate > 0 and self._random.random() < self.throttle_rate
+            if over_rate or over_capacity or injected:
+                self.stats['throttled'] += 1
+                headers['retry-after-ms'] = str(int(reset * 1000) if over_rate else int(self.latency * 1000))
+                return False, headers
+
+            self._window_count += 1
+            self._in_flight += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+            return True, headers
+
+    def _finish(self, error=False, endpoint=None):
+        with self._lock:
+            self._in_flight -= 1
+            self.stats['errors' if error else 'completed'] += 1
+            if endpoint == 'messages' and not error:
+                self.stats['messages_sent'] += 1
+
+    def _sample_latency(self):
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                return self.latency + self._random.uniform(0, self.latency_jitter)
+            if self.latency_distribution == 'normal':
+                return max(0.0, self._random.gauss(self.latency, self.latency_jitter))
+            if self.latency_distribution == 'lognormal':
+                # Median at latency, with a long right tail like real API response times
+                return self.latency * math.exp(self._random.gauss(0, self.latency_jitter))
+            if self.latency_distribution == 'exponential':
+                return self.latency + (self._random.expovariate(1 / self.latency_jitter) if self.latency_jitter > 0 else 0.0)
+            return self.latency
+
+    def _service_time(self):
+        # Slower as it fills up, like a real backend approaching saturation
+        load = self._in_flight / self.max_concurrent if self.max_concurrent else 0
+        return self._sample_latency() * (1 + load)
+
+    def _error_body(self, endpoint, status):
+        """Error payload in the shape the endpoint's real API uses."""
+        if endpoint == 'messages':
+            if status == 429:
+                return {'error': {'message': '(#130429) Rate limit hit', 'type': 'OAuthException', 'code': 130429}}
+            return {'error': {'message': 'Injected server error', 'type': 'OAuthException', 'code': 131000}}
+        if status == 429:
+            return {'error': {'message': 'Rate limit reached', 'type': 'requests'}}
+        return {'error': {'message': 'Injected server error'}}
+
+    def _message_response(self, request):
+        to = str(request.get('to', ''))
+        return {
+            'messaging_product': 'whatsapp',
+            'contacts': [{'input': to, 'wa_id': to}],
+            'messages': [{'id': self._new_id('wamid')}]
+        }
+
+    def _load_replay(self, path):
+        replay = {}
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                endpoint = replay.setdefault(entry['endpoint'], {'by_key': {}, 'sequence': [], 'cursor': 0})
+                endpoint['by_key'].setdefault(entry['key'], []).append(entry)
+                endpoint['sequence'].append(entry)
+        return replay
+
+    def _replayed(self, endpoint, body):
+        """
+        Recorded response for a request, or None without a replay file.
+
+        Requests recorded more than once get their responses in turn;
+        unrecorded ones get the endpoint's responses in recorded order.
+        """
+        if self._replay is None or endpoint not in self._replay:
+            return None
+        recorded = self._replay[endpoint]
+        with self._lock:
+            self.stats['replayed'] += 1
+            matches = recorded['by_key'].get(_request_key(endpoint, body))
+            if matches:
+                entry = matches.pop(0)
+                matches.append(entry)
+                return entry
+            entry = recorded['sequence'][recorded['cursor'] % len(recorded['sequence'])]
+            recorded['cursor'] += 1
+        if endpoint == 'messages' and entry['status'] == 200:
+            # Another recipient than the recorded one: keep message ids unique for the status store
+            return dict(entry, body=self._message_response(json.loads(body or b'{}')))
+        return entry
+
+    def _proxy(self, endpoint, path, body, headers):
+        """
+        Forward a request upstream and record the response.
+
+        Returns:
+            tuple: (status, body bytes, headers to send back)
+        """
+        import httpx
+
+        upstream = self.upstream[endpoint]
+        if not upstream:
+            return 502, json.dumps({'error': {'message': f"No upstream configured for {endpoint}"}}).encode(), {}
+        if self._upstream_client is None:
+            with self._lock:
+                if self._upstream_client is None:
+                    self._upstream_client = httpx.Client(timeout=60)
+        # Drop the local version prefix (/v1 or /v18.0); the upstream root carries its own
+        url = upstream.rstrip('/') + '/' + path.lstrip('/').split('/', 1)[1]
+        forwarded = {key: headers[key] for key in ('Authorization', 'Content-Type') if headers.get(key)}
+
+        start = time.perf_counter()
+        response = self._upstream_client.post(url, content=body, headers=forwarded)
+        latency = time.perf_counter() - start
+        kept = {key: response.headers[key] for key in RECORDED_HEADERS if key in response.headers}
+        try:
+            response_body = response.json()
+        except ValueError:
+            response_body = {'error': {'message': response.text}}
+
+        entry = {
+            'endpoint': endpoint, 'key': _request_key(endpoint, body), 'status': response.status_code,
+            'headers': kept, 'body': response_body, 'latency': round(latency, 6)
+        }
+        with self._lock:
+            self.stats['recorded'] += 1
+            with open(self.record_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        return response.status_code, json.dumps(response_body).encode(), kept
+
+    def _completion(self, request):
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        name = prompt.split('lead named "', 1)[-1].split('"', 1)[0] if 'lead named "' in prompt else 'there'
+        return {
+            'id': self._new_id('chatcmpl'),
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': f"Hi {name}, quick check-in about your demo. Does tomorrow work for a short call?"},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 310, 'completion_tokens': 24, 'total_tokens': 334}
+        }
+
+    def _new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}-fake-{self._random.getrandbits(48):x}"
+
+    def _store_file(self, content, filename, purpose):
+        file_id = self._new_id('file')
+        with self._lock:
+            self.files[file_id] = {
+                'object': {
+                    'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                    'filename': filename, 'purpose': purpose, 'status': 'processed'
+                },
+                'content': content
+            }
+        return self.files[file_id]['object']
+
+    def _create_batch(self, request):
+        batch_id = self._new_id('batch')
+        batch = {
+            'id': batch_id, 'object': 'batch', 'endpoint': request.get('endpoint'),
+            'input_file_id': request.get('input_file_id'), 'completion_window': request.get('completion_window', '24h'),
+            'status': 'validating', 'created_at': int(time.time()), 'output_file_id': None, 'error_file_id': None,
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0}
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch_id,), daemon=True).start()
+        return dict(batch)
+
+    def _run_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        input_file = self.files.get(batch['input_file_id'])
+        if input_file is None:
+            batch['status'] = 'failed'
+            return
+        batch['status'] = 'in_progress'
+        time.sleep(self.batch_delay)
+
+        output_lines = []
+        error_lines = []
+        for line in input_file['content'].decode().splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            result = {'id': self._new_id('batch_req'), 'custom_id': request['custom_id']}
+            if self._random.random() < self.batch_error_rate:
+                result.update(response=None, error={'code': 'server_error', 'message': 'Injected batch line failure'})
+                error_lines.append(json.dumps(result))
+            else:
+                body = self._completion(request['body'])
+                result.update(response={'status_code': 200, 'request_id': body['id'], 'body': body}, error=None)
+                output_lines.append(json.dumps(result))
+
+        with self._lock:
+            batch['request_counts'] = {
+                'total': len(output_lines) + len(error_lines),
+                'completed': len(output_lines),
+                'failed': len(error_lines)
+            }
+        if output_lines:
+            batch['output_file_id'] = self._store_file(('\n'.join(output_lines) + '\n').encode(), 'output.jsonl', 'batch_output')['id']
+        if error_lines:
+            batch['error_file_id'] = self._store_file(('\n'.join(error_lines) + '\n').encode(), 'errors.jsonl', 'batch_output')['id']
+        batch['completed_at'] = int(time.time())
+        batch['status'] = 'completed'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Small keep-alive responses otherwise wait on delayed ACKs (~40ms each)
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0].rstrip('/')
+                parts = path.split('/')
+                if path == '/stats':
+                    with server._lock:
+                        stats = dict(server.stats)
+                    self._send_json(200, stats)
+                elif path.startswith('/v1/batches/') and parts[-1] in server.batches:
+                    with server._lock:
+                        batch = dict(server.batches[parts[-1]])
+                    self._send_json(200, batch)
+                elif path.startswith('/v1/files/') and path.endswith('/content') and parts[-2] in server.files:
+                    self._send_bytes(200, server.files[parts[-2]]['content'], 'application/octet-stream')
+                else:
+                    self._send_json(404, {'error': {'message': 'Not found'}})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                path = self.path.split('?', 1)[0].rstrip('/')
+                if path == '/v1/files':
+                    self._send_json(200, self._upload(body))
+                    return
+                if path == '/v1/batches':
+                    self._send_json(200, server._create_batch(json.loads(body or b'{}')))
+                    return
+                if path.endswith('/chat/completions'):
+                    endpoint = 'chat'
+                elif GRAPH_MESSAGES_PATH.match(path):
+                    endpoint = 'messages'
+                else:
+                    self._send_json(404, {'error': {'message': 'Not found'}})
+                    return
+
+                if server.record_path:
+                    status, data, headers = server._proxy(endpoint, path, body, self.headers)
+                    self._send_bytes(status, data, 'application/json', headers)
+                    return
+
+                admitted, headers = server._admit()
+                if not admitted:
+                    self._send_json(429, server._error_body(endpoint, 429), headers)
+                    return
+
+                recorded = server._replayed(endpoint, body)
+                time.sleep(recorded['latency'] if recorded is not None and server.replay_latency else server._service_time())
+                with server._lock:
+                    failed = server._random.random() < server.error_rate
+                if failed:
+                    server._finish(error=True)
+                    self._send_json(500, server._error_body(endpoint, 500), headers)
+                    return
+
+                server._finish(endpoint=endpoint)
+                if recorded is not None:
+                    self._send_json(recorded['status'], recorded['body'], dict(headers, **recorded['headers']))
+                elif endpoint == 'messages':
+                    self._send_json(200, server._message_response(json.loads(body or b'{}')), headers)
+                else:
+                    self._send_json(200, server._completion(json.loads(body or b'{}')), headers)
+
+            def _upload(self, body):
+                # multipart/form-data with 'purpose' and 'file' fields
+                message = BytesParser(policy=policy.default).parsebytes(
+                    f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode() + body
+                )
+                fields = {}
+                filename = 'upload.jsonl'
+                for part in message.iter_parts():
+                    name = part.get_param('name', header='content-disposition')
+                    fields[name] = part.get_payload(decode=True)
+                    if name == 'file':
+                        filename = part.get_filename() or filename
+                purpose = (fields.get('purpose') or b'batch').decode()
+                return server._store_file(fields.get('file') or b'', filename, purpose)
+
+            def _send_json(self, status, payload, headers=None):
+                self._send_bytes(status, json.dumps(payload).encode(), 'application/json', headers)
+
+            def _send_bytes(self, status, data, content_type, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI chat completions and WhatsApp /messages APIs.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help="Base seconds per request")
+    parser.add_argument('--latency-jitter', type=float, default=0.05, help="Spread of the latency distribution")
+    parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--max-concurrent', type=int, help="429 above this many requests in flight")
+    parser.add_argument('--rate', type=float, help="429 above this many requests per second")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument('--seed', type=int, help="Seed for repeatable latencies and failures")
+    parser.add_argument('--batch-delay', type=float, default=5.0, help="Seconds before a submitted batch completes")
+    parser.add_argument('--batch-error-rate', type=float, default=0.0, help="Share of batch lines that fail")
+    parser.add_argument('--record', help="Forward requests upstream and append the responses to this JSON lines file")
+    parser.add_argument('--upstream-openai', default='https://api.openai.com/v1', help="OpenAI root when recording")
+    parser.add_argument('--upstream-graph', default='https://graph.facebook.com/v18.0', help="Graph API root when recording")
+    parser.add_argument('--replay', help="Answer with responses recorded by --record")
+    parser.add_argument('--replay-latency', action='store_true', help="Replay recorded response times too")
+    args = parser.parse_args(argv)
+
+    server = FakeAPIServer(args.latency, args.latency_jitter, args.max_concurrent, args.rate,
+                           args.error_rate, args.host, args.port, args.batch_delay, args.batch_error_rate,
+                           args.latency_distribution, args.throttle_rate, args.seed, args.record,
+                           args.upstream_openai, args.upstream_graph, args.replay, args.replay_latency)
+    mode = f", recording to {args.record}" if args.record else f", replaying {args.replay}" if args.replay else ""
+    print(f"Fake OpenAI API on {server.base_url}, WhatsApp API on {server.graph_url}{mode} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Load test of message generation and sending against the local API stand-in.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --concurrency 1,8,32,128 --requests 2000
+    python -m benchmarks.load_test --target sender --latency-distribution lognormal --latency 0.08 \
+        --latency-jitter 0.6 --throttle-rate 0.02 --error-rate 0.01
+    python -m benchmarks.load_test --target generator --replay calls.jsonl --replay-latency
+
+For every concurrency level a fresh benchmarks/fake_api_server.py (same
+--seed) is started and --requests distinct leads are generated through
+generate_batch_messages (the adaptive limiter capped at the level) and/or
+sent through AsyncWhatsAppSender (max_concurrency = level). The report
+shows throughput, p50/p95/p99 request latency as seen by the client
+(from the openai_request_seconds / whatsapp_request_seconds metrics,
+retries included as separate requests), retries, failures and the
+server's counters. No real API is called.
+
+Client and server share the machine's CPUs: once the stand-in's reported
+service time stays flat while client latency climbs, the level is
+measuring the client (HTTP stack, event loop, GIL), not the API.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+import metrics
+import whatsapp_generator
+from benchmarks.bench_generation import fake_openai
+from benchmarks.fake_api_server import FakeAPIServer, LATENCY_DISTRIBUTIONS
+
+DEFAULT_CONCURRENCY = [1, 8, 32, 128]
+
+TARGETS = ['generator', 'sender']
+
+# Client-side latency metric of each target
+LATENCY_METRICS = {'generator': 'openai_request_seconds', 'sender': 'whatsapp_request_seconds'}
+
+class LatencySink:
+    """Metrics sink keeping every observation of one histogram, for percentiles."""
+
+    def __init__(self, name):
+        self.name = name
+        self.values = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        if event['type'] == 'histogram' and event['name'] == self.name:
+            with self._lock:
+                self.values.append(event['value'])
+
+    def flush(self, registry):
+        pass
+
+def _counter_total(name, **labels):
+    return sum(
+        counter['value'] for counter in metrics.registry.snapshot()['counters']
+        if counter['name'] == name and all(counter['labels'].get(k) == v for k, v in labels.items())
+    )
+
+def _run_generator(server, concurrency, requests):
+    leads_data = [{'lead_name': f'Lead {i}', 'risk_score': ('High', 'Medium', 'Low')[i % 3]} for i in range(requests)]
+    with fake_openai(server.base_url, concurrency):
+        whatsapp_generator.generate_batch_messages(leads_data)
+    return _counter_total('messages_generated_total', source='fallback'), _counter_total('openai_retries_total')
+
+def _run_sender(server, concurrency, requests, messages_per_second):
+    from whatsapp_sender import AsyncWhatsAppSender
+
+    sender = AsyncWhatsAppSender(
+        max_concurrency=concurrency, messages_per_second=messages_per_second,
+        access_token='load-test', phone_number_id='100000000000000', base_url=server.graph_url
+    )
+    # Valid US numbers, so every row passes phone validation and reaches the server
+    messages_data = [
+        {'lead_name': f'Lead {i}', 'phone': f"1415{2000000 + i:07d}", 'message': f"Hi Lead {i}, does tomorrow work?"}
+        for i in range(requests)
+    ]
+    results = sender.send_batch_messages(messages_data)
+    return sum(not result['success'] for result in results), _counter_total('whatsapp_retries_total')
+
+def run_level(target, concurrency, requests, server_options, messages_per_second=100000.0):
+    """
+    Run one target at one concurrency level against a fresh fake server.
+
+    Returns:
+        dict: Throughput, latency percentiles in ms, retries, failures and server counters
+    """
+    sink = LatencySink(LATENCY_METRICS[target])
+    was_enabled, sinks = metrics.registry.enabled, metrics.registry.sinks
+    metrics.registry.reset()
+    metrics.registry.configure(enabled=True, sinks=[sink])
+    try:
+        with FakeAPIServer(**server_options) as server:
+            start = time.perf_counter()
+            if target == 'generator':
+                failures, retries = _run_generator(server, concurrency, requests)
+            else:
+                failures, retries = _run_sender(server, concurrency, requests, messages_per_second)
+            elapsed = time.perf_counter() - start
+            server_stats = dict(server.stats)
+    finally:
+        metrics.registry.reset()
+        metrics.registry.configure(enabled=was_enabled, sinks=sinks)
+
+    latencies = np.array(sink.values) * 1000
+    percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [None] * 3
+    return {
+        'target': target,
+        'concurrency': concurrency,
+        'requests': requests,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1) if elapsed > 0 else None,
+        'latency_ms': {
+            'p50': round(float(percentiles[0]), 2) if len(latencies) else None,
+            'p95': round(float(percentiles[1]), 2) if len(latencies) else None,
+            'p99': round(float(percentiles[2]), 2) if len(latencies) else None,
+            'max': round(float(latencies.max()), 2) if len(latencies) else None
+        },
+        'http_requests': len(latencies),
+        'retries': retries,
+        'failures': failures,
+        'server': server_stats
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test message generation and sending against a fake API server.")
+    parser.add_argument('--target', choices=TARGETS + ['both'], default='both')
+    parser.add_argument('--concurrency', default=','.join(map(str, DEFAULT_CONCURRENCY)),
+                        help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=1000, help="Messages generated / sent per level")
+    parser.add_argument('--send-rate', type=float, default=100000.0,
+                        help="Sender pacing in messages per second (high by default so concurrency is the limit)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake server base latency in seconds")
+    parser.add_argument('--latency-jitter', type=float, default=0.02, help="Spread of the latency distribution")
+    parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--max-concurrent', type=int, help="Fake server returns 429 above this many in flight")
+    parser.add_argument('--rate', type=float, help="Fake server returns 429 above this many requests per second")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument('--seed', type=int, default=42, help="Fake server seed, so runs are repeatable")
+    parser.add_argument('--replay', help="Answer with responses recorded by fake_api_server --record")
+    parser.add_argument('--replay-latency', action='store_true', help="Replay recorded response times too")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    server_options = {
+        'latency': args.latency, 'latency_jitter': args.latency_jitter,
+        'latency_distribution': args.latency_distribution, 'max_concurrent': args.max_concurrent,
+        'rate': args.rate, 'throttle_rate': args.throttle_rate, 'error_rate': args.error_rate,
+        'seed': args.seed, 'replay_path': args.replay, 'replay_latency': args.replay_latency
+    }
+    targets = TARGETS if args.target == 'both' else [args.target]
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    results = []
+    print(f"{'target':<10}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'retries':>9}{'failed':>8}{'429s':>7}", file=sys.stderr)
+    for target in targets:
+        for level in levels:
+            result = run_level(target, level, args.requests, server_options, args.send_rate)
+            results.append(result)
+            latency = result['latency_ms']
+            print(f"{target:<10}{level:>6}{result['requests_per_second']:>10}{latency['p50']:>10}{latency['p95']:>10}"
+                  f"{latency['p99']:>10}{result['retries']:>9}{result['failures']:>8}{result['server']['throttled']:>7}",
+                  file=sys.stderr)
+
+    report_json = json.dumps({'benchmark': 'load_test', 'server': server_options, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report_json + '\n')
+    else:
+        print(report_json)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
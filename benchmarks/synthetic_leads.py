@@ -0,0 +1,104 @@
+"""
+Synthetic lead generator for benchmarks and load tests.
+
+Produces every required upload column with realistic value mixes, including
+N/A values, stray casing/whitespace and malformed phone numbers.
+"""
+import numpy as np
+import pandas as pd
+
+FIRST_NAMES = [
+    'Aarav', 'Priya', 'John', 'Jane', 'Mohammed', 'Fatima', 'Wei', 'Mei', 'Carlos', 'Maria',
+    'Liam', 'Olivia', 'Noah', 'Emma', 'Arjun', 'Ananya', 'David', 'Sarah', 'Kenji', 'Yuki',
+    'Ahmed', 'Aisha', 'Lucas', 'Sofia', 'Rahul', 'Sneha', 'Michael', 'Emily', 'Daniel', 'Grace'
+]
+
+LAST_NAMES = [
+    'Sharma', 'Patel', 'Smith', 'Johnson', 'Khan', 'Ali', 'Chen', 'Wang', 'Garcia', 'Rodriguez',
+    'Brown', 'Jones', 'Miller', 'Davis', 'Iyer', 'Reddy', 'Wilson', 'Taylor', 'Tanaka', 'Sato'
+]
+
+CHANNELS = ['Website', 'Social Media', 'Referral', 'Email', 'Paid Ads', 'Webinar']
+CHANNEL_WEIGHTS = [0.35, 0.25, 0.12, 0.12, 0.11, 0.05]
+
+# (format, weight): digits are filled from a per-row random number
+PHONE_FORMATS = [
+    ('+1 ({a}) {b}-{c}', 0.25),
+    ('{a}{b}{c}', 0.25),
+    ('+91 {a}{b} {c}', 0.2),
+    ('+44 {a} {b} {c}', 0.1),
+    ('0{a}{b}{c}', 0.05),
+    ('{a}-{b}', 0.05),          # too short
+    ('N/A', 0.04),
+    ('call me', 0.03),          # no digits at all
+    ('', 0.03),
+]
+
+def _weighted_choice(rng, options, weights, size):
+    return rng.choice(np.array(options, dtype=object), size=size, p=np.array(weights) / np.sum(weights))
+
+def _yes_no(rng, size, yes_probability, malformed_rate):
+    is_yes = rng.random(size) < yes_probability
+    values = np.where(is_yes, 'Yes', 'No').astype(object)
+
+    # Real sheets mix spellings of the same answer
+    spelling = rng.random(size)
+    lower = spelling < 0.05
+    short = (spelling >= 0.05) & (spelling < 0.08)
+    values[lower] = np.where(is_yes, 'yes', 'no')[lower]
+    values[short] = np.where(is_yes, 'Y', 'N')[short]
+
+    values[rng.random(size) < malformed_rate] = 'maybe'
+    return values
+
+def _phones(rng, size):
+    formats = _weighted_choice(rng, [f for f, _ in PHONE_FORMATS], [w for _, w in PHONE_FORMATS], size)
+    a = rng.integers(200, 999, size)
+    b = rng.integers(200, 999, size)
+    c = rng.integers(1000, 9999, size)
+    return [fmt.format(a=x, b=y, c=z) for fmt, x, y, z in zip(formats, a, b, c)]
+
+def generate_leads(count, seed=42, malformed_rate=0.01):
+    """
+    Generate a DataFrame of synthetic leads with all required columns.
+
+    Args:
+        count (int): Number of leads
+        seed (int): Random seed so runs are reproducible
+        malformed_rate (float): Share of values that fail validation per column
+
+    Returns:
+        pd.DataFrame: Leads shaped like a real upload
+    """
+    rng = np.random.default_rng(seed)
+
+    first = rng.choice(FIRST_NAMES, count)
+    last = rng.choice(LAST_NAMES, count)
+    names = np.char.add(np.char.add(first, ' '), last).astype(object)
+
+    # Most leads never missed a demo, a few missed several
+    # (kept numeric: assess_risk_category cannot score a non-numeric Missed Demos)
+    missed_demos = np.minimum(rng.poisson(0.35, count), 5)
+
+    # Inactivity is long-tailed; fresh leads have no interaction yet (N/A)
+    last_interaction = np.minimum(rng.geometric(0.12, count) - 1, 90).astype(object)
+    last_interaction[rng.random(count) < 0.08] = 'N/A'
+    last_interaction[rng.random(count) < malformed_rate] = 'last week'
+
+    contact_shared = _yes_no(rng, count, 0.55, malformed_rate)
+    contact_shared[rng.random(count) < 0.1] = 'N/A'
+
+    scheduled_by = _weighted_choice(rng, ['Agent', 'Self'], [0.6, 0.4], count)
+    scheduled_by[rng.random(count) < malformed_rate] = 'Bot'
+
+    return pd.DataFrame({
+        'Lead Name': names,
+        'Channel': _weighted_choice(rng, CHANNELS, CHANNEL_WEIGHTS, count),
+        'Contact Number': _phones(rng, count),
+        'Scheduled By': scheduled_by,
+        'Link Clicked': _yes_no(rng, count, 0.5, malformed_rate),
+        'Contact Shared': contact_shared,
+        'Last Interaction Days': last_interaction,
+        'Missed Demos': missed_demos,
+        'Showed Up for Demo': _yes_no(rng, count, 0.3, malformed_rate)
+    })
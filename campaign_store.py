@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEFAULT_CAMPAIGN_DIR = os.path.join('.leadgenius', 'campaigns')
+
+# Added to the export columns; filled in once a campaign has been sent
+SEND_COLUMNS = ['Send Status', 'Message ID']
+
+# Key under which campaign details are kept in the Arrow schema metadata
+_METADATA_KEY = b'leadgenius'
+
+def get_campaign_dir():
+    """Return the directory processed campaigns are saved in."""
+    return os.environ.get("LEADGENIUS_CAMPAIGN_DIR", DEFAULT_CAMPAIGN_DIR)
+
+def _campaign_path(campaign_id, directory=None):
+    return os.path.join(directory or get_campaign_dir(), f"{campaign_id}.arrow")
+
+def _arrow_column(values):
+    # pyarrow is imported lazily; it only matters once campaigns are saved or opened
+    import pyarrow as pa
+
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Spreadsheet columns can mix numbers and text ("N/A"); store those as text
+        return pa.array(values.astype(object).where(values.notna(), None).map(str, na_action='ignore'),
+                        type=pa.string(), from_pandas=True)
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock between processes updating the same campaign (a no-op where fcntl is missing)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _write_table(table, path):
+    import pyarrow as pa
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique per writer, so a half-written file is never replaced or moved by someone else
+    fd, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp', dir=directory or None)
+    os.close(fd)
+    try:
+        # Uncompressed, so readers can map the buffers straight from the page cache
+        with pa.OSFile(temp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def save_campaign(results, name, details=None, directory=None):
+    """
+    Persist a processed campaign as an Arrow IPC (Feather v2) file.
+
+    Args:
+        results (pd.DataFrame): Export frame (uploaded columns, RESULT_COLUMNS and
+                                optionally 'Propensity'), one row per lead
+        name (str): Display name, usually the uploaded file's name
+        details (dict): Extra JSON-serializable details kept with the campaign
+        directory (str): Defaults to get_campaign_dir()
+
+    Returns:
+        str: Campaign id, for open_campaign()
+    """
+    import pyarrow as pa
+
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', os.path.splitext(os.path.basename(name))[0]).strip('-')[:40] or 'campaign'
+    campaign_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:6]}"
+
+    columns = {column: _arrow_column(results[column]) for column in results.columns}
+    for column in SEND_COLUMNS:
+        if column not in columns:
+            columns[column] = pa.nulls(len(results), pa.string())
+
+    risk_counts = results['Risk Score'].value_counts().to_dict() if 'Risk Score' in results.columns else {}
+    metadata = {
+        'id': campaign_id,
+        'name': name,
+        'created_at': time.time(),
+        'rows': len(results),
+        'risk_counts': {str(risk): int(count) for risk, count in risk_counts.items()},
+        'details': details or {}
+    }
+    table = pa.table(columns).replace_schema_metadata({_METADATA_KEY: json.dumps(metadata).encode()})
+    _write_table(table, _campaign_path(campaign_id, directory))
+    return campaign_id
+
+def _read_metadata(schema):
+    return json.loads((schema.metadata or {}).get(_METADATA_KEY, b'{}'))
+
+def list_campaigns(directory=None):
+    """
+    Saved campaigns, newest first.
+
+    Only each file's footer is read, so listing is cheap however large the
+    campaigns are.
+
+    Returns:
+        list: Metadata dicts ('id', 'name', 'created_at', 'rows', 'risk_counts', 'details')
+    """
+    import pyarrow as pa
+
+    directory = directory or get_campaign_dir()
+    if not os.path.isdir(directory):
+        return []
+    campaigns = []
+    for file_name in os.listdir(directory):
+        if not file_name.endswith('.arrow'):
+            continue
+        try:
+            with pa.memory_map(os.path.join(directory, file_name)) as source:
+                metadata = _read_metadata(pa.ipc.open_file(source).schema)
+        except (pa.ArrowInvalid, OSError, ValueError):
+            continue
+        if metadata.get('id'):
+            campaigns.append(metadata)
+    return sorted(campaigns, key=lambda campaign: campaign['created_at'], reverse=True)
+
+# Open campaigns by path, shared by every session in the process
+_open_campaigns = {}
+_open_campaigns_lock = threading.Lock()
+
+def open_campaign(campaign_id, directory=None):
+    """
+    Memory-map a saved campaign.
+
+    The returned table's buffers point into the mapped file: opening takes
+    milliseconds whatever the size, pages are read from disk only when a
+    column is touched, and every session gets the same mapping, so the
+    campaign is held in memory once. A rewritten file (e.g. after
+    record_campaign_sends) is mapped again on the next call.
+
+    Returns:
+        tuple: (pyarrow.Table, metadata dict)
+    """
+    import pyarrow as pa
+
+    path = _campaign_path(campaign_id, directory)
+    # A rewrite replaces the file, so its inode changes even within one mtime tick
+    stat = os.stat(path)
+    modified = (stat.st_mtime_ns, stat.st_ino)
+    with _open_campaigns_lock:
+        cached = _open_campaigns.get(path)
+        if cached is None or cached[0] != modified:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            cached = _open_campaigns[path] = (modified, table, _read_metadata(table.schema))
+    return cached[1], cached[2]
+
+def record_campaign_sends(campaign_id, rows, results, directory=None):
+    """
+    Store send outcomes in a campaign.
+
+    The file is rewritten and swapped in atomically; sessions that already
+    mapped the old version keep reading it until they reopen the campaign.
+    The read, update and rewrite hold a lock on the campaign file, so sender
+    processes recording into the same campaign don't lose each other's rows.
+
+    Args:
+        campaign_id (str): Campaign to update
+        rows: Campaign row positions the results belong to
+        results: Sender result dicts aligned with rows ('success', 'message_id',
+                 and 'retry_at' for recipients skipped by the dedupe window)
+
+    Returns:
+        int: Number of rows updated
+    """
+    with _file_lock(_campaign_path(campaign_id, directory)):
+        return _record_sends(campaign_id, rows, results, directory)
+
+def _record_sends(campaign_id, rows, results, directory):
+    import pyarrow as pa
+
+    table, _ = open_campaign(campaign_id, directory)
+    statuses = table.column('Send Status').to_pylist()
+    message_ids = table.column('Message ID').to_pylist()
+    updated = 0
+    for row, result in zip(rows, results):
+        if result is None:
+            continue
+        if result.get('success'):
+            statuses[row] = 'sent'
+        elif result.get('retry_at') is not None:
+            statuses[row] = 'deduplicated'
+        else:
+            statuses[row] = 'failed'
+        message_ids[row] = result.get('message_id')
+        updated += 1
+
+    table = table.set_column(table.schema.get_field_index('Send Status'), 'Send Status', pa.array(statuses, pa.string()))
+    table = table.set_column(table.schema.get_field_index('Message ID'), 'Message ID', pa.array(message_ids, pa.string()))
+    _write_table(table, _campaign_path(campaign_id, directory))
+    return updated
+
+def delete_campaign(campaign_id, directory=None):
+    """Remove a saved campaign."""
+    path = _campaign_path(campaign_id, directory)
+    with _open_campaigns_lock:
+        _open_campaigns.pop(path, None)
+    for file_path in (path, f"{path}.lock"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
@@ -0,0 +1,184 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS_DB_PATH = os.path.join('.leadgenius', 'delivery_status.db')
+
+# Order in which a message moves through WhatsApp delivery. Webhooks can arrive
+# out of order, so a status only replaces one with a lower rank ('failed' wins).
+STATUS_RANKS = {'accepted': 0, 'sent': 1, 'delivered': 2, 'read': 3, 'failed': 4}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS message_status (
+    message_id TEXT PRIMARY KEY,
+    lead_name TEXT,
+    phone TEXT,
+    status TEXT NOT NULL,
+    status_rank INTEGER NOT NULL,
+    error TEXT,
+    sent_at REAL,
+    status_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS message_status_status ON message_status (status);
+"""
+
+_RECORD_SENT = """
+INSERT INTO message_status (message_id, lead_name, phone, status, status_rank, sent_at, updated_at)
+VALUES (?, ?, ?, 'accepted', 0, ?, ?)
+ON CONFLICT (message_id) DO UPDATE SET
+    lead_name = excluded.lead_name,
+    phone = excluded.phone,
+    sent_at = excluded.sent_at
+"""
+
+_APPLY_STATUS = """
+INSERT INTO message_status (message_id, phone, status, status_rank, error, status_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (message_id) DO UPDATE SET
+    status = excluded.status,
+    status_rank = excluded.status_rank,
+    error = COALESCE(excluded.error, message_status.error),
+    status_at = excluded.status_at,
+    updated_at = excluded.updated_at
+WHERE excluded.status_rank > message_status.status_rank
+"""
+
+def _status_row(event, now):
+    """
+    Table row for one status callback, or None when the event can't be stored
+    (unknown status, no id, a non-numeric timestamp, malformed errors).
+    """
+    if not isinstance(event, dict):
+        return None
+    rank = STATUS_RANKS.get(event.get('status'))
+    if rank is None or not event.get('id'):
+        return None
+    errors = event.get('errors') or []
+    if not isinstance(errors, list) or not all(isinstance(item, dict) for item in errors):
+        return None
+    timestamp = event.get('timestamp')
+    try:
+        status_at = float(timestamp) if timestamp else now
+    except (TypeError, ValueError):
+        return None
+    error = '; '.join(str(item.get('title') or item.get('message') or item.get('code')) for item in errors) or None
+    return (str(event['id']), event.get('recipient_id'), event['status'], rank, error, status_at, now)
+
+def get_status_db_path():
+    """Return the location of the delivery status database."""
+    return os.environ.get("LEADGENIUS_STATUS_DB", DEFAULT_STATUS_DB_PATH)
+
+class DeliveryStatusStore:
+    """
+    SQLite table of sent WhatsApp messages and their latest delivery status.
+
+    Rows are keyed by the Graph API message_id. Sends are recorded with
+    record_sent() and webhook status callbacks are folded in with
+    apply_statuses(), both as one executemany per batch so thousands of
+    events per second fit in a single transaction. The database runs in WAL
+    mode, so dashboards can read while the webhook receiver writes.
+
+    Args:
+        path (str): Database file (defaults to get_status_db_path(); ':memory:' works too)
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_status_db_path()
+        directory = os.path.dirname(self.path)
+        if directory and self.path != ':memory:':
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # The sender and the webhook receiver write at the same time; wait for the lock
+        # instead of failing with "database is locked"
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def record_sent(self, results):
+        """
+        Store messages accepted by the Graph API.
+
+        Args:
+            results: Dicts with 'message_id' and optionally 'lead_name' and 'phone';
+                     entries without a message_id (failed sends) are skipped
+
+        Returns:
+            int: Number of messages recorded
+        """
+        now = time.time()
+        rows = [
+            (result['message_id'], result.get('lead_name'), result.get('phone'), now, now)
+            for result in results if result.get('message_id')
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(_RECORD_SENT, rows)
+        return len(rows)
+
+    def apply_statuses(self, events):
+        """
+        Fold a batch of status callbacks into the table.
+
+        Unknown message ids are inserted (a callback can beat the send's own
+        record_sent), and a status never moves a message backwards. Events
+        that can't be stored (unknown status, no id, a non-numeric timestamp,
+        malformed errors) are logged and skipped, so one bad callback never
+        blocks the rest of the batch.
+
+        Args:
+            events: Dicts with 'id', 'status' and optionally 'timestamp',
+                    'recipient_id' and 'errors', as in the webhook's statuses[]
+
+        Returns:
+            int: Number of events stored
+        """
+        now = time.time()
+        rows = []
+        skipped = 0
+        for event in events:
+            row = _status_row(event, now)
+            if row is None:
+                skipped += 1
+            else:
+                rows.append(row)
+        if skipped:
+            logger.warning("Skipped %d status events that could not be stored", skipped)
+        with self._lock, self._conn:
+            self._conn.executemany(_APPLY_STATUS, rows)
+        return len(rows)
+
+    def get_status(self, message_id):
+        """
+        Look up one message.
+
+        Returns:
+            dict: Row as a dict, or None when the message is unknown
+        """
+        with self._lock:
+            cursor = self._conn.execute('SELECT * FROM message_status WHERE message_id = ?', (message_id,))
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def status_counts(self):
+        """
+        Number of messages per current status.
+
+        Returns:
+            dict: {status: count} for every status in STATUS_RANKS
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM message_status GROUP BY status').fetchall()
+        counts = dict.fromkeys(STATUS_RANKS, 0)
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+# gpt-4o list prices in USD per 1K tokens; override through the environment when they change
+PROMPT_PRICE_PER_1K = float(os.environ.get("LEADGENIUS_PROMPT_PRICE_PER_1K", "0.0025"))
+COMPLETION_PRICE_PER_1K = float(os.environ.get("LEADGENIUS_COMPLETION_PRICE_PER_1K", "0.01"))
+
+# Worst case for one message before any usage has been observed (prompt ~350 tokens + max_tokens=100)
+DEFAULT_TOKENS_PER_REQUEST = 450
+
+class GenerationBudget:
+    """
+    Run-level limits for AI message generation.
+
+    A request is only started while every configured limit (requests, tokens,
+    estimated cost, wall time) still has room for it; token and cost limits
+    use the average usage seen so far to predict the next request. Once a
+    limit is hit the budget stays exhausted and callers fall back to templates.
+    Any limit left as None is unbounded.
+    """
+
+    def __init__(self, max_requests=None, max_tokens=None, max_cost=None, max_seconds=None,
+                 prompt_price_per_1k=PROMPT_PRICE_PER_1K, completion_price_per_1k=COMPLETION_PRICE_PER_1K):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.prompt_price_per_1k = prompt_price_per_1k
+        self.completion_price_per_1k = completion_price_per_1k
+
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.skipped = 0
+        self.exhausted_reason = None
+        self._started_at = None
+        self._usage_samples = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a budget from LEADGENIUS_MAX_REQUESTS / _MAX_TOKENS / _MAX_COST / _MAX_SECONDS."""
+        def read(name, convert):
+            value = os.environ.get(name)
+            return convert(value) if value else None
+
+        return cls(
+            max_requests=read("LEADGENIUS_MAX_REQUESTS", int),
+            max_tokens=read("LEADGENIUS_MAX_TOKENS", int),
+            max_cost=read("LEADGENIUS_MAX_COST", float),
+            max_seconds=read("LEADGENIUS_MAX_SECONDS", float)
+        )
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def estimated_cost(self):
+        return (self.prompt_tokens * self.prompt_price_per_1k
+                + self.completion_tokens * self.completion_price_per_1k) / 1000
+
+    @property
+    def elapsed_seconds(self):
+        return time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+
+    def start(self):
+        """Start the wall-time clock (done automatically by the first acquire)."""
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        return self
+
+    def remaining_seconds(self):
+        """Seconds left before max_seconds, or None without a time limit."""
+        if self.max_seconds is None:
+            return None
+        return max(0.0, self.max_seconds - self.elapsed_seconds)
+
+    def acquire(self):
+        """
+        Reserve room for one API request.
+
+        Returns:
+            bool: True if the request may be sent, False once the budget is exhausted
+        """
+        with self._lock:
+            self.start()
+            if self.exhausted_reason is None:
+                self.exhausted_reason = self._limit_reached()
+            if self.exhausted_reason is not None:
+                self.skipped += 1
+                return False
+            self.requests += 1
+            return True
+
+    def skip(self, count=1):
+        """Count requests that were answered from templates because the budget ran out."""
+        with self._lock:
+            self.skipped += count
+
+    def complete(self, usage=None):
+        """
+        Mark an acquired request as finished.
+
+        Args:
+            usage: The response's usage object (prompt_tokens / completion_tokens),
+                   None if the request failed without one
+        """
+        with self._lock:
+            self._completed += 1
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+                self.completion_tokens += getattr(usage, 'completion_tokens', 0) or 0
+                self._usage_samples += 1
+
+    def report(self):
+        """
+        Summarize the run's usage.
+
+        Returns:
+            dict: Requests, tokens, estimated cost, elapsed time, requests skipped
+                  and why the budget ran out (None if it didn't)
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'total_tokens': self.total_tokens,
+                'estimated_cost': round(self.estimated_cost, 6),
+                'elapsed_seconds': round(self.elapsed_seconds, 3),
+                'skipped_requests': self.skipped,
+                'exhausted_reason': self.exhausted_reason
+            }
+
+    def _limit_reached(self):
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            return 'requests'
+        if self.max_seconds is not None and self.elapsed_seconds >= self.max_seconds:
+            return 'time'
+
+        # Predict the next request from the average so far (requests still in flight have no usage yet)
+        if self._usage_samples:
+            next_prompt = self.prompt_tokens / self._usage_samples
+            next_completion = self.completion_tokens / self._usage_samples
+        else:
+            next_prompt = DEFAULT_TOKENS_PER_REQUEST - 100
+            next_completion = 100
+        pending = self.requests - self._completed
+
+        if self.max_tokens is not None:
+            projected = self.total_tokens + (pending + 1) * (next_prompt + next_completion)
+            if projected > self.max_tokens:
+                return 'tokens'
+        if self.max_cost is not None:
+            next_cost = (next_prompt * self.prompt_price_per_1k + next_completion * self.completion_price_per_1k) / 1000
+            if self.estimated_cost + (pending + 1) * next_cost > self.max_cost:
+                return 'cost'
+        return None
@@ -0,0 +1,278 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_JOB_DB_PATH = os.path.join('.leadgenius', 'jobs.db')
+DEFAULT_JOB_DIR = os.path.join('.leadgenius', 'jobs')
+
+# A running job whose worker hasn't checked in for this long is handed to another worker
+JOB_STALE_SECONDS = float(os.environ.get("LEADGENIUS_JOB_STALE_SECONDS", "60"))
+
+# A job that keeps killing its worker is failed after this many claims
+JOB_MAX_ATTEMPTS = 3
+
+# Jobs that are failed rather than re-run when their worker dies: a send job
+# run again from the start would message every lead it already reached
+NON_RETRYABLE_KINDS = ('send_messages',)
+
+JOB_STATUSES = ['queued', 'running', 'succeeded', 'failed']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+# One statement, so two workers can never claim the same job
+_CLAIM = """
+UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?
+WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1)
+RETURNING *
+"""
+
+def get_job_db_path():
+    """Return the location of the job queue database."""
+    return os.environ.get("LEADGENIUS_JOB_DB", DEFAULT_JOB_DB_PATH)
+
+def get_job_dir():
+    """Return the directory staged uploads and job results are written to."""
+    return os.environ.get("LEADGENIUS_JOB_DIR", DEFAULT_JOB_DIR)
+
+def stage_upload(data, file_name, directory=None):
+    """
+    Save an uploaded file where a worker process can read it.
+
+    Args:
+        data (bytes): File contents
+        file_name (str): Original name (kept as a suffix so the format can be detected)
+        directory (str): Defaults to get_job_dir()/uploads
+
+    Returns:
+        str: Path of the staged file
+    """
+    directory = directory or os.path.join(get_job_dir(), 'uploads')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}-{os.path.basename(file_name)}")
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+class JobQueue:
+    """
+    SQLite-backed queue of processing jobs shared by the app and its workers.
+
+    The app submits jobs and polls get(); any number of worker processes
+    (job_worker.py) claim them. A claim is a single UPDATE ... RETURNING, so
+    workers never race on a job, and WAL mode keeps status polling from
+    blocking the writers. Workers heartbeat while they run; a job whose
+    worker disappeared is put back in the queue by requeue_stale().
+
+    Args:
+        path (str): Database file (defaults to get_job_db_path())
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_job_db_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Workers write at the same time; wait for the lock instead of failing with "database is locked"
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def submit(self, kind, payload):
+        """
+        Add a job to the queue.
+
+        Args:
+            kind (str): Handler name, e.g. 'process_upload' or 'send_messages'
+            payload (dict): JSON-serializable job arguments
+
+        Returns:
+            int: Job id
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, payload, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (kind, json.dumps(payload), time.time())
+            )
+        return cursor.lastrowid
+
+    def claim(self, worker):
+        """
+        Take the oldest queued job.
+
+        Args:
+            worker (str): Name recorded on the job (host and pid)
+
+        Returns:
+            dict: The claimed job, or None when the queue is empty
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(_CLAIM, (worker, now, now)).fetchone()
+        return self._to_job(row)
+
+    def heartbeat(self, job_id):
+        """Mark a running job as still alive."""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?', (time.time(), job_id))
+
+    def set_progress(self, job_id, done, total=None):
+        """Record how much of a running job is finished (also counts as a heartbeat)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET progress_done = ?, progress_total = COALESCE(?, progress_total), heartbeat_at = ? WHERE id = ?',
+                (done, total, time.time(), job_id)
+            )
+
+    def complete(self, job_id, result=None, worker=None):
+        """
+        Mark a running job as succeeded with a JSON-serializable result.
+
+        Returns:
+            bool: False when the job is no longer running under worker (e.g. it
+                  went stale and another worker claimed it), so nothing changed
+        """
+        return self._finish(job_id, 'succeeded', worker, result=json.dumps(result))
+
+    def fail(self, job_id, error, worker=None):
+        """
+        Mark a running job as failed with an error message.
+
+        Returns:
+            bool: False when the job is no longer running under worker
+        """
+        return self._finish(job_id, 'failed', worker, error=str(error))
+
+    def _finish(self, job_id, status, worker, result=None, error=None):
+        # Only the worker holding the claim may finish it; a slow worker whose job was
+        # requeued and claimed again must not overwrite the new run's outcome
+        query = "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running'"
+        params = [status, result, error, time.time(), job_id]
+        if worker is not None:
+            query += ' AND worker = ?'
+            params.append(worker)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(query, params)
+        return cursor.rowcount > 0
+
+    def requeue_stale(self, stale_seconds=JOB_STALE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        """
+        Recover jobs whose worker stopped heartbeating (crashed or killed).
+
+        Jobs of NON_RETRYABLE_KINDS, and jobs that already had max_attempts
+        claims, are failed instead of being queued again.
+
+        Returns:
+            int: Number of jobs put back in the queue
+        """
+        cutoff = time.time() - stale_seconds
+        kinds = ', '.join('?' * len(NON_RETRYABLE_KINDS))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', "
+                "error = 'Worker stopped responding; not retried, some messages may already have been sent', "
+                f"finished_at = ? WHERE status = 'running' AND heartbeat_at < ? AND kind IN ({kinds})",
+                (time.time(), cutoff, *NON_RETRYABLE_KINDS)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), cutoff, max_attempts)
+            )
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                (cutoff,)
+            )
+        return cursor.rowcount
+
+    def get(self, job_id):
+        """
+        Look up one job.
+
+        Returns:
+            dict: Job with its payload and result decoded, or None when unknown
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_job(row)
+
+    def list_jobs(self, status=None, limit=50):
+        """
+        Most recent jobs first.
+
+        Args:
+            status (str): Only jobs with this status
+            limit (int): Maximum number of jobs
+
+        Returns:
+            list: Job dicts
+        """
+        query = 'SELECT * FROM jobs'
+        params = []
+        if status is not None:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def status_counts(self):
+        """
+        Number of jobs per status.
+
+        Returns:
+            dict: {status: count} for every status in JOB_STATUSES
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update((status, count) for status, count in rows)
+        return counts
+
+    @staticmethod
+    def _to_job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_job_queue = None
+
+def get_job_queue():
+    """Shared JobQueue on get_job_db_path(), opened on first use."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
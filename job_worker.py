@@ -0,0 +1,372 @@
+"""
+Worker processes for the job queue (job_queue.py).
+
+Run from the repository root; every process claims one job at a time, so
+throughput scales with the number of workers:
+
+    python -m job_worker --workers 4
+
+'process_upload' jobs read a staged upload, score it, generate messages and
+write the results file; 'send_messages' jobs send a results file through the
+WhatsApp sender pool. The Streamlit app only submits jobs and polls them.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+import metrics
+import stage_profiler
+from job_queue import JobQueue, get_job_db_path, get_job_dir, JOB_STALE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# How often a running job refreshes its heartbeat, well inside JOB_STALE_SECONDS
+HEARTBEAT_SECONDS = 10.0
+
+# Minimum time between progress writes, so fast jobs don't hammer the database
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+def _progress_reporter(queue, job_id, total):
+    last_write = [0.0]
+
+    def report(done, force=False):
+        now = time.monotonic()
+        if force or now - last_write[0] >= PROGRESS_INTERVAL_SECONDS:
+            last_write[0] = now
+            queue.set_progress(job_id, done, total)
+
+    return report
+
+def run_process_upload(job, queue):
+    """
+    Score an uploaded lead file and generate its messages.
+
+    Payload keys: 'path' and 'file_name' of the staged upload, and optionally
+    'variants_per_key', 'budget' (GenerationBudget arguments), 'order'
+    ('urgent' or 'weighted'), 'inactive_first', and 'send' (queue a
+    send_messages job for the results, with an optional 'template').
+
+    Returns:
+        dict: 'results_path', 'rows', 'risk_counts', 'invalid_values',
+              'generation_report', 'campaign_id' and 'send_job_id'
+    """
+    # Heavy imports stay out of the parent process that only supervises workers
+    from lead_pipeline import (
+        read_leads, validate_excel_columns, clean_phone_numbers, create_whatsapp_link, score_leads, INVALID_PHONE_MESSAGE
+    )
+    from risk_assessment import validate_leads
+    from lead_encoding import encode_lead_columns
+    from priority_scheduler import priority_order, DEFAULT_PRIORITY_WEIGHTS
+    from result_export import StreamingExporter, build_export_frame, RESULT_COLUMNS
+    from whatsapp_generator import generate_batch_messages_with_report
+    from generation_budget import GenerationBudget
+    from campaign_store import save_campaign
+
+    payload = job['payload']
+    file_name = payload.get('file_name') or os.path.basename(payload['path'])
+    with metrics.timer('pipeline_stage_seconds', stage='read'), stage_profiler.stage('read'):
+        df = read_leads(payload['path'], file_name)
+    input_columns = list(df.columns)
+    missing_columns = validate_excel_columns(df)
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    progress = _progress_reporter(queue, job['id'], len(df))
+    with metrics.timer('pipeline_stage_seconds', stage='validate'), stage_profiler.stage('validate'):
+        validation_errors, _ = validate_leads(df)
+    with metrics.timer('pipeline_stage_seconds', stage='encode'), stage_profiler.stage('encode'):
+        df = encode_lead_columns(df)
+    with metrics.timer('pipeline_stage_seconds', stage='phone_clean'), stage_profiler.stage('phone_clean'):
+        df['clean_phone'] = clean_phone_numbers(df['Contact Number'])
+    with metrics.timer('pipeline_stage_seconds', stage='score'), stage_profiler.stage('score'):
+        risk_scores, propensity_scores = score_leads(df, with_propensity=True)
+
+    valid_phone = df['clean_phone'].notna().to_numpy()
+    risk_labels = risk_scores.astype(object).where(valid_phone, 'Invalid Phone').tolist()
+    phones = df['clean_phone'].where(valid_phone, 'Invalid').tolist()
+
+    if payload.get('order') in ('urgent', 'weighted'):
+        processing_order = priority_order(
+            risk_labels,
+            weights=DEFAULT_PRIORITY_WEIGHTS if payload['order'] == 'weighted' else None,
+            last_interaction_days=df['Last Interaction Days'] if payload.get('inactive_first') else None
+        ).tolist()
+    else:
+        processing_order = list(range(len(df)))
+
+    messages = [None] * len(df)
+    links = [None] * len(df)
+    pending_rows = []
+    for i in processing_order:
+        if valid_phone[i]:
+            pending_rows.append(i)
+        else:
+            messages[i], links[i] = INVALID_PHONE_MESSAGE, 'N/A'
+
+    # Rows are written in processing order as soon as every row before them is ready
+    job_dir = get_job_dir()
+    os.makedirs(job_dir, exist_ok=True)
+    exporter = StreamingExporter(input_columns + RESULT_COLUMNS, directory=job_dir)
+    cursor = [0]
+
+    def export_ready_rows():
+        start = end = cursor[0]
+        while end < len(processing_order) and messages[processing_order[end]] is not None:
+            end += 1
+        if end == start:
+            return
+        rows = processing_order[start:end]
+        exporter.append(build_export_frame(df[input_columns].iloc[rows], {
+            'Risk Score': [risk_labels[i] for i in rows],
+            'Phone': [phones[i] for i in rows],
+            'WhatsApp Message': [messages[i] for i in rows],
+            'WhatsApp Link': [links[i] for i in rows]
+        }))
+        cursor[0] = end
+        progress(end)
+
+    def on_generated_rows(rows, generated):
+        for row, message in zip(rows, generated):
+            i = pending_rows[row]
+            messages[i] = message
+            links[i] = create_whatsapp_link(phones[i], message)
+        export_ready_rows()
+
+    budget = GenerationBudget(**payload['budget']) if payload.get('budget') else GenerationBudget.from_env()
+    try:
+        with metrics.timer('pipeline_stage_seconds', stage='message_generate'), stage_profiler.stage('message_generate'):
+            _, report = generate_batch_messages_with_report(
+                [{'lead_name': df['Lead Name'].iat[i], 'risk_score': risk_labels[i]} for i in pending_rows],
+                # Same seed as the app, so a file gets the same template variants either way
+                seed=zlib.crc32(file_name.encode()),
+                variants_per_key=payload.get('variants_per_key', 1),
+                budget=budget,
+                on_rows=on_generated_rows
+            )
+        export_ready_rows()
+        results_path = os.path.join(job_dir, f"job-{job['id']}-results.csv")
+        os.replace(exporter.finalize('csv'), results_path)
+    finally:
+        exporter.cleanup()
+    progress(len(df), force=True)
+    metrics.increment('pipeline_leads_processed_total', len(df))
+
+    # Saved in the results file's order, so a send job can address campaign rows by results row
+    campaign_frame = build_export_frame(df[input_columns].iloc[processing_order], {
+        'Risk Score': [risk_labels[i] for i in processing_order],
+        'Phone': [phones[i] for i in processing_order],
+        'WhatsApp Message': [messages[i] for i in processing_order],
+        'WhatsApp Link': [links[i] for i in processing_order]
+    })
+    campaign_frame['Propensity'] = propensity_scores.to_numpy()[processing_order]
+    with stage_profiler.stage('campaign_save'):
+        campaign_id = save_campaign(campaign_frame, file_name, {'job_id': job['id']})
+
+    send_job_id = None
+    if payload.get('send'):
+        send_job_id = queue.submit('send_messages', {
+            'results_path': results_path, 'template': payload.get('template'), 'campaign_id': campaign_id
+        })
+
+    # The concurrency snapshot is live limiter state, not part of this job's outcome
+    report.pop('concurrency', None)
+    return {
+        'results_path': results_path,
+        'rows': len(df),
+        'risk_counts': dict(Counter(risk_labels)),
+        'invalid_values': int(validation_errors['Row'].nunique()) if len(validation_errors) else 0,
+        'generation_report': report,
+        'campaign_id': campaign_id,
+        'send_job_id': send_job_id
+    }
+
+def run_send_messages(job, queue):
+    """
+    Send every valid row of a results file through the WhatsApp sender pool.
+
+    Payload keys: 'results_path' (CSV written by a process_upload job) and
+    optionally 'template' (as for SenderPool.send_batch_messages) and the
+    'campaign_id' whose send status columns get the outcomes.
+
+    Returns:
+        dict: 'sent', 'failed', 'deduplicated' and per-account 'accounts' counters
+    """
+    import pandas as pd
+    from sender_pool import SenderPool
+    from recipient_index import get_recipient_index
+    from delivery_status import DeliveryStatusStore
+    from campaign_store import record_campaign_sends
+
+    payload = job['payload']
+    results = pd.read_csv(payload['results_path'], dtype=str, keep_default_na=False)
+    results = results[results['Risk Score'] != 'Invalid Phone']
+    messages_data = [
+        {'lead_name': name, 'phone': phone, 'message': message}
+        for name, phone, message in zip(results['Lead Name'], results['Phone'], results['WhatsApp Message'])
+    ]
+
+    pool = SenderPool.from_env(recipient_index=get_recipient_index(), status_store=DeliveryStatusStore())
+    if not pool.is_configured():
+        raise RuntimeError("WhatsApp sending is not configured (WHATSAPP_ACCESS_TOKEN / WHATSAPP_PHONE_NUMBER_ID)")
+
+    progress = _progress_reporter(queue, job['id'], len(messages_data))
+    counts = {'sent': 0, 'failed': 0, 'deduplicated': 0}
+
+    def on_result(_, result):
+        if result['success']:
+            counts['sent'] += 1
+        elif result.get('retry_at') is not None:
+            counts['deduplicated'] += 1
+        else:
+            counts['failed'] += 1
+        progress(sum(counts.values()))
+
+    send_results = pool.send_batch_messages(messages_data, on_result=on_result, template=payload.get('template'))
+    progress(len(messages_data), force=True)
+    if payload.get('campaign_id'):
+        record_campaign_sends(payload['campaign_id'], results.index.tolist(), send_results)
+    return dict(counts, accounts=pool.snapshot())
+
+JOB_HANDLERS = {
+    'process_upload': run_process_upload,
+    'send_messages': run_send_messages
+}
+
+def run_job(job, queue, profile=None):
+    """
+    Run one claimed job and record its outcome, heartbeating while it runs.
+
+    Args:
+        job (dict): Claimed job
+        queue (JobQueue): Queue to report to
+        profile (bool): Profile the job's stages (stage_profiler); None samples
+                        at LEADGENIUS_PROFILE_SAMPLE_RATE. The report path is
+                        added to the result as 'profile_path'.
+
+    Returns:
+        bool: True when the job succeeded
+    """
+    handler = JOB_HANDLERS.get(job['kind'])
+    if handler is None:
+        _record_outcome(queue.fail(job['id'], f"Unknown job kind: {job['kind']}", job['worker']), job)
+        return False
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            queue.heartbeat(job['id'])
+
+    beater = threading.Thread(target=heartbeat, daemon=True)
+    beater.start()
+    try:
+        with (metrics.timer('job_seconds', kind=job['kind']),
+              stage_profiler.profile_run(f"job-{job['id']}-{job['kind']}", enabled=profile) as profile_report):
+            result = handler(job, queue)
+        if profile_report:
+            result['profile_path'] = profile_report['path']
+    except Exception as e:
+        _record_outcome(queue.fail(job['id'], f"{type(e).__name__}: {e}", job['worker']), job)
+        metrics.increment('jobs_total', kind=job['kind'], result='failure')
+        return False
+    finally:
+        stop.set()
+        beater.join()
+        _remove_staged_upload(job)
+    _record_outcome(queue.complete(job['id'], result, job['worker']), job)
+    metrics.increment('jobs_total', kind=job['kind'], result='success')
+    return True
+
+def _record_outcome(recorded, job):
+    # The job went stale while it ran and was requeued or failed; the newer outcome stands
+    if not recorded:
+        logger.warning("Job %s (%s) was taken over by another worker; its outcome from %s was not recorded",
+                       job['id'], job['kind'], job['worker'])
+        metrics.increment('jobs_superseded_total', kind=job['kind'])
+
+def _remove_staged_upload(job):
+    # The job is finished either way; a worker that dies before this keeps the file for the retry
+    path = job['payload'].get('path') if job['kind'] == 'process_upload' else None
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def run_worker(db_path=None, poll_interval=1.0, exit_when_empty=False, profile=None):
+    """
+    Claim and run jobs until interrupted.
+
+    Args:
+        db_path (str): Job database (defaults to get_job_db_path())
+        poll_interval (float): Seconds to wait when the queue is empty
+        exit_when_empty (bool): Return once no job is left instead of polling
+        profile (bool): Profile every job (True), none (False) or a sample (None), as in run_job
+
+    Returns:
+        int: Number of jobs run
+    """
+    queue = JobQueue(db_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    jobs_run = 0
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                # Idle workers pick up after crashed ones
+                if queue.requeue_stale(JOB_STALE_SECONDS):
+                    continue
+                if exit_when_empty:
+                    return jobs_run
+                time.sleep(poll_interval)
+                continue
+            run_job(job, queue, profile)
+            jobs_run += 1
+    except KeyboardInterrupt:
+        return jobs_run
+    finally:
+        queue.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run job queue workers for lead processing and sending.")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes to start")
+    parser.add_argument('--db', help="Job database (defaults to LEADGENIUS_JOB_DB or .leadgenius/jobs.db)")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between polls of an empty queue")
+    parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile every job stage by stage (reports in LEADGENIUS_PROFILE_DIR)")
+    parser.add_argument('--profile-sample-rate', type=float,
+                        help="Profile this share of jobs instead (defaults to LEADGENIUS_PROFILE_SAMPLE_RATE)")
+    args = parser.parse_args(argv)
+
+    if args.profile_sample_rate is not None:
+        # Read by stage_profiler in the worker processes too
+        os.environ["LEADGENIUS_PROFILE_SAMPLE_RATE"] = str(args.profile_sample_rate)
+        stage_profiler.PROFILE_SAMPLE_RATE = args.profile_sample_rate
+    profile = True if args.profile else None
+
+    if args.workers <= 1:
+        run_worker(args.db, args.poll_interval, args.once, profile)
+        return 0
+
+    print(f"Starting {args.workers} workers on {args.db or get_job_db_path()} (Ctrl+C to stop)")
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.db, args.poll_interval, args.once, profile), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
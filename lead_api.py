@@ -0,0 +1,434 @@
+"""
+HTTP API for scoring leads and generating their WhatsApp messages.
+
+Run from the repository root:
+
+    LEADGENIUS_API_TOKEN=secret python -m lead_api --port 8095
+
+POST /v1/score and POST /v1/messages take a JSON array of leads (or
+{"leads": [...], "seed": 0}) with the same fields as the upload sheet,
+either as column names ("Lead Name") or snake_case ("lead_name"). An "id"
+field is echoed back. Add ?stream=1 (or Accept: application/x-ndjson) to get
+one JSON line per lead, written as soon as the lead is ready.
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+import metrics
+from lead_pipeline import REQUIRED_COLUMNS, INVALID_PHONE_MESSAGE, clean_phone_numbers, create_whatsapp_link, score_leads
+from lead_encoding import encode_lead_columns
+from whatsapp_generator import generate_batch_messages_with_report, has_openai_api_key
+from generation_budget import GenerationBudget
+
+logger = logging.getLogger(__name__)
+
+# Requests larger than this are rejected before being read
+API_MAX_BODY_BYTES = int(os.environ.get("LEADGENIUS_API_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
+# Generated messages kept per (lead name, risk category), so re-scoring a CRM row doesn't pay for a new one
+API_MESSAGE_CACHE_SIZE = int(os.environ.get("LEADGENIUS_API_MESSAGE_CACHE_SIZE", "10000"))
+
+# Leads per write when streaming scores
+STREAM_CHUNK_ROWS = 1000
+
+# snake_case spelling of every column, accepted as an alternative field name
+FIELD_ALIASES = {column.lower().replace(' ', '_'): column for column in REQUIRED_COLUMNS}
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+class MessageCache:
+    """
+    Thread-safe LRU of generated messages keyed by (lead_name, risk_score).
+
+    Args:
+        max_size (int): Entries kept; 0 disables caching
+    """
+
+    def __init__(self, max_size=API_MESSAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._messages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def get(self, key):
+        with self._lock:
+            message = self._messages.get(key)
+            if message is None:
+                self.misses += 1
+                return None
+            self._messages.move_to_end(key)
+            self.hits += 1
+            return message
+
+    def put_many(self, items):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, message in items:
+                self._messages[key] = message
+                self._messages.move_to_end(key)
+            while len(self._messages) > self.max_size:
+                self._messages.popitem(last=False)
+
+def leads_frame(records):
+    """
+    Build the lead DataFrame from API records.
+
+    Args:
+        records (list): Lead objects keyed by column name or its snake_case alias
+
+    Returns:
+        pd.DataFrame: One row per record with REQUIRED_COLUMNS (plus 'id' when given)
+
+    Raises:
+        ValueError: When the body isn't a list of objects, a field isn't a scalar
+                    or a column is missing
+    """
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Expected a JSON array of lead objects")
+    nested_fields = sorted({key for record in records for key, value in record.items() if isinstance(value, (list, dict))})
+    if nested_fields:
+        raise ValueError(f"Fields must be strings, numbers, booleans or null: {', '.join(map(str, nested_fields))}")
+    df = pd.DataFrame.from_records(records)
+    df = df.rename(columns={alias: column for alias, column in FIELD_ALIASES.items() if alias in df.columns})
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if records and missing_columns:
+        raise ValueError(f"Missing required fields: {', '.join(missing_columns)}")
+    return df
+
+def score_records(records):
+    """
+    Score API records with the vectorized scorer.
+
+    Returns:
+        tuple: (ids, lead_names, phones, risk_categories, propensity_scores) as lists;
+               ids is None when no record carried an 'id', phones are None when invalid
+    """
+    df = leads_frame(records)
+    if df.empty:
+        return None, [], [], [], []
+    df = encode_lead_columns(df)
+    phones = clean_phone_numbers(df['Contact Number'])
+    risk_scores, propensity_scores = score_leads(df, with_propensity=True)
+    # Missing values become None, so results stay valid JSON (no NaN)
+    ids = df['id'].astype(object).where(df['id'].notna(), None).tolist() if 'id' in df.columns else None
+    lead_names = df['Lead Name'].astype(object).where(df['Lead Name'].notna(), None).tolist()
+    return ids, lead_names, phones.tolist(), risk_scores.tolist(), propensity_scores.tolist()
+
+def _lead_result(position, ids, lead_names, phones, risk_scores, propensity_scores):
+    result = {
+        'lead_name': lead_names[position],
+        'risk_score': risk_scores[position],
+        'propensity': propensity_scores[position],
+        'phone': phones[position]
+    }
+    if ids is not None:
+        result = {'id': ids[position], **result}
+    return result
+
+def generate_record_messages(lead_names, risk_scores, phones, seed=0, cache=None, on_ready=None):
+    """
+    Messages and wa.me links for scored leads, reusing cached messages.
+
+    Only leads with a valid phone that miss the cache go to the generator,
+    so a CRM re-sending unchanged leads costs no AI calls. Messages are only
+    cached when they came from the AI model within budget, never template
+    fallbacks.
+
+    Args:
+        lead_names, risk_scores, phones: Aligned lists from score_records
+        seed (int): Template variant seed for fallback messages
+        cache (MessageCache): Optional message cache
+        on_ready (callable): Called as on_ready(end, messages, links) whenever
+                             leads [0, end) have their messages, while the
+                             rest is still generating
+
+    Returns:
+        tuple: (messages, links, report)
+    """
+    messages = [None] * len(lead_names)
+    links = [None] * len(lead_names)
+    pending_rows = []
+    for i, phone in enumerate(phones):
+        if phone is None:
+            messages[i] = INVALID_PHONE_MESSAGE
+            continue
+        cached = cache.get((lead_names[i], risk_scores[i])) if cache is not None else None
+        if cached is None:
+            pending_rows.append(i)
+        else:
+            messages[i] = cached
+            links[i] = create_whatsapp_link(phone, cached)
+
+    cursor = [0]
+
+    def emit_ready():
+        end = cursor[0]
+        while end < len(messages) and messages[end] is not None:
+            end += 1
+        if end > cursor[0]:
+            cursor[0] = end
+            if on_ready is not None:
+                on_ready(end, messages, links)
+
+    def on_rows(rows, generated):
+        for row, message in zip(rows, generated):
+            i = pending_rows[row]
+            messages[i] = message
+            links[i] = create_whatsapp_link(phones[i], message)
+        emit_ready()
+
+    report = {'requests': 0, 'api_calls': 0, 'calls_saved': 0}
+    if pending_rows:
+        budget = GenerationBudget.from_env()
+        _, report = generate_batch_messages_with_report(
+            # A record without a name gets the generator's default greeting ("Hi there")
+            [{'lead_name': lead_names[i] if lead_names[i] is not None else 'there', 'risk_score': risk_scores[i]}
+             for i in pending_rows],
+            seed=seed, budget=budget, on_rows=on_rows
+        )
+        report.pop('concurrency', None)
+        if cache is not None and has_openai_api_key() and budget.exhausted_reason is None:
+            cache.put_many(((lead_names[i], risk_scores[i]), messages[i]) for i in pending_rows)
+    emit_ready()
+    report['cache_hits'] = len(lead_names) - len(pending_rows) - phones.count(None)
+    return messages, links, report
+
+class LeadApiServer:
+    """
+    Threaded HTTP server exposing the scoring and message pipeline.
+
+    Args:
+        host (str), port (int): Bind address (port 0 picks a free port)
+        api_token (str): When set, requests need 'Authorization: Bearer <token>'
+                         (defaults to LEADGENIUS_API_TOKEN)
+        cache (MessageCache): Message cache shared by all requests
+    """
+
+    def __init__(self, host='127.0.0.1', port=8095, api_token=None, cache=None):
+        self.api_token = api_token or os.environ.get("LEADGENIUS_API_TOKEN")
+        self.cache = cache if cache is not None else MessageCache()
+        self.stats = {'requests': 0, 'leads': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        # Run one lead through the scorer first so the first real request doesn't pay pandas' warm-up
+        score_records([{column: '0' for column in REQUIRED_COLUMNS}])
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _count(self, **counts):
+        with self._stats_lock:
+            for name, count in counts.items():
+                self.stats[name] += count
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out as separate writes; with Nagle on, keep-alive clients wait ~40ms for each response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                path = urlparse(self.path).path.rstrip('/')
+                if path == '/healthz':
+                    self._send_json(200, {'status': 'ok'})
+                elif path == '/stats' and self._authorized():
+                    with server._stats_lock:
+                        stats = dict(server.stats)
+                    stats.update(cache_size=len(server.cache), cache_hits=server.cache.hits, cache_misses=server.cache.misses)
+                    self._send_json(200, stats)
+                elif path == '/stats':
+                    self._send_json(401, {'error': 'Unauthorized'})
+                else:
+                    self._send_json(404, {'error': 'Not found'})
+
+            def do_POST(self):
+                self._response_started = False
+                try:
+                    self._post()
+                except Exception:
+                    logger.exception("Unhandled error serving %s", self.path)
+                    server._count(errors=1)
+                    if self._response_started:
+                        # Mid-stream: ending the connection without the final chunk tells the client it failed
+                        self.close_connection = True
+                    else:
+                        self._send_json(500, {'error': 'Internal server error'})
+
+            def _post(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rstrip('/')
+                length = int(self.headers.get('Content-Length', 0))
+                if length > API_MAX_BODY_BYTES:
+                    self.close_connection = True
+                    self._send_json(413, {'error': f'Request body over {API_MAX_BODY_BYTES} bytes'})
+                    return
+                body = self.rfile.read(length)
+
+                if endpoint not in ('/v1/score', '/v1/messages'):
+                    self._send_json(404, {'error': 'Not found'})
+                    return
+                if not self._authorized():
+                    self._send_json(401, {'error': 'Unauthorized'})
+                    return
+
+                try:
+                    payload = json.loads(body or b'[]')
+                    if isinstance(payload, dict):
+                        records, seed = payload.get('leads'), payload.get('seed', 0)
+                        if isinstance(seed, bool) or not isinstance(seed, (int, float, str)):
+                            raise ValueError("'seed' must be an integer")
+                        seed = int(seed)
+                        if seed < 0:
+                            raise ValueError("'seed' must be a non-negative integer")
+                    else:
+                        records, seed = payload, 0
+                    started = time.perf_counter()
+                    scored = score_records(records)
+                    metrics.observe('api_stage_seconds', time.perf_counter() - started, stage='score')
+                except (TypeError, ValueError, OverflowError) as e:
+                    server._count(requests=1, errors=1)
+                    self._send_json(400, {'error': str(e)})
+                    return
+
+                query = parse_qs(url.query)
+                stream = (query.get('stream', ['0'])[0].lower() in ('1', 'true', 'yes')
+                          or NDJSON_CONTENT_TYPE in self.headers.get('Accept', ''))
+                server._count(requests=1, leads=len(scored[1]))
+                name = endpoint.rsplit('/', 1)[1]
+                metrics.increment('api_leads_total', len(scored[1]), endpoint=name)
+                with metrics.timer('api_request_seconds', endpoint=name, stream=str(stream).lower()):
+                    if endpoint == '/v1/score':
+                        self._score(scored, stream)
+                    else:
+                        self._messages(scored, seed, stream)
+
+            def _score(self, scored, stream):
+                results = [_lead_result(i, *scored) for i in range(len(scored[1]))]
+                if not stream:
+                    self._send_json(200, {'results': results})
+                    return
+                self._start_stream()
+                for start in range(0, len(results), STREAM_CHUNK_ROWS):
+                    self._write_lines(results[start:start + STREAM_CHUNK_ROWS])
+                self._end_stream()
+
+            def _messages(self, scored, seed, stream):
+                _, lead_names, phones, risk_scores, _ = scored
+                written = [0]
+
+                def results(start, end, messages, links):
+                    return [
+                        dict(_lead_result(i, *scored), message=messages[i], whatsapp_link=links[i])
+                        for i in range(start, end)
+                    ]
+
+                def on_ready(end, messages, links):
+                    # Leads go out in input order as soon as every lead before them is done
+                    self._write_lines(results(written[0], end, messages, links))
+                    written[0] = end
+
+                if stream:
+                    self._start_stream()
+                    generate_record_messages(lead_names, risk_scores, phones, seed, server.cache, on_ready=on_ready)
+                    self._end_stream()
+                else:
+                    messages, links, report = generate_record_messages(lead_names, risk_scores, phones, seed, server.cache)
+                    self._send_json(200, {'results': results(0, len(lead_names), messages, links), 'report': report})
+
+            def _authorized(self):
+                if not server.api_token:
+                    return True
+                header = self.headers.get('Authorization', '')
+                return hmac.compare_digest(header.encode(), f"Bearer {server.api_token}".encode())
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload, separators=(',', ':')).encode()
+                self._response_started = True
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _start_stream(self):
+                self._response_started = True
+                self.send_response(200)
+                self.send_header('Content-Type', NDJSON_CONTENT_TYPE)
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+            def _write_lines(self, results):
+                if not results:
+                    return
+                data = ''.join(json.dumps(result, separators=(',', ':')) + '\n' for result in results).encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def _end_stream(self):
+                self.wfile.write(b'0\r\n\r\n')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve lead scoring and message generation over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8095)
+    parser.add_argument('--token', help="Bearer token required on requests (defaults to LEADGENIUS_API_TOKEN)")
+    args = parser.parse_args(argv)
+
+    server = LeadApiServer(args.host, args.port, api_token=args.token)
+    print(f"Lead API on {server.url} (Ctrl+C to stop)")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
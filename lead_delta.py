@@ -0,0 +1,188 @@
+import os
+import pandas as pd
+from lead_encoding import TRUE_VALUES, FALSE_VALUES
+
+# Fields that feed assess_risk_category; a lead is only re-scored when one of these changes
+RISK_INPUT_FIELDS = [
+    'Missed Demos', 'Last Interaction Days', 'Contact Shared',
+    'Link Clicked', 'Scheduled By', 'Showed Up for Demo'
+]
+
+NUMERIC_INPUT_FIELDS = ['Missed Demos', 'Last Interaction Days']
+
+BOOLEAN_INPUT_FIELDS = ['Contact Shared', 'Link Clicked', 'Showed Up for Demo']
+
+SNAPSHOT_COLUMNS = ['Fingerprint', 'Risk Score', 'WhatsApp Message', 'WhatsApp Link']
+
+DEFAULT_SNAPSHOT_PATH = os.path.join('.leadgenius', 'lead_snapshot.pkl')
+
+def get_snapshot_path():
+    """Return the location of the last processed lead snapshot."""
+    return os.environ.get("LEADGENIUS_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+def build_lead_keys(df, phone_column='clean_phone'):
+    """
+    Build a stable key for each lead from its cleaned phone number and name.
+
+    Duplicate phone/name pairs within one upload get an occurrence suffix so
+    every row still maps to exactly one key.
+
+    Args:
+        df: DataFrame with 'Lead Name' and the cleaned phone column
+        phone_column (str): Column holding the cleaned phone number
+
+    Returns:
+        pd.Series: Lead keys aligned with df.index
+    """
+    if phone_column in df.columns:
+        phone = df[phone_column].fillna('').astype(str)
+    else:
+        phone = pd.Series('', index=df.index)
+
+    name = df['Lead Name'].fillna('').astype(str).str.strip().str.lower()
+    base_key = phone + '|' + name
+    occurrence = base_key.groupby(base_key).cumcount()
+
+    return base_key + '#' + occurrence.astype(str)
+
+def _normalize_input_field(values, field):
+    """Normalize one risk input column so cosmetic differences don't count as changes."""
+    text = values.astype(str).str.strip().str.lower()
+
+    if field in NUMERIC_INPUT_FIELDS:
+        # 3, 3.0 and "3" must fingerprint the same (Excel turns int columns into floats around blanks)
+        numeric = pd.to_numeric(values, errors='coerce')
+        is_number = numeric.notna()
+        text = text.where(~is_number, numeric.astype('float64').map(repr))
+    elif field in BOOLEAN_INPUT_FIELDS:
+        # "Yes", "y" and an encoded True are the same answer
+        text = text.where(~text.isin(TRUE_VALUES), 'yes')
+        text = text.where(~text.isin(FALSE_VALUES), 'no')
+
+    return text.where(values.notna(), 'n/a')
+
+def fingerprint_leads(df):
+    """
+    Fingerprint the risk-relevant fields of every lead in one vectorized pass.
+
+    Args:
+        df: DataFrame containing all RISK_INPUT_FIELDS
+
+    Returns:
+        pd.Series: uint64 fingerprint per lead, aligned with df.index
+    """
+    normalized = pd.DataFrame(
+        {field: _normalize_input_field(df[field], field) for field in RISK_INPUT_FIELDS},
+        index=df.index
+    )
+    return pd.util.hash_pandas_object(normalized, index=False)
+
+def compute_lead_delta(lead_keys, fingerprints, snapshot):
+    """
+    Compare the current upload against the previously processed snapshot.
+
+    Args:
+        lead_keys (pd.Series): Keys from build_lead_keys
+        fingerprints (pd.Series): Fingerprints from fingerprint_leads
+        snapshot (pd.DataFrame or None): Previous snapshot indexed by lead key
+
+    Returns:
+        dict: 'status' Series ('new', 'changed' or 'unchanged') plus the previous
+              risk score, message and link aligned with the current rows, and the
+              number of leads that disappeared since the snapshot
+    """
+    if snapshot is None or snapshot.empty:
+        empty = pd.Series(None, index=lead_keys.index, dtype=object)
+        return {
+            'status': pd.Series('new', index=lead_keys.index),
+            'previous_risk': empty,
+            'previous_message': empty,
+            'previous_link': empty,
+            'removed': 0
+        }
+
+    # Positional lookup keeps the uint64 fingerprints exact (reindex would upcast them to float)
+    positions = snapshot.index.get_indexer(lead_keys.values)
+    is_new = positions < 0
+    safe_positions = positions.clip(min=0)
+
+    previous_fingerprints = snapshot['Fingerprint'].to_numpy()[safe_positions]
+    is_same = ~is_new & (previous_fingerprints == fingerprints.to_numpy())
+
+    status = pd.Series('changed', index=lead_keys.index)
+    status[is_new] = 'new'
+    status[is_same] = 'unchanged'
+
+    def _previous(column):
+        values = pd.Series(snapshot[column].to_numpy(dtype=object)[safe_positions], index=lead_keys.index)
+        return values.where(~is_new, None)
+
+    removed = int((~snapshot.index.isin(lead_keys.values)).sum())
+
+    return {
+        'status': status,
+        'previous_risk': _previous('Risk Score'),
+        'previous_message': _previous('WhatsApp Message'),
+        'previous_link': _previous('WhatsApp Link'),
+        'removed': removed
+    }
+
+def summarize_lead_delta(delta):
+    """
+    Count new, changed, unchanged and removed leads in a delta.
+
+    Args:
+        delta (dict): Result of compute_lead_delta
+
+    Returns:
+        dict: Counts for each delta status
+    """
+    counts = delta['status'].value_counts()
+    return {
+        'new': int(counts.get('new', 0)),
+        'changed': int(counts.get('changed', 0)),
+        'unchanged': int(counts.get('unchanged', 0)),
+        'removed': delta['removed']
+    }
+
+def build_snapshot(lead_keys, fingerprints, risk_scores, messages, links):
+    """
+    Build the snapshot of a fully processed upload for the next delta run.
+
+    Returns:
+        pd.DataFrame: Snapshot indexed by lead key
+    """
+    return pd.DataFrame({
+        'Fingerprint': fingerprints.astype('uint64').values,
+        'Risk Score': list(risk_scores),
+        'WhatsApp Message': list(messages),
+        'WhatsApp Link': list(links)
+    }, index=pd.Index(lead_keys.values, name='Lead Key'))
+
+def load_snapshot(path=None):
+    """Load the previous snapshot, or None if nothing has been processed yet."""
+    path = path or get_snapshot_path()
+    if not os.path.exists(path):
+        return None
+
+    try:
+        snapshot = pd.read_pickle(path)
+    except Exception as e:
+        print(f"Error loading lead snapshot: {str(e)}")
+        return None
+
+    if list(snapshot.columns) != SNAPSHOT_COLUMNS:
+        return None
+    return snapshot
+
+def save_snapshot(snapshot, path=None):
+    """Persist the snapshot so the next upload can be processed incrementally."""
+    path = path or get_snapshot_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Write then rename so a crash never leaves a truncated snapshot behind
+    temp_path = f"{path}.tmp"
+    snapshot.to_pickle(temp_path)
+    os.replace(temp_path, path)
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+# Yes/No style columns; Contact Shared keeps N/A as <NA>
+BOOLEAN_COLUMNS = ['Link Clicked', 'Showed Up for Demo', 'Contact Shared']
+
+# Low-cardinality text columns
+CATEGORY_COLUMNS = ['Scheduled By', 'Channel']
+
+# Day and demo counts, stored in the smallest nullable integer type that fits
+COUNT_COLUMNS = ['Missed Demos', 'Last Interaction Days']
+
+TRUE_VALUES = ['yes', 'y', '1', 'true']
+FALSE_VALUES = ['no', 'n', '0', 'false']
+NA_VALUES = ['n/a', 'na', '']
+
+RISK_SCORE_DTYPE = pd.CategoricalDtype(['High', 'Medium', 'Low', 'Invalid Phone'])
+
+def _encode_boolean(values):
+    """
+    Map Yes/No-like values to a nullable boolean column (N/A and blanks become <NA>).
+
+    A column with any other value ("maybe", typos) is kept as a categorical
+    of its original values instead: the scorers treat those differently
+    from N/A, so folding them into <NA> would change their risk category.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    lookup = []
+    for value in uniques:
+        normalized = str(value).strip().lower()
+        if normalized in TRUE_VALUES:
+            lookup.append(True)
+        elif normalized in FALSE_VALUES:
+            lookup.append(False)
+        elif normalized in NA_VALUES:
+            lookup.append(pd.NA)
+        else:
+            return values.astype('category')
+    lookup.append(pd.NA)  # NA sentinel (-1) picks the last slot
+
+    return pd.Series(pd.array(np.array(lookup, dtype=object)[codes], dtype='boolean'), index=values.index)
+
+def _encode_count(values):
+    """Convert a count column to the smallest nullable integer type (N/A becomes <NA>)."""
+    numeric = pd.to_numeric(values, errors='coerce')
+    # int() truncates in assess_risk_category, keep the same semantics
+    numeric = np.trunc(numeric)
+
+    non_missing = numeric.dropna()
+    for dtype in ('Int8', 'Int16', 'Int32'):
+        info = np.iinfo(dtype.lower())
+        if non_missing.empty or (non_missing.min() >= info.min and non_missing.max() <= info.max):
+            return numeric.astype(dtype)
+    return numeric.astype('Int64')
+
+def encode_lead_columns(df):
+    """
+    Convert lead fields to compact dtypes right after reading.
+
+    Yes/No columns become nullable booleans (categoricals when they hold
+    other values), Scheduled By / Channel / Risk Score become categoricals
+    and day/demo counts become small nullable integers. assess_risk_category
+    and assess_risk_scores treat the encoded values the same as the raw strings.
+
+    Args:
+        df: DataFrame as read from the upload
+
+    Returns:
+        pd.DataFrame: New DataFrame with compact column dtypes
+    """
+    encoded = df.copy()
+
+    for column in BOOLEAN_COLUMNS:
+        if column in encoded.columns:
+            encoded[column] = _encode_boolean(encoded[column])
+
+    for column in CATEGORY_COLUMNS:
+        if column in encoded.columns:
+            encoded[column] = encoded[column].astype('category')
+
+    for column in COUNT_COLUMNS:
+        if column in encoded.columns:
+            encoded[column] = _encode_count(encoded[column])
+
+    if 'Risk Score' in encoded.columns:
+        encoded['Risk Score'] = encoded['Risk Score'].astype(RISK_SCORE_DTYPE)
+
+    return encoded
+
+def decode_lead_columns(df):
+    """
+    Turn encoded columns back into the spreadsheet's readable values for export.
+
+    Booleans become Yes/No, counts become plain numbers and missing values
+    become N/A, like in the uploaded file.
+
+    Args:
+        df: DataFrame returned by encode_lead_columns (or any slice of it)
+
+    Returns:
+        pd.DataFrame: New DataFrame with object columns for the decoded fields
+    """
+    decoded = df.copy()
+
+    for column in BOOLEAN_COLUMNS:
+        if column in decoded.columns and decoded[column].dtype == 'boolean':
+            values = decoded[column]
+            decoded[column] = np.where(values.isna(), 'N/A', np.where(values.fillna(False), 'Yes', 'No'))
+
+    for column in COUNT_COLUMNS:
+        if column in decoded.columns and pd.api.types.is_integer_dtype(decoded[column].dtype):
+            decoded[column] = decoded[column].astype(object).where(decoded[column].notna(), 'N/A')
+
+    for column in BOOLEAN_COLUMNS + CATEGORY_COLUMNS + ['Risk Score']:
+        if column in decoded.columns and isinstance(decoded[column].dtype, pd.CategoricalDtype):
+            decoded[column] = decoded[column].astype(object)
+
+    return decoded
+
+def memory_report(before, after):
+    """
+    Compare the memory footprint of a DataFrame before and after encoding.
+
+    Args:
+        before: DataFrame as read
+        after: DataFrame returned by encode_lead_columns
+
+    Returns:
+        dict: Total and per-lead bytes before/after, plus a per-column breakdown
+    """
+    before_usage = before.memory_usage(deep=True, index=False)
+    after_usage = after.memory_usage(deep=True, index=False)
+    leads = max(len(before), 1)
+
+    return {
+        'leads': len(before),
+        'bytes_before': int(before_usage.sum()),
+        'bytes_after': int(after_usage.sum()),
+        'bytes_per_lead_before': round(before_usage.sum() / leads, 1),
+        'bytes_per_lead_after': round(after_usage.sum() / leads, 1),
+        'columns': {
+            column: {
+                'dtype': str(after[column].dtype),
+                'bytes_before': int(before_usage.get(column, 0)),
+                'bytes_after': int(after_usage.get(column, 0))
+            }
+            for column in after.columns
+        }
+    }
@@ -0,0 +1,190 @@
+import os
+import re
+from functools import partial
+from urllib.parse import quote
+import pandas as pd
+import metrics
+import stage_profiler
+from risk_assessment import assess_risk_scores, validate_leads
+from lead_encoding import encode_lead_columns
+from whatsapp_generator import generate_whatsapp_message, coalesce_requests
+from generation_budget import GenerationBudget
+from phone_validation import validate_phone_numbers
+
+REQUIRED_COLUMNS = [
+    'Lead Name', 'Channel', 'Contact Number', 'Scheduled By',
+    'Link Clicked', 'Contact Shared', 'Last Interaction Days',
+    'Missed Demos', 'Showed Up for Demo'
+]
+
+INVALID_PHONE_MESSAGE = 'N/A - Invalid phone number'
+
+def read_leads(source, file_name=None):
+    """
+    Read a lead file (Excel or CSV) into a DataFrame.
+
+    Args:
+        source: Path or file-like object
+        file_name (str): Name used to detect the format when source is file-like
+
+    Returns:
+        pd.DataFrame: Raw lead data
+    """
+    name = file_name or getattr(source, 'name', None) or str(source)
+    if name.lower().endswith('.csv'):
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+def validate_excel_columns(df):
+    """Validate that the Excel file contains all required columns"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    return missing_columns
+
+def clean_phone_number(phone):
+    """Clean phone number to contain only digits"""
+    if pd.isna(phone):
+        return None
+    # Convert to string and remove all non-numeric characters
+    cleaned = re.sub(r'\D', '', str(phone))
+    return cleaned if cleaned else None
+
+def clean_phone_numbers(phones):
+    """
+    Vectorized clean_phone_number for a whole column.
+
+    Numbers that fail validate_phone_numbers (unknown country code, wrong
+    length for the country, malformed NANP) are dropped here, so no message is
+    generated or sent for them.
+
+    Args:
+        phones (pd.Series): Raw contact numbers
+
+    Returns:
+        pd.Series: Digits-only numbers (object dtype), None where nothing is left
+                   or the number is invalid
+    """
+    validation = validate_phone_numbers(phones)
+    return validation['digits'].where(validation['valid'], None)
+
+def create_whatsapp_link(phone_number, message):
+    """Create a clickable WhatsApp link"""
+    if not phone_number or not message:
+        return "Invalid phone/message"
+
+    # URL encode the message
+    encoded_message = quote(message)
+    return f"https://wa.me/{phone_number}?text={encoded_message}"
+
+def build_whatsapp_links(phones, messages):
+    """Create WhatsApp links for aligned lists of phones and messages."""
+    return [
+        create_whatsapp_link(phone, message) if phone is not None else 'N/A'
+        for phone, message in zip(phones, messages)
+    ]
+
+def score_leads(df, with_propensity=False):
+    """
+    Assess the risk category of every lead.
+
+    Args:
+        df: Lead data
+        with_propensity (bool): Also return the numeric propensity scores
+
+    Returns:
+        pd.Series: Risk category per lead, aligned with df.index, or a
+                   (risk_categories, propensity_scores) tuple with with_propensity
+    """
+    risk_scores, propensity_scores = assess_risk_scores(df)
+    if with_propensity:
+        return risk_scores, propensity_scores
+    return risk_scores
+
+def generate_messages(lead_names, risk_scores, phones, message_generator=None, variants_per_key=1):
+    """
+    Generate a WhatsApp message for every lead with a valid phone number.
+
+    Leads sharing a (name, risk) pair reuse the same generated message (or one
+    of variants_per_key messages), so duplicates don't cost extra API calls.
+
+    Args:
+        lead_names: Lead names
+        risk_scores: Risk categories aligned with lead_names
+        phones: Cleaned phone numbers (None for invalid)
+        message_generator: Callable (lead_name, risk_score) -> str, defaults to
+                           generate_whatsapp_message
+        variants_per_key (int): Distinct messages per identical (name, risk) pair
+
+    Returns:
+        list: Messages aligned with the inputs
+    """
+    message_generator = message_generator or generate_whatsapp_message
+    valid_rows = [i for i, phone in enumerate(phones) if phone is not None]
+    lead_names = list(lead_names)
+    risk_scores = list(risk_scores)
+
+    unique_requests, request_index = coalesce_requests(
+        [{'lead_name': lead_names[i], 'risk_score': risk_scores[i]} for i in valid_rows],
+        variants_per_key
+    )
+    generated = [message_generator(name, risk) for name, risk in unique_requests]
+    metrics.increment('openai_calls_saved_total', len(valid_rows) - len(unique_requests))
+
+    messages = [INVALID_PHONE_MESSAGE] * len(lead_names)
+    for row, position in zip(valid_rows, request_index):
+        messages[row] = generated[position]
+    return messages
+
+def build_results(df, risk_scores, messages, links):
+    """Assemble the results table shown in the app and exported as CSV."""
+    valid_phone = df['clean_phone'].notna()
+    return pd.DataFrame({
+        'Lead Name': df['Lead Name'].values,
+        'Risk Score': risk_scores.where(valid_phone, 'Invalid Phone').values,
+        'Phone': df['clean_phone'].where(valid_phone, 'Invalid').values,
+        'WhatsApp Message': messages,
+        'WhatsApp Link': links
+    })
+
+def export_results(results_df, path):
+    """Write the results table to a CSV file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    results_df.to_csv(path, index=False)
+    return path
+
+def process_leads(df, message_generator=None, budget=None):
+    """
+    Run the full headless pipeline on an already loaded DataFrame.
+
+    Args:
+        df: Raw lead data with all REQUIRED_COLUMNS
+        message_generator: Optional replacement for generate_whatsapp_message
+        budget (GenerationBudget): Run-level limits for AI generation, read from
+                                   the LEADGENIUS_MAX_* environment variables by default
+
+    Returns:
+        tuple: (results_df, validation_errors)
+    """
+    missing_columns = validate_excel_columns(df)
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    with metrics.timer('pipeline_stage_seconds', stage='validate'), stage_profiler.stage('validate'):
+        validation_errors, _ = validate_leads(df)
+
+    with metrics.timer('pipeline_stage_seconds', stage='encode'), stage_profiler.stage('encode'):
+        df = encode_lead_columns(df)
+    with metrics.timer('pipeline_stage_seconds', stage='phone_clean'), stage_profiler.stage('phone_clean'):
+        df['clean_phone'] = clean_phone_numbers(df['Contact Number'])
+    with metrics.timer('pipeline_stage_seconds', stage='score'), stage_profiler.stage('score'):
+        risk_scores = score_leads(df)
+    if message_generator is None:
+        message_generator = partial(generate_whatsapp_message, budget=budget or GenerationBudget.from_env())
+    with metrics.timer('pipeline_stage_seconds', stage='message_generate'), stage_profiler.stage('message_generate'):
+        messages = generate_messages(df['Lead Name'], risk_scores, df['clean_phone'], message_generator)
+    with metrics.timer('pipeline_stage_seconds', stage='link_build'), stage_profiler.stage('link_build'):
+        links = build_whatsapp_links(df['clean_phone'], messages)
+
+    metrics.increment('pipeline_leads_processed_total', len(df))
+    return build_results(df, risk_scores, messages, links), validation_errors
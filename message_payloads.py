@@ -0,0 +1,171 @@
+import json
+import re
+from json.encoder import encode_basestring
+
+# Media types the Cloud API accepts by link; audio and sticker messages can't carry a caption
+MEDIA_TYPES = ['image', 'video', 'document', 'audio', 'sticker']
+CAPTION_MEDIA_TYPES = ['image', 'video', 'document']
+
+DEFAULT_TEMPLATE_LANGUAGE = 'en_US'
+
+_SLOT_PATTERN = re.compile(r'"\\u0000slot:(\w+)\\u0000"')
+
+def slot(name):
+    """Placeholder for a per-message value inside a payload passed to PayloadSkeleton."""
+    return f"\x00slot:{name}\x00"
+
+class PayloadSkeleton:
+    """
+    Graph API message body serialized once, with slots for per-message values.
+
+    The payload dict is dumped to JSON at construction and split around its
+    slot() placeholders. render() only JSON-escapes the values and joins the
+    pre-serialized pieces, so bulk sends skip rebuilding and re-serializing the
+    nested dict for every recipient.
+
+    Args:
+        payload (dict): Message body with slot(name) wherever a value goes
+    """
+
+    def __init__(self, payload):
+        serialized = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+        self.slots = []
+        chunks = []
+        position = 0
+        for match in _SLOT_PATTERN.finditer(serialized):
+            chunks.append(serialized[position:match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        chunks.append(serialized[position:])
+        self._head = chunks[0]
+        self._slot_chunks = list(zip(self.slots, chunks[1:]))
+
+    def render(self, **values):
+        """
+        Fill in the slots and return the request body.
+
+        Args:
+            **values: One value per slot name (converted to strings)
+
+        Returns:
+            bytes: UTF-8 JSON body
+        """
+        parts = [self._head]
+        try:
+            for name, chunk in self._slot_chunks:
+                parts.append(encode_basestring(str(values[name])))
+                parts.append(chunk)
+        except KeyError as e:
+            raise ValueError(f"Missing value for payload slot '{e.args[0]}'") from None
+        return ''.join(parts).encode()
+
+def template_values(parameters, header_type=None, header_value=None):
+    """
+    Slot values for a template skeleton.
+
+    Args:
+        parameters: Body parameters in order ({{1}}, {{2}}, ...), filling slots p1..pN
+        header_type (str): Header type the skeleton was built with
+        header_value (str): Header text, or the media link for a media header
+
+    Returns:
+        dict: Keyword arguments for PayloadSkeleton.render (without 'to')
+    """
+    values = {f"p{position}": value for position, value in enumerate(parameters, 1)}
+    if header_type == 'text':
+        values['header_text'] = header_value
+    elif header_type is not None:
+        values['header_link'] = header_value
+    return values
+
+_skeletons = {}
+
+def _cached(key, build):
+    skeleton = _skeletons.get(key)
+    if skeleton is None:
+        skeleton = _skeletons[key] = PayloadSkeleton(build())
+    return skeleton
+
+def get_text_skeleton():
+    """Skeleton for a free-form text message (slots: to, body)."""
+    return _cached(('text',), lambda: {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": slot('to'),
+        "type": "text",
+        "text": {"body": slot('body')}
+    })
+
+def get_template_skeleton(template_name, language=DEFAULT_TEMPLATE_LANGUAGE, parameter_count=0, header_type=None):
+    """
+    Skeleton for a pre-approved template message, built once per template.
+
+    Args:
+        template_name (str): Template name as approved in WhatsApp Manager
+        language (str): Template language code
+        parameter_count (int): Number of body parameters ({{1}} .. {{n}}), slots p1..pn
+        header_type (str): None, 'text' (slot header_text) or a media type
+                           such as 'image' or 'document' (slot header_link)
+
+    Returns:
+        PayloadSkeleton: Slots 'to', the body parameters and the header slot, if any
+    """
+    if header_type is not None and header_type != 'text' and header_type not in CAPTION_MEDIA_TYPES:
+        raise ValueError(f"Unsupported template header type: {header_type}")
+
+    def build():
+        components = []
+        if header_type == 'text':
+            components.append({"type": "header", "parameters": [{"type": "text", "text": slot('header_text')}]})
+        elif header_type is not None:
+            components.append({
+                "type": "header",
+                "parameters": [{"type": header_type, header_type: {"link": slot('header_link')}}]
+            })
+        if parameter_count:
+            components.append({
+                "type": "body",
+                "parameters": [{"type": "text", "text": slot(f"p{position}")} for position in range(1, parameter_count + 1)]
+            })
+        template = {"name": template_name, "language": {"code": language}}
+        if components:
+            template["components"] = components
+        return {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": slot('to'),
+            "type": "template",
+            "template": template
+        }
+
+    return _cached(('template', template_name, language, parameter_count, header_type), build)
+
+def get_media_skeleton(media_type, with_caption=False):
+    """
+    Skeleton for an image, video, document, audio or sticker sent by link.
+
+    Args:
+        media_type (str): One of MEDIA_TYPES
+        with_caption (bool): Add a caption slot (image, video and document only)
+
+    Returns:
+        PayloadSkeleton: Slots 'to', 'link' and optionally 'caption'
+    """
+    if media_type not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported media type: {media_type}")
+    if with_caption and media_type not in CAPTION_MEDIA_TYPES:
+        raise ValueError(f"{media_type} messages can't have a caption")
+
+    def build():
+        media = {"link": slot('link')}
+        if with_caption:
+            media["caption"] = slot('caption')
+        return {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": slot('to'),
+            "type": media_type,
+            media_type: media
+        }
+
+    return _cached(('media', media_type, with_caption), build)
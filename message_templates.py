@@ -0,0 +1,192 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+RISK_LEVELS = ['High', 'Medium', 'Low']
+
+GREETINGS = ["Hi", "Hello", "Hey", "Good day", "Greetings"]
+
+TIME_REFERENCES = {
+    'High': ["today", "tomorrow", "this week", "soon", "at your convenience", "when you're free"],
+    'Medium': ["this week", "soon", "in the coming days", "when convenient", "at your earliest convenience"],
+    'Low': ["soon", "as scheduled", "as planned", "for our session", "for our upcoming meeting"]
+}
+
+FALLBACK_TEMPLATES = {
+    'High': [
+        "{greeting} {name}, your demo is scheduled but we missed you last time. Can we quickly reconnect {time}?",
+        "{greeting} {name}, we noticed you missed our demo. Can we reschedule {time}?",
+        "{greeting} {name}, let's reconnect about your demo. When works best for you?",
+        "{greeting} {name}, missed you at the demo. Can we set up a quick call {time}?",
+        "{greeting} {name}, following up on your demo. Would {time} work better?",
+        "{greeting} {name}, let's get that demo rescheduled. What's your availability like?",
+        "{greeting} {name}, hoping to reconnect about our demo. Are you available {time}?",
+        "{greeting} {name}, we'd love to reschedule our missed demo. How does {time} sound?",
+        "{greeting} {name}, quick follow-up on the demo we missed. Can we try again {time}?"
+    ],
+    'Medium': [
+        "{greeting} {name}, just checking in. Shall we go ahead with the demo {time}?",
+        "{greeting} {name}, following up on our previous conversation. Any questions?",
+        "{greeting} {name}, just checking in. How are things progressing on your end?",
+        "{greeting} {name}, wanted to touch base about our upcoming demo. Still good for {time}?",
+        "{greeting} {name}, hope you're doing well. Ready to move forward with the demo?",
+        "{greeting} {name}, just a quick follow-up. What questions can I answer for you?",
+        "{greeting} {name}, circling back on our demo discussion. Shall we proceed {time}?",
+        "{greeting} {name}, touching base about our demo. Are we still on track for {time}?",
+        "{greeting} {name}, hope all is well. Ready to schedule our demo {time}?"
+    ],
+    'Low': [
+        "{greeting} {name}, just a friendly nudge to confirm our upcoming demo. Excited to connect!",
+        "{greeting} {name}, looking forward to our demo session. See you {time}!",
+        "{greeting} {name}, quick confirmation for our scheduled demo. Can't wait to show you around!",
+        "{greeting} {name}, demo day is coming up. Are you as excited as we are?",
+        "{greeting} {name}, just confirming our demo time. This is going to be great!",
+        "{greeting} {name}, excited for our demo {time}. It's going to be fantastic!",
+        "{greeting} {name}, looking forward to connecting with you {time}. Ready?",
+        "{greeting} {name}, our demo is approaching. Can't wait to show you what we've built!"
+    ]
+}
+
+class VariantTable:
+    """
+    Every template x greeting x time combination, precompiled per risk category.
+
+    Each variant is stored as the text before and after the lead's name, so
+    rendering a message is two string concatenations. Variants of all
+    categories live in one flat array; offsets[category] marks where a
+    category's block starts.
+    """
+
+    def __init__(self, templates=None, greetings=None, time_references=None):
+        templates = templates or FALLBACK_TEMPLATES
+        greetings = greetings or GREETINGS
+        time_references = time_references or TIME_REFERENCES
+
+        prefixes = []
+        suffixes = []
+        self.offsets = {}
+        self.counts = {}
+
+        for risk_level in RISK_LEVELS:
+            self.offsets[risk_level] = len(prefixes)
+            for template in templates[risk_level]:
+                if template.count('{name}') != 1:
+                    raise ValueError(f"Template must contain {{name}} exactly once: {template}")
+                before, after = template.split('{name}')
+                # Templates without {time} don't multiply by the time references
+                times = time_references[risk_level] if '{time}' in template else [None]
+                for greeting in greetings:
+                    for time_ref in times:
+                        prefixes.append(before.format(greeting=greeting, time=time_ref))
+                        suffixes.append(after.format(greeting=greeting, time=time_ref))
+            self.counts[risk_level] = len(prefixes) - self.offsets[risk_level]
+
+        self.prefixes = np.array(prefixes, dtype=object)
+        self.suffixes = np.array(suffixes, dtype=object)
+        self._orders = {}
+
+    def permutation(self, risk_level, seed):
+        """Seeded ordering of a category's variants (global indices)."""
+        key = (risk_level, seed)
+        if key not in self._orders:
+            rng = np.random.default_rng([seed, RISK_LEVELS.index(risk_level)])
+            self._orders[key] = self.offsets[risk_level] + rng.permutation(self.counts[risk_level])
+        return self._orders[key]
+
+    def assign(self, risk_scores, lead_names=None, seed=0):
+        """
+        Pick a variant for every lead in bulk.
+
+        Leads walk through a seeded permutation of their category's variants.
+        When names are given, leads sharing a name and category each get the
+        next variant in that order (starting from a per-name offset), so the
+        same text is only repeated after all of a category's variants are used.
+
+        Args:
+            risk_scores: Risk category per lead (anything unknown is treated as Medium)
+            lead_names: Optional lead names aligned with risk_scores
+            seed (int): Seed for reproducible assignments
+
+        Returns:
+            np.ndarray: Global variant index per lead
+        """
+        medium = RISK_LEVELS.index('Medium')
+        risk_codes, risk_uniques = pd.factorize(np.asarray(risk_scores, dtype=object))
+        lookup = np.array(
+            [RISK_LEVELS.index(risk) if risk in RISK_LEVELS else medium for risk in risk_uniques] + [medium],
+            dtype=np.int64
+        )
+        codes = lookup[risk_codes]
+
+        if lead_names is None:
+            positions_in_order = np.arange(len(codes), dtype=np.int64)
+        else:
+            name_codes, _ = pd.factorize(np.asarray(lead_names, dtype=object))
+            name_codes = name_codes.astype(np.int64)
+            group_key = name_codes * len(RISK_LEVELS) + codes
+            duplicate_rank = pd.Series(group_key).groupby(group_key).cumcount().to_numpy()
+            # Multiplicative hash spreads distinct names over the variant order
+            positions_in_order = (name_codes * 2654435761) % 4294967296 + duplicate_rank
+
+        assignments = np.empty(len(codes), dtype=np.int64)
+        for category_code, risk_level in enumerate(RISK_LEVELS):
+            rows = np.flatnonzero(codes == category_code)
+            if len(rows) == 0:
+                continue
+            order = self.permutation(risk_level, seed)
+            assignments[rows] = order[positions_in_order[rows] % len(order)]
+        return assignments
+
+    def render(self, lead_names, assignments):
+        """Render messages for lead names and their assigned variant indices."""
+        prefixes = self.prefixes[assignments]
+        suffixes = self.suffixes[assignments]
+        return [prefix + str(name) + suffix for prefix, name, suffix in zip(prefixes, lead_names, suffixes)]
+
+_variant_table = None
+
+def get_variant_table():
+    """Return the shared variant table, compiling it on first use."""
+    global _variant_table
+    if _variant_table is None:
+        _variant_table = VariantTable()
+    return _variant_table
+
+def render_messages(lead_names, risk_scores, seed=0):
+    """
+    Generate template messages for a whole batch of leads offline.
+
+    Args:
+        lead_names: Lead names
+        risk_scores: Risk categories aligned with lead_names
+        seed (int): Seed so the same batch always gets the same messages
+
+    Returns:
+        list: One message per lead
+    """
+    table = get_variant_table()
+    lead_names = list(lead_names)
+    return table.render(lead_names, table.assign(risk_scores, lead_names, seed))
+
+def render_message(lead_name, risk_score, variant=None, seed=0):
+    """
+    Generate one template message.
+
+    Args:
+        lead_name (str): Name of the lead
+        risk_score (str): Risk category
+        variant (int): Position in the category's variant order, e.g. the row
+                       number; defaults to a stable hash of the lead name
+        seed (int): Seed of the variant order
+
+    Returns:
+        str: The rendered message
+    """
+    table = get_variant_table()
+    risk_level = risk_score if risk_score in RISK_LEVELS else 'Medium'
+    if variant is None:
+        variant = zlib.crc32(str(lead_name).encode())
+
+    order = table.permutation(risk_level, seed)
+    index = order[variant % len(order)]
+    return table.prefixes[index] + str(lead_name) + table.suffixes[index]
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, shared by every histogram
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_NULL_TIMER = nullcontext()
+
+class JsonLinesSink:
+    """Append every metric event to a JSON lines file."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a', buffering=1)
+
+    def emit(self, event):
+        self._file.write(json.dumps(event) + '\n')
+
+    def flush(self, registry):
+        self._file.flush()
+
+class PrometheusFileSink:
+    """Periodically rewrite a Prometheus text-format file (node_exporter textfile style)."""
+
+    def __init__(self, path, interval=5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.interval = interval
+        self._last_write = 0.0
+        self._registry = None
+
+    def emit(self, event):
+        if self._registry is not None and time.time() - self._last_write >= self.interval:
+            self.flush(self._registry)
+
+    def bind(self, registry):
+        self._registry = registry
+
+    def flush(self, registry):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(registry.render_prometheus())
+        os.replace(temp_path, self.path)
+        self._last_write = time.time()
+
+class MetricsRegistry:
+    """
+    Counters and histograms for the pipeline and external API calls.
+
+    Disabled by default: every recording call returns immediately, and
+    timer() hands back a shared no-op context manager.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._server = None
+
+    def configure(self, enabled=True, sinks=None):
+        """Turn recording on or off and replace the sinks."""
+        self.sinks = list(sinks or [])
+        for sink in self.sinks:
+            if hasattr(sink, 'bind'):
+                sink.bind(self)
+        self.enabled = enabled
+
+    def increment(self, name, value=1, **labels):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit('counter', name, value, labels)
+
+    def observe(self, name, value, **labels):
+        """Record one observation (typically seconds) in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'count': 0, 'sum': 0.0, 'min': value, 'max': value,
+                    'buckets': [0] * len(DEFAULT_BUCKETS)
+                }
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['min'] = min(histogram['min'], value)
+            histogram['max'] = max(histogram['max'], value)
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+        self._emit('histogram', name, value, labels)
+
+    def timer(self, name, **labels):
+        """Context manager observing the elapsed seconds of a block."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def counter_value(self, name, **labels):
+        """Current value of one counter (0 if never incremented)."""
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """
+        Return the aggregated metrics.
+
+        Returns:
+            dict: 'counters' and 'histograms' lists of plain dicts
+        """
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    'name': name, 'labels': dict(labels), 'count': h['count'],
+                    'sum': h['sum'], 'mean': h['sum'] / h['count'], 'min': h['min'], 'max': h['max']
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+        return {'counters': counters, 'histograms': histograms}
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(h, buckets=list(h['buckets']))) for key, h in self._histograms.items())
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"leadgenius_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), h in histograms:
+            metric = f"leadgenius_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} histogram")
+                seen.add(metric)
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, h['buckets']):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {h['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {h['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {h['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Push buffered output to every sink (e.g. rewrite the Prometheus file)."""
+        for sink in self.sinks:
+            sink.flush(self)
+
+    def reset(self):
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def start_http_server(self, port, host='127.0.0.1'):
+        """Serve /metrics in the Prometheus text format from a daemon thread."""
+        if self._server is not None:
+            return self._server
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def _emit(self, kind, name, value, labels):
+        if not self.sinks:
+            return
+        event = {'ts': time.time(), 'type': kind, 'name': name, 'value': value, 'labels': labels}
+        for sink in self.sinks:
+            sink.emit(event)
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels, status='error') if exc_type else self.labels
+        self.registry.observe(self.name, time.perf_counter() - self.start, **labels)
+        return False
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        key + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+registry = MetricsRegistry()
+
+def configure_from_env():
+    """
+    Enable metrics from environment variables.
+
+    LEADGENIUS_METRICS is a comma-separated list of sinks: 'jsonl', 'prometheus'
+    (textfile), 'http' (/metrics endpoint) or 'memory' (in-app panel only).
+    Paths and the port come from LEADGENIUS_METRICS_JSONL,
+    LEADGENIUS_METRICS_PROM and LEADGENIUS_METRICS_PORT.
+
+    Every process that imports this module runs it (the app, job workers, the
+    API and webhook servers), but only one can own the /metrics port: the
+    others log that it is taken and keep recording to their other sinks.
+    """
+    requested = [name.strip() for name in os.environ.get('LEADGENIUS_METRICS', '').split(',') if name.strip()]
+    if not requested:
+        return registry
+
+    sinks = []
+    if 'jsonl' in requested:
+        sinks.append(JsonLinesSink(os.environ.get('LEADGENIUS_METRICS_JSONL', os.path.join('.leadgenius', 'metrics.jsonl'))))
+    if 'prometheus' in requested:
+        sinks.append(PrometheusFileSink(os.environ.get('LEADGENIUS_METRICS_PROM', os.path.join('.leadgenius', 'metrics.prom'))))
+    registry.configure(enabled=True, sinks=sinks)
+
+    if 'http' in requested:
+        port = int(os.environ.get('LEADGENIUS_METRICS_PORT', '9464'))
+        try:
+            registry.start_http_server(port)
+        except OSError as e:
+            logger.warning("Not serving /metrics on port %d from this process: %s", port, e)
+    return registry
+
+# Module-level shortcuts used by instrumented code
+def increment(name, value=1, **labels):
+    registry.increment(name, value, **labels)
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+def timer(name, **labels):
+    return registry.timer(name, **labels)
+
+configure_from_env()
@@ -0,0 +1,202 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Country code assumed for 10-digit numbers without one, as WhatsAppSender.format_phone_number does
+DEFAULT_COUNTRY_CODE = os.environ.get("WHATSAPP_DEFAULT_COUNTRY_CODE", "1")
+
+# E.164 numbers are at most 15 digits including the country code
+E164_MAX_DIGITS = 15
+
+# Country calling code -> (region, min and max national number length). Codes shared
+# by several countries are grouped under the main one (+1 NANP as US, +7 as RU).
+CALLING_CODES = {
+    '1': ('US', 10, 10), '7': ('RU', 10, 10),
+    '20': ('EG', 8, 10), '27': ('ZA', 9, 9), '30': ('GR', 10, 10), '31': ('NL', 9, 9),
+    '32': ('BE', 8, 9), '33': ('FR', 9, 9), '34': ('ES', 9, 9), '36': ('HU', 8, 9),
+    '39': ('IT', 6, 11), '40': ('RO', 9, 9), '41': ('CH', 9, 9), '43': ('AT', 4, 13),
+    '44': ('GB', 9, 10), '45': ('DK', 8, 8), '46': ('SE', 7, 10), '47': ('NO', 8, 8),
+    '48': ('PL', 9, 9), '49': ('DE', 6, 13), '51': ('PE', 8, 9), '52': ('MX', 10, 10),
+    '53': ('CU', 6, 8), '54': ('AR', 10, 11), '55': ('BR', 10, 11), '56': ('CL', 9, 9),
+    '57': ('CO', 8, 10), '58': ('VE', 10, 10), '60': ('MY', 8, 10), '61': ('AU', 9, 9),
+    '62': ('ID', 8, 12), '63': ('PH', 8, 10), '64': ('NZ', 8, 10), '65': ('SG', 8, 8),
+    '66': ('TH', 8, 9), '81': ('JP', 9, 10), '82': ('KR', 8, 10), '84': ('VN', 9, 10),
+    '86': ('CN', 8, 11), '90': ('TR', 10, 10), '91': ('IN', 10, 10), '92': ('PK', 9, 10),
+    '93': ('AF', 9, 9), '94': ('LK', 9, 9), '95': ('MM', 7, 10), '98': ('IR', 10, 10),
+    '211': ('SS', 9, 9), '212': ('MA', 9, 9), '213': ('DZ', 8, 9), '216': ('TN', 8, 8),
+    '218': ('LY', 8, 9), '220': ('GM', 7, 7), '221': ('SN', 9, 9), '222': ('MR', 8, 8),
+    '223': ('ML', 8, 8), '224': ('GN', 8, 9), '225': ('CI', 8, 10), '226': ('BF', 8, 8),
+    '227': ('NE', 8, 8), '228': ('TG', 8, 8), '229': ('BJ', 8, 10), '230': ('MU', 7, 8),
+    '231': ('LR', 7, 9), '232': ('SL', 8, 8), '233': ('GH', 9, 9), '234': ('NG', 8, 10),
+    '235': ('TD', 8, 8), '236': ('CF', 8, 8), '237': ('CM', 8, 9), '238': ('CV', 7, 7),
+    '239': ('ST', 7, 7), '240': ('GQ', 9, 9), '241': ('GA', 7, 8), '242': ('CG', 9, 9),
+    '243': ('CD', 9, 9), '244': ('AO', 9, 9), '245': ('GW', 7, 9), '246': ('IO', 7, 7),
+    '248': ('SC', 7, 7), '249': ('SD', 9, 9), '250': ('RW', 9, 9), '251': ('ET', 9, 9),
+    '252': ('SO', 7, 9), '253': ('DJ', 8, 8), '254': ('KE', 9, 10), '255': ('TZ', 9, 9),
+    '256': ('UG', 9, 9), '257': ('BI', 8, 8), '258': ('MZ', 8, 9), '260': ('ZM', 9, 9),
+    '261': ('MG', 9, 9), '262': ('RE', 9, 9), '263': ('ZW', 9, 10), '264': ('NA', 8, 9),
+    '265': ('MW', 7, 9), '266': ('LS', 8, 8), '267': ('BW', 7, 8), '268': ('SZ', 8, 8),
+    '269': ('KM', 7, 7), '290': ('SH', 4, 5), '291': ('ER', 7, 7), '297': ('AW', 7, 7),
+    '298': ('FO', 6, 6), '299': ('GL', 6, 6), '350': ('GI', 8, 8), '351': ('PT', 9, 9),
+    '352': ('LU', 4, 11), '353': ('IE', 7, 9), '354': ('IS', 7, 9), '355': ('AL', 8, 9),
+    '356': ('MT', 8, 8), '357': ('CY', 8, 8), '358': ('FI', 5, 12), '359': ('BG', 8, 9),
+    '370': ('LT', 8, 8), '371': ('LV', 8, 8), '372': ('EE', 7, 8), '373': ('MD', 8, 8),
+    '374': ('AM', 8, 8), '375': ('BY', 9, 10), '376': ('AD', 6, 9), '377': ('MC', 8, 9),
+    '378': ('SM', 6, 10), '380': ('UA', 9, 9), '381': ('RS', 8, 10), '382': ('ME', 8, 8),
+    '383': ('XK', 8, 9), '385': ('HR', 8, 9), '386': ('SI', 8, 8), '387': ('BA', 8, 9),
+    '389': ('MK', 8, 8), '420': ('CZ', 9, 9), '421': ('SK', 9, 9), '423': ('LI', 7, 9),
+    '500': ('FK', 5, 5), '501': ('BZ', 7, 7), '502': ('GT', 8, 8), '503': ('SV', 8, 8),
+    '504': ('HN', 8, 8), '505': ('NI', 8, 8), '506': ('CR', 8, 8), '507': ('PA', 7, 8),
+    '508': ('PM', 6, 6), '509': ('HT', 8, 8), '590': ('GP', 9, 9), '591': ('BO', 8, 8),
+    '592': ('GY', 7, 7), '593': ('EC', 8, 9), '594': ('GF', 9, 9), '595': ('PY', 9, 9),
+    '596': ('MQ', 9, 9), '597': ('SR', 6, 7), '598': ('UY', 8, 8), '599': ('CW', 7, 8),
+    '670': ('TL', 7, 8), '672': ('NF', 6, 6), '673': ('BN', 7, 7), '674': ('NR', 7, 7),
+    '675': ('PG', 7, 8), '676': ('TO', 5, 7), '677': ('SB', 5, 7), '678': ('VU', 5, 7),
+    '679': ('FJ', 7, 7), '680': ('PW', 7, 7), '681': ('WF', 6, 6), '682': ('CK', 5, 5),
+    '683': ('NU', 4, 7), '685': ('WS', 5, 7), '686': ('KI', 5, 8), '687': ('NC', 6, 6),
+    '688': ('TV', 5, 6), '689': ('PF', 8, 8), '690': ('TK', 4, 7), '691': ('FM', 7, 7),
+    '692': ('MH', 7, 7), '850': ('KP', 8, 10), '852': ('HK', 8, 8), '853': ('MO', 8, 8),
+    '855': ('KH', 8, 9), '856': ('LA', 8, 10), '880': ('BD', 10, 10), '886': ('TW', 8, 9),
+    '960': ('MV', 7, 7), '961': ('LB', 7, 8), '962': ('JO', 8, 9), '963': ('SY', 8, 9),
+    '964': ('IQ', 8, 10), '965': ('KW', 8, 8), '966': ('SA', 9, 9), '967': ('YE', 7, 9),
+    '968': ('OM', 8, 8), '970': ('PS', 8, 9), '971': ('AE', 8, 9), '972': ('IL', 8, 9),
+    '973': ('BH', 8, 8), '974': ('QA', 8, 8), '975': ('BT', 7, 8), '976': ('MN', 8, 8),
+    '977': ('NP', 8, 10), '992': ('TJ', 9, 9), '993': ('TM', 8, 8), '994': ('AZ', 9, 9),
+    '995': ('GE', 9, 9), '996': ('KG', 9, 9), '998': ('UZ', 9, 9),
+}
+
+# Why a number was rejected; None in the 'reason' column means it is valid
+INVALID_REASONS = ['missing', 'unknown_country_code', 'too_short', 'too_long', 'invalid_nanp']
+
+_prefix_trie = None
+
+def _get_prefix_trie():
+    """
+    Calling-code prefix trie, built once.
+
+    Calling codes are prefix-free, so the trie is stored as one dense table
+    per depth (10, 100 and 1000 entries for 1-3 digit prefixes) holding the
+    index of the code ending there, or -1. A whole column is resolved with
+    three array lookups instead of walking the trie per number.
+    """
+    global _prefix_trie
+    if _prefix_trie is None:
+        codes = list(CALLING_CODES)
+        levels = [np.full(10 ** depth, -1, dtype=np.int16) for depth in (1, 2, 3)]
+        for position, code in enumerate(codes):
+            if any(code[:depth] in CALLING_CODES for depth in range(1, len(code))):
+                raise ValueError(f"Calling code {code} overlaps a shorter code")
+            levels[len(code) - 1][int(code)] = position
+        _prefix_trie = {
+            'levels': levels,
+            'codes': np.array(codes, dtype=object),
+            'code_lengths': np.array([len(code) for code in codes], dtype=np.int64),
+            'regions': np.array([CALLING_CODES[code][0] for code in codes], dtype=object),
+            'min_lengths': np.array([CALLING_CODES[code][1] for code in codes], dtype=np.int64),
+            'max_lengths': np.array([CALLING_CODES[code][2] for code in codes], dtype=np.int64)
+        }
+    return _prefix_trie
+
+def _format_number(value):
+    # 2125551234.0 -> '2125551234', not '21255512340'
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:.0f}"
+    return str(value)
+
+def _phone_text(phones):
+    """Phone numbers as text, with numbers read as floats (Excel columns with blanks) written without '.0'."""
+    if pd.api.types.is_float_dtype(phones):
+        return phones.round().astype('Int64').astype(str)
+    if pd.api.types.is_object_dtype(phones):
+        return phones.map(_format_number)
+    return phones.astype(str)
+
+def validate_phone_numbers(phones, default_country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Check a column of phone numbers before any API or LLM call, in one vectorized pass.
+
+    Numbers are normalized the way WhatsAppSender.format_phone_number sends
+    them (digits only, leading zeros dropped, default_country_code added to
+    10-digit numbers unless they were written with '+' or '00'), then the
+    country calling code is found with the prefix trie and the remaining
+    national number is checked against that country's length range and the
+    E.164 15-digit limit. NANP (+1) numbers also need area codes and
+    exchanges that start with 2-9.
+
+    Args:
+        phones: Raw or cleaned phone numbers (Series or list); numbers stored
+                as floats (e.g. 2125551234.0) are read without the '.0'
+        default_country_code (str): Code for 10-digit numbers without one
+
+    Returns:
+        pd.DataFrame: Aligned with phones: 'digits' (digits as given, None when
+                      empty), 'e164' (normalized digits, None when invalid),
+                      'calling_code', 'region', 'valid' and 'reason' (one of
+                      INVALID_REASONS, None when valid)
+    """
+    phones = phones if isinstance(phones, pd.Series) else pd.Series(list(phones), dtype=object)
+    trie = _get_prefix_trie()
+
+    text = _phone_text(phones)
+    raw_digits = text.str.replace(r'\D', '', regex=True).where(phones.notna(), '')
+    international = text.str.lstrip().str.startswith(('+', '00')).to_numpy(dtype=bool)
+    digits = raw_digits.str.lstrip('0')
+    lengths = digits.str.len().to_numpy(dtype=np.int64)
+    digits = digits.where((lengths != 10) | international, default_country_code + digits)
+    lengths = digits.str.len().to_numpy(dtype=np.int64)
+
+    # First three digits as one integer, read straight from the bytes (short numbers
+    # are right-padded; they fail the length check anyway)
+    heads = digits.str.slice(0, 3).str.pad(3, side='right', fillchar='0').to_numpy(dtype='S3')
+    heads = np.frombuffer(heads.tobytes(), dtype=np.uint8).reshape(-1, 3).astype(np.int64) - ord('0')
+    prefix = heads @ np.array([100, 10, 1], dtype=np.int64)
+    code_index = trie['levels'][0][prefix // 100].astype(np.int64)
+    code_index = np.where(code_index < 0, trie['levels'][1][prefix // 10], code_index)
+    code_index = np.where(code_index < 0, trie['levels'][2][prefix], code_index)
+
+    known = code_index >= 0
+    safe_index = np.where(known, code_index, 0)
+    national_lengths = lengths - trie['code_lengths'][safe_index]
+
+    too_short = known & (national_lengths < trie['min_lengths'][safe_index])
+    too_long = known & ((national_lengths > trie['max_lengths'][safe_index]) | (lengths > E164_MAX_DIGITS))
+    nanp = known & (trie['codes'][safe_index] == '1') & ~too_short & ~too_long
+    # Area code (digit 2) and exchange (digit 5) of +1 numbers start with 2-9
+    nanp_heads = digits.str.slice(1, 5).str.pad(4, side='right', fillchar='0').to_numpy(dtype='S4')
+    nanp_heads = np.frombuffer(nanp_heads.tobytes(), dtype=np.uint8).reshape(-1, 4)
+    invalid_nanp = nanp & ((nanp_heads[:, 0] < ord('2')) | (nanp_heads[:, 3] < ord('2')))
+
+    reason = np.full(len(digits), None, dtype=object)
+    reason[invalid_nanp] = 'invalid_nanp'
+    reason[too_long] = 'too_long'
+    reason[too_short] = 'too_short'
+    reason[~known] = 'unknown_country_code'
+    reason[lengths == 0] = 'missing'
+    valid = pd.isna(reason)
+
+    return pd.DataFrame({
+        'digits': raw_digits.astype(object).where(raw_digits != '', None),
+        'e164': digits.astype(object).where(valid, None),
+        'calling_code': pd.Series(np.where(known, trie['codes'][safe_index], None), index=phones.index, dtype=object),
+        'region': pd.Series(np.where(known, trie['regions'][safe_index], None), index=phones.index, dtype=object),
+        'valid': valid,
+        'reason': reason
+    }, index=phones.index)
+
+def group_by_region(validation):
+    """
+    Positions of valid numbers per region, e.g. for per-region send throttling.
+
+    Args:
+        validation (pd.DataFrame): Result of validate_phone_numbers
+
+    Returns:
+        dict: {region: np.ndarray of positions}, largest group first
+    """
+    regions = validation['region'].to_numpy(dtype=object)
+    valid = validation['valid'].to_numpy()
+    codes, uniques = pd.factorize(regions[valid])
+    positions = np.flatnonzero(valid)
+    groups = {region: positions[codes == code] for code, region in enumerate(uniques)}
+    return dict(sorted(groups.items(), key=lambda item: len(item[1]), reverse=True))
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# Processing priority, most urgent first; anything else (e.g. 'Invalid Phone') goes last
+PRIORITY_LEVELS = ['High', 'Medium', 'Low']
+
+# Share of processing slots per category in weighted mode: 6 High for every 3 Medium and 1 Low
+DEFAULT_PRIORITY_WEIGHTS = {'High': 6, 'Medium': 3, 'Low': 1}
+
+def priority_order(risk_scores, weights=None, last_interaction_days=None):
+    """
+    Order leads for generation or sending so the most urgent come first.
+
+    Without weights the order is strict: every High lead, then Medium, then
+    Low. With weights the categories are interleaved in proportion to their
+    weight (stride scheduling), so Medium and Low leads still make progress
+    while High leads are being worked through. Within a category leads keep
+    sheet order, or with last_interaction_days the most inactive come first
+    (N/A counts as 0 days, like in assess_risk_category).
+
+    Args:
+        risk_scores: Risk category per lead
+        weights (dict): Optional {category: positive weight}
+        last_interaction_days: Optional inactivity per lead, aligned with risk_scores
+
+    Returns:
+        np.ndarray: Lead positions in processing order
+    """
+    risk_codes, risk_uniques = pd.factorize(np.asarray(risk_scores, dtype=object))
+    lookup = np.array(
+        [PRIORITY_LEVELS.index(risk) if risk in PRIORITY_LEVELS else len(PRIORITY_LEVELS) for risk in risk_uniques]
+        + [len(PRIORITY_LEVELS)],
+        dtype=np.int64
+    )
+    rank = lookup[risk_codes]
+    positions = np.arange(len(rank))
+
+    if last_interaction_days is not None:
+        days = pd.to_numeric(pd.Series(np.asarray(last_interaction_days, dtype=object)), errors='coerce')
+        order = np.lexsort((positions, -days.fillna(0).to_numpy(dtype=np.float64), rank))
+    else:
+        order = np.lexsort((positions, rank))
+
+    if weights is None:
+        return order
+
+    if any(weight <= 0 for weight in weights.values()):
+        raise ValueError("Priority weights must be positive")
+    category_weights = np.array(
+        [weights.get(level, 1) for level in PRIORITY_LEVELS] + [min(weights.values())],
+        dtype=np.float64
+    )
+
+    # The k-th lead of a category is due at virtual time (k + 1) / weight
+    ordered_rank = rank[order]
+    index_in_category = pd.Series(ordered_rank).groupby(ordered_rank).cumcount().to_numpy()
+    due = (index_in_category + 1) / category_weights[ordered_rank]
+    return order[np.lexsort((ordered_rank, due))]
@@ -0,0 +1,258 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEFAULT_RECIPIENT_INDEX_PATH = os.path.join('.leadgenius', 'recent_recipients.npz')
+
+# A number isn't messaged again within this many hours (0 turns the check off)
+DEDUPE_WINDOW_HOURS = float(os.environ.get("WHATSAPP_DEDUPE_WINDOW_HOURS", "24"))
+
+# Expiry granularity: entries are dropped a whole bucket at a time
+BUCKET_SECONDS = 3600
+
+# A batch in progress saves its claims at least this often, so a crash forgets little
+SAVE_INTERVAL_SECONDS = float(os.environ.get("LEADGENIUS_RECIPIENT_INDEX_SAVE_SECONDS", "5"))
+
+def get_recipient_index_path():
+    """Return the location of the persisted recent-recipient index."""
+    return os.environ.get("LEADGENIUS_RECIPIENT_INDEX_PATH", DEFAULT_RECIPIENT_INDEX_PATH)
+
+def recipient_key(phone_number):
+    """
+    Integer key for a phone number (its digits), or None when it has none.
+
+    E.164 numbers have at most 15 digits, so the key fits the int64 arrays
+    the index is persisted in.
+    """
+    if isinstance(phone_number, int):
+        return phone_number if 0 < phone_number < 10 ** 18 else None
+    digits = str(phone_number or '')
+    if not digits.isdigit():
+        digits = ''.join(filter(str.isdigit, digits))
+    if not digits or len(digits) > 18:
+        return None
+    return int(digits)
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock between processes saving the same index (a no-op where fcntl is missing)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class RecentRecipientIndex:
+    """
+    Phone numbers messaged within the last window_seconds, across batches and uploads.
+
+    Each number maps to the time it was last messaged, so a check is one
+    dict lookup. Numbers are also grouped into time buckets so expired ones
+    are dropped a bucket at a time rather than by scanning everything. The
+    index is persisted as int64/float64 arrays and merged with whatever
+    another process saved in the meantime. Released claims are kept as
+    tombstones (number and the claim time they cancel) for the rest of the
+    window, so a merge never brings back a claim whose send failed.
+
+    Args:
+        window_seconds (float): How long a number stays blocked after a send
+        path (str): .npz file to load from and save to (None keeps it in memory)
+        bucket_seconds (float): Expiry granularity
+        save_interval (float): Seconds between checkpoint() saves
+    """
+
+    def __init__(self, window_seconds=DEDUPE_WINDOW_HOURS * 3600, path=None, bucket_seconds=BUCKET_SECONDS,
+                 save_interval=SAVE_INTERVAL_SECONDS):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.path = path
+        self.save_interval = save_interval
+        self._last_save = time.monotonic()
+        self._last_sent = {}
+        self._buckets = {}
+        self._released = {}
+        self._expired_before = None
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._merge(*self._read(path))
+
+    def __len__(self):
+        return len(self._last_sent)
+
+    def retry_at(self, phone_number, now=None):
+        """
+        When a number may be messaged again.
+
+        Returns:
+            float: Epoch seconds, or None when it can be messaged now
+        """
+        key = recipient_key(phone_number)
+        if key is None or self.window_seconds <= 0:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            last_sent = self._last_sent.get(key)
+        if last_sent is None or now - last_sent >= self.window_seconds:
+            return None
+        return last_sent + self.window_seconds
+
+    def claim(self, phone_number, now=None):
+        """
+        Reserve a number for a send unless it was messaged within the window.
+
+        The check and the record happen under one lock, so concurrent
+        senders (and duplicate rows in one batch) can't both claim a number.
+
+        Returns:
+            float: None when the claim succeeded, otherwise the time it may be retried
+        """
+        key = recipient_key(phone_number)
+        if key is None or self.window_seconds <= 0:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            last_sent = self._last_sent.get(key)
+            if last_sent is not None and now - last_sent < self.window_seconds:
+                return last_sent + self.window_seconds
+            self._add(key, now)
+        return None
+
+    def release(self, phone_number):
+        """Forget a claim whose send failed, so the number can be retried."""
+        key = recipient_key(phone_number)
+        with self._lock:
+            claimed_at = self._last_sent.pop(key, None)
+            if claimed_at is not None and claimed_at > self._released.get(key, float('-inf')):
+                self._released[key] = claimed_at
+
+    def record(self, phone_numbers, now=None):
+        """Mark numbers as messaged now (e.g. sends made outside the sender)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for phone_number in phone_numbers:
+                key = recipient_key(phone_number)
+                if key is not None:
+                    self._add(key, now)
+
+    def checkpoint(self):
+        """
+        Save when save_interval seconds have passed since the last save.
+
+        Senders call this as they claim numbers, so a process that dies
+        mid-batch has still persisted all but the last few seconds of claims.
+
+        Returns:
+            str: Path written, or None when no save was due (or there is no path)
+        """
+        if not self.path or time.monotonic() - self._last_save < self.save_interval:
+            return None
+        return self.save()
+
+    def save(self, path=None):
+        """
+        Write the index, merged with the saved copy, atomically.
+
+        Returns:
+            str: Path written
+        """
+        path = path or self.path
+        self._last_save = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        import numpy as np
+
+        # Read, merge and replace under one lock, so no other process's claims are overwritten
+        with _file_lock(path):
+            with self._lock:
+                if os.path.exists(path):
+                    self._merge(*self._read(path))
+                now = time.time()
+                self._expire(now)
+                self._released = {
+                    key: claimed_at for key, claimed_at in self._released.items()
+                    if now - claimed_at < self.window_seconds
+                }
+                numbers = np.fromiter(self._last_sent.keys(), dtype=np.int64, count=len(self._last_sent))
+                sent_at = np.fromiter(self._last_sent.values(), dtype=np.float64, count=len(self._last_sent))
+                released = np.fromiter(self._released.keys(), dtype=np.int64, count=len(self._released))
+                released_at = np.fromiter(self._released.values(), dtype=np.float64, count=len(self._released))
+
+            # Unique per writer, so a half-written file is never replaced or moved by someone else
+            temp_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp.npz"
+            np.savez(temp_path, numbers=numbers, sent_at=sent_at, released=released, released_at=released_at)
+            os.replace(temp_path, path)
+        return path
+
+    @staticmethod
+    def _read(path):
+        # numpy is only needed for the file, so importing the sender stays light
+        import numpy as np
+
+        with np.load(path) as saved:
+            # Files saved before releases were recorded have no tombstones
+            if 'released' not in saved.files:
+                return saved['numbers'], saved['sent_at'], np.empty(0, np.int64), np.empty(0, np.float64)
+            return saved['numbers'], saved['sent_at'], saved['released'], saved['released_at']
+
+    def _merge(self, numbers, sent_at, released, released_at):
+        cutoff = time.time() - self.window_seconds
+        for key, claimed_at in zip(released.tolist(), released_at.tolist()):
+            if claimed_at > cutoff and claimed_at > self._released.get(key, float('-inf')):
+                self._released[key] = claimed_at
+                if self._last_sent.get(key, float('inf')) <= claimed_at:
+                    del self._last_sent[key]
+
+        keep = sent_at > cutoff
+        numbers, sent_at = numbers[keep], sent_at[keep]
+        if self._released:
+            import numpy as np
+
+            # A saved claim at or before its tombstone was released
+            released_before = np.array([self._released.get(key, float('-inf')) for key in numbers.tolist()])
+            keep = sent_at > released_before
+            numbers, sent_at = numbers[keep], sent_at[keep]
+        if not self._last_sent:
+            # Fresh load: build the dict and the buckets in bulk
+            self._last_sent = dict(zip(numbers.tolist(), sent_at.tolist()))
+            buckets = sent_at // self.bucket_seconds
+            for bucket in set(buckets.tolist()):
+                self._buckets[int(bucket)] = set(numbers[buckets == bucket].tolist())
+            return
+        for key, timestamp in zip(numbers.tolist(), sent_at.tolist()):
+            if timestamp > self._last_sent.get(key, float('-inf')):
+                self._add(key, timestamp)
+
+    def _add(self, key, timestamp):
+        self._last_sent[key] = timestamp
+        self._buckets.setdefault(int(timestamp // self.bucket_seconds), set()).add(key)
+
+    def _expire(self, now):
+        # Whole buckets older than the window; a number re-sent later lives on in a newer bucket
+        cutoff_bucket = int((now - self.window_seconds) // self.bucket_seconds)
+        if cutoff_bucket == self._expired_before:
+            return
+        self._expired_before = cutoff_bucket
+        for bucket in [bucket for bucket in self._buckets if bucket < cutoff_bucket]:
+            for key in self._buckets.pop(bucket):
+                if self._last_sent.get(key, now) // self.bucket_seconds <= bucket:
+                    del self._last_sent[key]
+
+_recipient_index = None
+
+def get_recipient_index():
+    """Shared recent-recipient index, loaded from get_recipient_index_path() on first use."""
+    global _recipient_index
+    if _recipient_index is None:
+        _recipient_index = RecentRecipientIndex(path=get_recipient_index_path())
+    return _recipient_index
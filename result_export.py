@@ -0,0 +1,167 @@
+import csv
+import glob
+import os
+import tempfile
+import time
+import weakref
+
+import pandas as pd
+
+from lead_encoding import decode_lead_columns
+
+# Columns appended after the uploaded ones
+RESULT_COLUMNS = ['Risk Score', 'Phone', 'WhatsApp Message', 'WhatsApp Link']
+
+EXPORT_MIME_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+_TEMP_PREFIX = 'leadgenius-results-'
+
+# Temp files older than this are left over from sessions that ended without cleanup()
+STALE_EXPORT_SECONDS = 24 * 3600
+
+# Rows read back from the CSV per chunk when writing the Excel file
+XLSX_CHUNK_ROWS = 50000
+
+def _remove_files(paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+def _remove_stale_exports(directory):
+    cutoff = time.time() - STALE_EXPORT_SECONDS
+    for path in glob.glob(os.path.join(directory or tempfile.gettempdir(), f"{_TEMP_PREFIX}*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def build_export_frame(input_df, results):
+    """
+    Combine uploaded columns with result columns for a block of leads.
+
+    Args:
+        input_df: Rows of the uploaded data (encoded or raw) with only the uploaded columns
+        results: Dict or DataFrame with RESULT_COLUMNS aligned with input_df
+
+    Returns:
+        pd.DataFrame: Uploaded columns in their readable form followed by RESULT_COLUMNS
+    """
+    frame = decode_lead_columns(input_df).reset_index(drop=True)
+    for column in RESULT_COLUMNS:
+        values = results[column]
+        frame[column] = list(values) if not isinstance(values, pd.Series) else values.to_numpy()
+    return frame
+
+class StreamingExporter:
+    """
+    Results file that grows as leads finish.
+
+    Rows are appended to a temporary CSV as soon as they are ready, so a
+    partial download is available mid-run and the final file is never built
+    as a second in-memory copy. The Excel version is produced at the end by
+    streaming the CSV through an openpyxl write-only workbook, with the
+    columns that were numeric in every appended block written as numbers.
+
+    The temp files are removed by cleanup(), when the exporter is garbage
+    collected (e.g. its session ended) or at exit; ones left by a crashed
+    process are swept after STALE_EXPORT_SECONDS.
+    """
+
+    def __init__(self, columns, directory=None):
+        self.columns = list(columns)
+        self.rows_written = 0
+        self._directory = directory
+        self._numeric_columns = None
+        _remove_stale_exports(directory)
+        handle, self.csv_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, suffix='.csv', dir=directory)
+        self._file = os.fdopen(handle, 'w', newline='', encoding='utf-8')
+        csv.writer(self._file).writerow(self.columns)
+        self._file.flush()
+        self._complete_bytes = self._file.tell()
+        self._xlsx_path = None
+        self._paths = [self.csv_path]
+        self._finalizer = weakref.finalize(self, _remove_files, self._paths)
+
+    def append(self, frame):
+        """Append a block of finished rows (a DataFrame with self.columns)."""
+        if len(frame) == 0:
+            return
+        frame = frame[self.columns]
+        numeric = {
+            column for column in self.columns
+            if pd.api.types.is_numeric_dtype(frame[column]) and not pd.api.types.is_bool_dtype(frame[column])
+        }
+        self._numeric_columns = numeric if self._numeric_columns is None else self._numeric_columns & numeric
+        frame.to_csv(self._file, header=False, index=False)
+        # Downloads read up to here, so they never see a half-written row
+        self._file.flush()
+        self._complete_bytes = self._file.tell()
+        self.rows_written += len(frame)
+
+    def partial_csv(self):
+        """
+        Everything written so far as CSV bytes (for a mid-run download).
+
+        Pass the method itself as a download button's data, so the file is
+        only read when the button is clicked.
+        """
+        with open(self.csv_path, 'rb') as f:
+            return f.read(self._complete_bytes)
+
+    def finalize(self, file_format='csv'):
+        """
+        Close the CSV and return the path of the finished file.
+
+        Args:
+            file_format (str): 'csv' or 'xlsx'
+
+        Returns:
+            str: Path to the results file
+        """
+        if not self._file.closed:
+            self._file.close()
+        if file_format == 'csv':
+            return self.csv_path
+        if file_format != 'xlsx':
+            raise ValueError(f"Unsupported export format: {file_format}")
+
+        if self._xlsx_path is None:
+            from openpyxl import Workbook
+
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Results')
+            sheet.append(self.columns)
+            numeric_columns = self._numeric_columns or set()
+            # Text stays exactly as written ("N/A", leading zeros); numeric columns are parsed back
+            for chunk in pd.read_csv(self.csv_path, dtype=str, keep_default_na=False, chunksize=XLSX_CHUNK_ROWS):
+                chunk = chunk.astype(object)
+                for column in numeric_columns:
+                    values = pd.to_numeric(chunk[column], errors='coerce')
+                    chunk[column] = values.astype(object).where(values.notna(), None)
+                for row in chunk.itertuples(index=False, name=None):
+                    sheet.append(row)
+            handle, self._xlsx_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, suffix='.xlsx', dir=self._directory)
+            os.close(handle)
+            self._paths.append(self._xlsx_path)
+            workbook.save(self._xlsx_path)
+        return self._xlsx_path
+
+    def read(self, file_format='csv'):
+        """
+        Finalize and return the file's bytes (what a download button needs).
+
+        Wrap it in a callable for a download button's data, so the file is
+        only read (and converted) when the button is clicked.
+        """
+        with open(self.finalize(file_format), 'rb') as f:
+            return f.read()
+
+    def cleanup(self):
+        """Delete the temporary files."""
+        if not self._file.closed:
+            self._file.close()
+        self._finalizer()
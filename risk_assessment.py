@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def assess_risk_category(row):
@@ -84,6 +85,234 @@ def assess_risk_category(row):
     # DEFAULT: If none of the above conditions are satisfied, assign Medium Risk
     return 'Medium'
 
+# Propensity score (0-100, higher = more at risk) at which each category starts.
+# The rule-based categories map onto these bands, so a score always falls in
+# its category's band and the category can be read back from the score alone.
+RISK_SCORE_THRESHOLDS = [('High', 67), ('Medium', 34), ('Low', 0)]
+
+# Points each risk signal adds to the in-band position (they sum to 100)
+PROPENSITY_WEIGHTS = {
+    'missed_demos': 30,     # scaled by missed demos, capped at 2
+    'inactivity': 25,       # scaled by Last Interaction Days, capped at 30
+    'contact_not_shared': 15,   # N/A counts for two thirds
+    'link_not_clicked': 10,
+    'scheduled_by_agent': 10,
+    'no_show': 10
+}
+
+MISSED_DEMOS_CAP = 2
+INACTIVITY_DAYS_CAP = 30
+
+def _normalized_values(df, column, na_value=''):
+    """Lower-cased, stripped text of a column, computed once per distinct value."""
+    if column not in df.columns:
+        return np.full(len(df), na_value, dtype=object)
+    codes, uniques = pd.factorize(df[column], use_na_sentinel=True)
+    lookup = np.array([str(value).strip().lower() for value in uniques] + [na_value], dtype=object)
+    return lookup[codes]
+
+def _count_values(df, column):
+    """Whole-number counts of a column; N/A and anything non-numeric count as 0."""
+    if column not in df.columns:
+        return np.zeros(len(df))
+    values = df[column]
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        values = pd.to_numeric(values.astype(object), errors='coerce')
+    return np.trunc(np.nan_to_num(values.to_numpy(dtype=np.float64, na_value=np.nan)))
+
+def risk_category_from_score(scores):
+    """
+    Map propensity scores back to risk categories with RISK_SCORE_THRESHOLDS.
+
+    Args:
+        scores: Propensity scores (0-100)
+
+    Returns:
+        np.ndarray: 'High', 'Medium' or 'Low' per score
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select(
+        [scores >= threshold for _, threshold in RISK_SCORE_THRESHOLDS[:-1]],
+        [category for category, _ in RISK_SCORE_THRESHOLDS[:-1]],
+        RISK_SCORE_THRESHOLDS[-1][0]
+    ).astype(object)
+
+def assess_risk_scores(df):
+    """
+    Score every lead in one vectorized pass: risk category and propensity score.
+
+    The category follows exactly the rules of assess_risk_category. The
+    propensity score places each lead inside its category's band (see
+    RISK_SCORE_THRESHOLDS) by a weighted sum of its risk signals, so leads in
+    the same category can be ranked against each other. Raw upload values and
+    the encode_lead_columns dtypes are both accepted.
+
+    Args:
+        df: DataFrame of leads
+
+    Returns:
+        tuple: (risk_categories, propensity_scores), both pd.Series aligned with df.index
+    """
+    missed_demos = _count_values(df, 'Missed Demos')
+    last_interaction_days = _count_values(df, 'Last Interaction Days')
+    contact_shared = _normalized_values(df, 'Contact Shared', na_value='n/a')
+    link_clicked = _normalized_values(df, 'Link Clicked')
+    scheduled_by = _normalized_values(df, 'Scheduled By')
+    showed_up_for_demo = _normalized_values(df, 'Showed Up for Demo')
+
+    contact_shared_yes = np.isin(contact_shared, ['yes', 'y', '1', 'true'])
+    contact_shared_no = np.isin(contact_shared, ['no', 'n', '0', 'false'])
+    contact_shared_na = np.isin(contact_shared, ['n/a', 'na', ''])
+    link_clicked_yes = np.isin(link_clicked, ['yes', 'y', '1', 'true'])
+    link_clicked_no = np.isin(link_clicked, ['no', 'n', '0', 'false'])
+    showed_up_yes = np.isin(showed_up_for_demo, ['yes', 'y', '1', 'true'])
+    scheduled_by_agent = scheduled_by == 'agent'
+
+    # Same precedence as assess_risk_category: High rules, then Low, otherwise Medium
+    high = (
+        (missed_demos >= 1)
+        | ((last_interaction_days > 10) & (contact_shared_no | contact_shared_na))
+        | (link_clicked_no & scheduled_by_agent)
+    )
+    low = ~high & (showed_up_yes | ((last_interaction_days <= 5) & contact_shared_yes))
+    band = np.where(high, 0, np.where(low, 2, 1))
+
+    weights = PROPENSITY_WEIGHTS
+    signals = (
+        weights['missed_demos'] * np.clip(missed_demos, 0, MISSED_DEMOS_CAP) / MISSED_DEMOS_CAP
+        + weights['inactivity'] * np.clip(last_interaction_days, 0, INACTIVITY_DAYS_CAP) / INACTIVITY_DAYS_CAP
+        + weights['contact_not_shared'] * np.where(contact_shared_yes, 0, np.where(contact_shared_na, 2 / 3, 1))
+        + weights['link_not_clicked'] * ~link_clicked_yes
+        + weights['scheduled_by_agent'] * scheduled_by_agent
+        + weights['no_show'] * ~showed_up_yes
+    ) / sum(weights.values())
+
+    # Band floors/ceilings from the thresholds, e.g. Medium covers 34 up to just under 67
+    floors = np.array([threshold for _, threshold in RISK_SCORE_THRESHOLDS], dtype=np.float64)
+    ceilings = np.array([100.0] + [threshold - 1 for _, threshold in RISK_SCORE_THRESHOLDS[:-1]])
+    scores = np.round(floors[band] + signals * (ceilings[band] - floors[band]), 1)
+
+    categories = np.array([category for category, _ in RISK_SCORE_THRESHOLDS], dtype=object)[band]
+    return pd.Series(categories, index=df.index), pd.Series(scores, index=df.index)
+
+def top_risk_leads(scores, k):
+    """
+    Positions of the k highest propensity scores, highest first.
+
+    Uses np.argpartition, so picking the next leads to call stays linear in
+    the number of leads; only the k selected are sorted. Ties keep sheet
+    order and NaN scores (e.g. leads without a valid phone) are never picked.
+
+    Args:
+        scores: Propensity score per lead
+        k (int): Number of leads to return
+
+    Returns:
+        np.ndarray: Up to k lead positions
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    candidates = np.flatnonzero(~np.isnan(scores))
+    k = min(int(k), len(candidates))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+
+    values = scores[candidates]
+    if k < len(candidates):
+        # Everything above the k-th highest score, then the earliest of the leads tied with it
+        kth = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = np.flatnonzero(values > kth)
+        tied = np.flatnonzero(values == kth)[:k - len(above)]
+        selected = np.concatenate([above, tied])
+    else:
+        selected = np.arange(len(candidates))
+    selected = selected[np.lexsort((selected, -values[selected]))]
+    return candidates[selected]
+
+RISK_CATEGORIES = ['High', 'Medium', 'Low', 'Invalid Phone']
+
+BREAKDOWN_COLUMNS = ['Channel', 'Scheduled By']
+
+class RiskStatistics:
+    """
+    Risk category counts that are updated as leads are scored.
+
+    Chunks of scored leads are folded in with add(); counts, percentages
+    and the Channel / Scheduled By breakdowns are then read in O(1) without
+    rescanning the results table. The app keeps one per upload in the
+    session, so reruns don't recount.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.counts = dict.fromkeys(RISK_CATEGORIES, 0)
+        self.breakdowns = {column: {} for column in BREAKDOWN_COLUMNS}
+
+    def add(self, chunk):
+        """
+        Fold a chunk of scored leads into the statistics.
+
+        Args:
+            chunk: DataFrame with a 'Risk Score' column and optionally
+                   'Channel' and 'Scheduled By'
+        """
+        if 'Risk Score' not in chunk.columns or len(chunk) == 0:
+            return
+
+        risk_scores = chunk['Risk Score'].astype(str)
+        self.total += len(chunk)
+        for risk_level, count in risk_scores.value_counts().items():
+            self.counts[risk_level] = self.counts.get(risk_level, 0) + int(count)
+
+        for column in BREAKDOWN_COLUMNS:
+            if column not in chunk.columns:
+                continue
+            keys = chunk[column].astype(str).str.strip()
+            keys = keys.where(chunk[column].notna() & (keys != ''), 'Unknown')
+            sizes = risk_scores.groupby([keys, risk_scores], observed=True).size()
+            for (value, risk_level), count in sizes.items():
+                group = self.breakdowns[column].setdefault(value, {})
+                group[risk_level] = group.get(risk_level, 0) + int(count)
+
+    def count(self, risk_level):
+        """Number of leads currently in a risk category."""
+        return self.counts.get(risk_level, 0)
+
+    def percentage(self, risk_level):
+        """Share of all leads in a risk category, rounded like get_risk_statistics."""
+        if self.total == 0:
+            return 0
+        return round(self.count(risk_level) / self.total * 100, 1)
+
+    def as_dict(self, risk_levels=None):
+        """
+        Return the statistics in the get_risk_statistics format.
+
+        Args:
+            risk_levels (list): Categories to include (defaults to all, Invalid Phone included)
+
+        Returns:
+            dict: Count and percentage for each risk category
+        """
+        return {
+            risk_level: {'count': self.count(risk_level), 'percentage': self.percentage(risk_level)}
+            for risk_level in (risk_levels or RISK_CATEGORIES)
+        }
+
+    def breakdown(self, column):
+        """
+        Risk category counts per value of a breakdown column.
+
+        Args:
+            column (str): 'Channel' or 'Scheduled By'
+
+        Returns:
+            dict: {column value: {risk category: count}}
+        """
+        return {
+            value: {risk_level: counts.get(risk_level, 0) for risk_level in RISK_CATEGORIES}
+            for value, counts in self.breakdowns[column].items()
+        }
+
 def get_risk_statistics(df):
     """
     Calculate statistics for each risk category.
@@ -97,19 +326,10 @@ def get_risk_statistics(df):
     if 'Risk Score' not in df.columns:
         return {}
     
-    risk_counts = df['Risk Score'].value_counts()
-    total_leads = len(df)
-    
-    stats = {}
-    for risk_level in ['High', 'Medium', 'Low']:
-        count = risk_counts.get(risk_level, 0)
-        percentage = (count / total_leads * 100) if total_leads > 0 else 0
-        stats[risk_level] = {
-            'count': count,
-            'percentage': round(percentage, 1)
-        }
+    stats = RiskStatistics()
+    stats.add(df[['Risk Score']])
     
-    return stats
+    return stats.as_dict(['High', 'Medium', 'Low'])
 
 def validate_lead_data(row):
     """
@@ -167,3 +387,113 @@ def validate_lead_data(row):
         errors.append(f"Scheduled By must be 'Agent' or 'Self' (found: '{row.get('Scheduled By')}')")
     
     return len(errors) == 0, errors
+
+# Column-wise validation rules mirroring validate_lead_data: (rule, field, message).
+# pd.read_excel turns "N/A" cells into NaN, so blanks are accepted wherever N/A is.
+VALIDATION_RULES = [
+    ('missing', 'Lead Name', "Missing or empty field: Lead Name"),
+    ('missing', 'Missed Demos', "Missing or empty field: Missed Demos"),
+    ('missing', 'Link Clicked', "Missing or empty field: Link Clicked"),
+    ('missing', 'Scheduled By', "Missing or empty field: Scheduled By"),
+    ('missing', 'Showed Up for Demo', "Missing or empty field: Showed Up for Demo"),
+    ('non_numeric', 'Missed Demos', "Missed Demos must be a number"),
+    ('non_numeric', 'Last Interaction Days', "Last Interaction Days must be a number or N/A"),
+    ('bad_boolean', 'Link Clicked', "Link Clicked must be Yes/No"),
+    ('bad_boolean', 'Showed Up for Demo', "Showed Up for Demo must be Yes/No"),
+    ('bad_boolean', 'Contact Shared', "Contact Shared must be Yes/No/N/A"),
+    ('bad_scheduled_by', 'Scheduled By', "Scheduled By must be 'Agent' or 'Self'"),
+]
+
+VALID_BOOLEAN_VALUES = ['yes', 'no', 'y', 'n', '1', '0', 'true', 'false']
+
+def _is_number(value):
+    try:
+        int(value)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def _unique_value_checks(field, value):
+    """Evaluate every rule for one distinct value of a field."""
+    missing = pd.isna(value) or str(value).strip() == ''
+    normalized = str(value).strip().lower()
+
+    checks = {'missing': missing}
+    if field == 'Missed Demos':
+        checks['non_numeric'] = not _is_number(value)
+    elif field == 'Last Interaction Days':
+        checks['non_numeric'] = not (pd.isna(value) or normalized == 'n/a' or _is_number(value))
+    elif field in ('Link Clicked', 'Showed Up for Demo'):
+        checks['bad_boolean'] = normalized not in VALID_BOOLEAN_VALUES
+    elif field == 'Contact Shared':
+        checks['bad_boolean'] = not (pd.isna(value) or normalized in VALID_BOOLEAN_VALUES + ['n/a', 'na'])
+    elif field == 'Scheduled By':
+        checks['bad_scheduled_by'] = normalized not in ['agent', 'self']
+    return checks
+
+def validate_leads(df):
+    """
+    Validate every lead in one column-wise pass (vectorized validate_lead_data).
+
+    Each field is factorized so the per-value checks run once per distinct value
+    instead of once per row, which keeps large uploads well under a second.
+
+    Args:
+        df: DataFrame of leads
+
+    Returns:
+        tuple: (error_table, rule_counts) where error_table has one row per failed
+               check with 'Row', 'Field', 'Error' and 'Value' columns, and
+               rule_counts maps each rule message to the number of failing rows
+    """
+    fields = list(dict.fromkeys(field for _, field, _ in VALIDATION_RULES))
+    masks = {}
+    values_by_field = {}
+
+    for field in fields:
+        if field in df.columns:
+            values = df[field]
+        else:
+            values = pd.Series([None] * len(df), index=df.index, dtype=object)
+        values_by_field[field] = values
+
+        if field == 'Lead Name':
+            # Names are nearly all distinct, so only the missing check runs and it runs on the column directly
+            blank = values.fillna('').astype(str).str.strip() == ''
+            masks[('missing', field)] = blank.to_numpy(dtype=bool)
+            continue
+
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        unique_checks = [_unique_value_checks(field, value) for value in uniques]
+        na_checks = _unique_value_checks(field, None)
+
+        for rule in na_checks:
+            # The NA sentinel (-1) indexes the last slot, which holds the NA result
+            lookup = np.array([checks[rule] for checks in unique_checks] + [na_checks[rule]], dtype=bool)
+            masks[(rule, field)] = lookup[codes]
+
+    row_labels = df.index.to_numpy()
+    tables = []
+    rule_counts = {}
+    for rule, field, message in VALIDATION_RULES:
+        failing = np.flatnonzero(masks[(rule, field)])
+        rule_counts[message] = int(len(failing))
+        if len(failing):
+            tables.append(pd.DataFrame({
+                'Row': row_labels[failing],
+                'Field': field,
+                'Error': message,
+                'Value': values_by_field[field].to_numpy()[failing]
+            }))
+
+    if tables:
+        error_table = pd.concat(tables, ignore_index=True)
+    else:
+        error_table = pd.DataFrame(columns=['Row', 'Field', 'Error', 'Value'])
+
+    # Repeated strings are stored once per category to keep the table compact
+    error_table['Field'] = error_table['Field'].astype('category')
+    error_table['Error'] = error_table['Error'].astype('category')
+    error_table['Value'] = error_table['Value'].astype(object)
+
+    return error_table.sort_values('Row', kind='stable', ignore_index=True), rule_counts
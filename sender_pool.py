@@ -0,0 +1,251 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import time
+
+import metrics
+from recipient_index import recipient_key
+from adaptive_concurrency import backoff_delay
+from whatsapp_sender import AsyncWhatsAppSender, STATUS_RECORD_BATCH, WHATSAPP_MAX_SEND_ATTEMPTS
+
+# Ring positions per account; more points spread recipients more evenly
+VIRTUAL_NODES = 64
+
+# How long a throttled account is skipped when the API didn't say
+THROTTLE_COOLDOWN_SECONDS = 30.0
+
+# Throttled responses a recipient gets per account before its send is given up
+THROTTLED_ATTEMPTS_PER_ACCOUNT = 3
+
+def _ring_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+def load_sender_accounts():
+    """
+    Read sender accounts from the environment.
+
+    WHATSAPP_SENDER_ACCOUNTS holds a JSON list of {"phone_number_id", "access_token"}
+    objects (access_token defaults to WHATSAPP_ACCESS_TOKEN, for numbers under one
+    app). Without it the single WHATSAPP_PHONE_NUMBER_ID account is used.
+
+    Returns:
+        list: Account dicts with 'phone_number_id' and 'access_token'
+    """
+    default_token = os.environ.get("WHATSAPP_ACCESS_TOKEN")
+    raw = os.environ.get("WHATSAPP_SENDER_ACCOUNTS")
+    if raw:
+        return [
+            {'phone_number_id': str(account['phone_number_id']), 'access_token': account.get('access_token') or default_token}
+            for account in json.loads(raw)
+        ]
+    return [{'phone_number_id': os.environ.get("WHATSAPP_PHONE_NUMBER_ID"), 'access_token': default_token}]
+
+class SenderPool:
+    """
+    Spread bulk sends over several WhatsApp sender numbers.
+
+    Every account is its own AsyncWhatsAppSender, with its own rate pacing
+    and httpx connection pool. Recipients are placed on a consistent-hash
+    ring, so a lead is always messaged from the same business number (the
+    conversation stays in one thread) and adding or removing an account
+    only moves the recipients that hashed to it. When an account is
+    throttled its recipients fail over to the next account on the ring
+    until the cooldown ends.
+
+    Args:
+        senders (list): AsyncWhatsAppSender per account; for a dedupe window give
+                        them all the same recipient_index
+        status_store (DeliveryStatusStore): Optional store for sent message ids
+        virtual_nodes (int): Ring positions per account
+    """
+
+    def __init__(self, senders, status_store=None, virtual_nodes=VIRTUAL_NODES):
+        if not senders:
+            raise ValueError("SenderPool needs at least one sender account")
+        self.senders = list(senders)
+        self.status_store = status_store
+        self._throttled_until = [0.0] * len(self.senders)
+        self._slots = None
+        self.stats = [{'sent': 0, 'failed': 0, 'throttled': 0, 'failovers': 0} for _ in self.senders]
+
+        ring = sorted(
+            (_ring_hash(f"{sender.phone_number_id}#{node}"), position)
+            for position, sender in enumerate(self.senders)
+            for node in range(virtual_nodes)
+        )
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_accounts = [position for _, position in ring]
+
+    @classmethod
+    def from_env(cls, recipient_index=None, status_store=None, **sender_options):
+        """Build a pool from load_sender_accounts(); sender_options go to each AsyncWhatsAppSender."""
+        senders = [
+            AsyncWhatsAppSender(
+                access_token=account['access_token'], phone_number_id=account['phone_number_id'],
+                recipient_index=recipient_index, **sender_options
+            )
+            for account in load_sender_accounts()
+        ]
+        return cls(senders, status_store)
+
+    def is_configured(self):
+        return all(sender.is_configured() for sender in self.senders)
+
+    def route(self, phone_number):
+        """
+        Accounts to try for a recipient, in preference order.
+
+        Returns:
+            list: Account positions, the recipient's home account first and then
+                  the other accounts in ring order (the failover sequence)
+        """
+        key = recipient_key(self.senders[0].format_phone_number(phone_number))
+        start = bisect.bisect(self._ring_hashes, _ring_hash(str(key)))
+        preference = []
+        for offset in range(len(self._ring_accounts)):
+            account = self._ring_accounts[(start + offset) % len(self._ring_accounts)]
+            if account not in preference:
+                preference.append(account)
+                if len(preference) == len(self.senders):
+                    break
+        return preference
+
+    def account_for(self, phone_number):
+        """The sender a recipient is normally messaged from."""
+        return self.senders[self.route(phone_number)[0]]
+
+    def _available(self, preference):
+        """First account in preference order that isn't cooling down, else how long to wait."""
+        now = time.monotonic()
+        for account in preference:
+            if self._throttled_until[account] <= now:
+                return account, 0.0
+        return None, min(self._throttled_until[account] for account in preference) - now
+
+    async def _send(self, clients, phone, skeleton, values, region=None):
+        """
+        Send through the recipient's home account, failing over while it is throttled.
+
+        A recipient gives up after THROTTLED_ATTEMPTS_PER_ACCOUNT throttled
+        responses per account, or at once on a pair rate limit (which only
+        concerns this recipient, so the account isn't benched). The failed
+        result keeps 'throttled' and 'retry_after' for rescheduling.
+        """
+        preference = self.route(phone)
+        attempt = 0
+        throttled_attempts = 0
+        while True:
+            account, wait = self._available(preference)
+            if account is None:
+                await asyncio.sleep(wait)
+                continue
+
+            sender = self.senders[account]
+            async with self._slots[account]:
+                result = await sender._send_payload_async(clients[account], phone, skeleton, max_attempts=1,
+                                                     region=region, **values)
+
+            # Timeouts, network errors and 5xx are retried on the same account with backoff
+            attempt += 1
+            if result.get('transient') and attempt < WHATSAPP_MAX_SEND_ATTEMPTS:
+                metrics.increment('whatsapp_retries_total')
+                await asyncio.sleep(backoff_delay(attempt - 1))
+                continue
+
+            if result.get('throttled') and not result.get('pair_rate_limited'):
+                cooldown = result.get('retry_after') or THROTTLE_COOLDOWN_SECONDS
+                self._throttled_until[account] = time.monotonic() + cooldown
+                self.stats[account]['throttled'] += 1
+                metrics.increment('whatsapp_sender_throttled_total', phone_number_id=str(sender.phone_number_id))
+                throttled_attempts += 1
+                if throttled_attempts < THROTTLED_ATTEMPTS_PER_ACCOUNT * len(preference):
+                    continue
+                result['retry_after'] = cooldown
+
+            self.stats[account]['sent' if result['success'] else 'failed'] += 1
+            if account != preference[0]:
+                self.stats[account]['failovers'] += 1
+                metrics.increment('whatsapp_sender_failovers_total')
+            result['phone_number_id'] = sender.phone_number_id
+            return result
+
+    async def send_batch_messages_async(self, messages_data, order=None, on_result=None, template=None):
+        """
+        Send multiple messages across the pool's accounts.
+
+        Args and results as AsyncWhatsAppSender.send_batch_messages_async; each
+        result also has the 'phone_number_id' it was sent from.
+        """
+        results = [None] * len(messages_data)
+        pending = iter(order if order is not None else range(len(messages_data)))
+        sent_records = []
+        # No account has more requests in flight than its own limit
+        self._slots = [asyncio.Semaphore(sender.max_concurrency) for sender in self.senders]
+        # The senders share one recipient index, so any of them can do the dedupe bookkeeping
+        first = self.senders[0]
+        validation = first._preflight(messages_data)
+        valid, reasons, regions = (validation[column].to_numpy() for column in ('valid', 'reason', 'region'))
+
+        async def worker(clients):
+            for i in pending:
+                data = messages_data[i]
+                lead_name = data.get('lead_name', f"Lead {i+1}")
+                request = first._batch_request(data, lead_name, template)
+
+                if request is None:
+                    metrics.increment('whatsapp_messages_sent_total', result='skipped')
+                    result = {
+                        "lead_name": lead_name,
+                        "success": False,
+                        "error": "Missing phone number" if template is not None else "Missing phone number or message",
+                        "message_id": None
+                    }
+                elif not valid[i]:
+                    result = first._invalid_result(lead_name, reasons[i])
+                else:
+                    result = first._claim_recipient(data['phone'], lead_name)
+
+                if result is None:
+                    skeleton, values = request
+                    result = await self._send(clients, data['phone'], skeleton, values, region=regions[i])
+                    result["lead_name"] = lead_name
+                    first._release_recipient(data['phone'], result)
+                    metrics.increment('whatsapp_messages_sent_total', result='success' if result['success'] else 'failure')
+                    if result['success'] and self.status_store is not None:
+                        sent_records.append({'message_id': result['message_id'], 'lead_name': lead_name, 'phone': data['phone']})
+                        if len(sent_records) >= STATUS_RECORD_BATCH:
+                            self.status_store.record_sent(sent_records)
+                            sent_records.clear()
+
+                results[i] = result
+                if on_result is not None:
+                    on_result(i, result)
+
+        clients = [sender.create_client() for sender in self.senders]
+        try:
+            workers = min(sum(sender.max_concurrency for sender in self.senders), len(messages_data))
+            await asyncio.gather(*(worker(clients) for _ in range(workers)))
+        finally:
+            for client in clients:
+                await client.aclose()
+
+        if sent_records:
+            self.status_store.record_sent(sent_records)
+        first._save_recipient_index()
+        return results
+
+    def send_batch_messages(self, messages_data, order=None, on_result=None, template=None):
+        """
+        Blocking wrapper around send_batch_messages_async (not for use inside a running event loop).
+        """
+        return asyncio.run(self.send_batch_messages_async(messages_data, order, on_result, template))
+
+    def snapshot(self):
+        """Per-account counters and whether each account is cooling down."""
+        now = time.monotonic()
+        return [
+            dict(stats, phone_number_id=sender.phone_number_id, throttled_for=max(0.0, round(until - now, 1)))
+            for sender, stats, until in zip(self.senders, self.stats, self._throttled_until)
+        ]
@@ -0,0 +1,371 @@
+"""
+Opt-in profiling of lead processing runs.
+
+A profile wraps one run (an upload in the app, a worker job, or the
+command below) and records every pipeline stage separately: wall time,
+a cProfile (or pyinstrument) call profile and, with tracemalloc, the peak
+memory allocated during the stage. The report is saved as text and JSON
+under LEADGENIUS_PROFILE_DIR (default .leadgenius/profiles/) together with
+a .prof file for snakeviz or pstats.
+
+Reproduce a user's slow file locally:
+
+    python -m stage_profiler their_leads.xlsx --max-ai-requests 0
+
+In production, LEADGENIUS_PROFILE_SAMPLE_RATE=0.01 profiles 1% of runs.
+Stages outside a profile cost one thread-local lookup.
+"""
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_PROFILE_DIR = os.path.join('.leadgenius', 'profiles')
+
+# 'cprofile' (standard library, deterministic) or 'pyinstrument' (sampling, lower overhead; pip install pyinstrument)
+DEFAULT_PROFILE_ENGINE = os.environ.get("LEADGENIUS_PROFILE_ENGINE", "cprofile")
+
+# Share of runs profiled without being asked to, between 0 and 1
+PROFILE_SAMPLE_RATE = float(os.environ.get("LEADGENIUS_PROFILE_SAMPLE_RATE", "0"))
+
+# tracemalloc slows allocation-heavy code down noticeably; turn it off for a cheaper profile
+# (sampled runs never track memory)
+PROFILE_MEMORY = os.environ.get("LEADGENIUS_PROFILE_MEMORY", "1").lower() not in ("0", "false", "no")
+
+# Functions listed per stage in the text report
+PROFILE_TOP_FUNCTIONS = 25
+
+PROFILE_ENGINES = ['cprofile', 'pyinstrument']
+
+_NULL_STAGE = nullcontext()
+
+# The profile of the run on this thread (each app session and worker job runs on its own)
+_local = threading.local()
+
+# tracemalloc is process-wide: it is started for the first session that wants
+# memory figures and stopped when the last one finishes
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # Leave tracemalloc running if someone else started it
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+def get_profile_dir():
+    """Return the directory profile reports are saved in."""
+    return os.environ.get("LEADGENIUS_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+
+def available_engines():
+    """Profiling engines that can be used here (pyinstrument only when installed)."""
+    import importlib.util
+
+    return [engine for engine in PROFILE_ENGINES if engine == 'cprofile' or importlib.util.find_spec(engine)]
+
+def should_profile(sample_rate=None):
+    """
+    Decide whether to profile a run that nobody asked to profile.
+
+    Args:
+        sample_rate (float): Probability of profiling, defaults to PROFILE_SAMPLE_RATE
+    """
+    sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    return sample_rate > 0 and random.random() < sample_rate
+
+class ProfileSession:
+    """
+    Per-stage profile of one run.
+
+    Stages must not overlap. The call profile only covers the thread that
+    runs the stage; work handed to a thread pool shows up as time spent
+    waiting on it. Python 3.12+ allows one cProfile at a time per process,
+    so a stage that starts while another session is profiling is timed
+    without a call profile. tracemalloc is process-wide, so in a shared
+    process the memory figures include other threads' allocations made at
+    the same time.
+
+    Args:
+        name (str): What is being profiled, e.g. the uploaded file name
+        engine (str): 'cprofile' or 'pyinstrument'
+        memory (bool): Track peak allocations per stage with tracemalloc
+        top (int): Functions listed per stage in the report
+    """
+
+    def __init__(self, name, engine=None, memory=None, top=PROFILE_TOP_FUNCTIONS):
+        self.name = name
+        self.engine = engine or DEFAULT_PROFILE_ENGINE
+        if self.engine not in PROFILE_ENGINES:
+            raise ValueError(f"Unknown profiling engine: {self.engine}")
+        if self.engine == 'pyinstrument':
+            import pyinstrument  # noqa: F401 - fail now rather than in the first stage
+        self.memory = PROFILE_MEMORY if memory is None else memory
+        self.top = top
+        self.started_at = time.time()
+        self.stages = []
+        self._profiles = []
+        self._start = time.perf_counter()
+        self._finished = False
+        if self.memory:
+            _acquire_tracemalloc()
+
+    @contextmanager
+    def stage(self, name):
+        """Profile one stage of the run."""
+        if self.memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            profile_text = self._stop_profiler(profiler)
+            record = {'stage': name, 'seconds': round(seconds, 6), 'profile': profile_text}
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['peak_bytes'] = max(peak - memory_before, 0)
+                record['net_bytes'] = current - memory_before
+            self.stages.append(record)
+
+    def _start_profiler(self):
+        try:
+            if self.engine == 'pyinstrument':
+                from pyinstrument import Profiler
+                profiler = Profiler(interval=0.001)
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        except (ValueError, RuntimeError):
+            # Another profiler is active (one cProfile per process on 3.12+); profiling never fails a run
+            return None
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        if profiler is None:
+            return "(no call profile: another profiler was active during this stage)\n"
+        if self.engine == 'pyinstrument':
+            profiler.stop()
+            return profiler.output_text(unicode=False, color=False)
+
+        profiler.disable()
+        self._profiles.append(profiler)
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(self.top)
+        return buffer.getvalue()
+
+    def finish(self):
+        """
+        Stop tracing and build the report.
+
+        Returns:
+            dict: 'name', 'engine', 'memory', 'started_at', 'total_seconds',
+                  'stages' (per stage 'seconds', 'profile' text and, with memory,
+                  'peak_bytes' and 'net_bytes') and 'top_allocations'
+        """
+        top_allocations = []
+        if self.memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            top_allocations = [
+                {'location': str(statistic.traceback), 'bytes': statistic.size, 'count': statistic.count}
+                for statistic in snapshot.statistics('lineno')[:10]
+            ]
+        if self.memory and not self._finished:
+            _release_tracemalloc()
+        self._finished = True
+        return {
+            'name': self.name,
+            'engine': self.engine,
+            'memory': self.memory,
+            'started_at': self.started_at,
+            'total_seconds': round(time.perf_counter() - self._start, 6),
+            'stages': self.stages,
+            'top_allocations': top_allocations
+        }
+
+    def dump_stats(self, path):
+        """Write the combined cProfile stats of every stage (for snakeviz or pstats)."""
+        if not self._profiles:
+            return None
+        stats = pstats.Stats(self._profiles[0])
+        for profiler in self._profiles[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        return path
+
+def _format_bytes(value):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+def format_report(report, with_profiles=True):
+    """
+    Render a profile report as plain text (what the app offers for download).
+
+    Args:
+        report (dict): From ProfileSession.finish()
+        with_profiles (bool): Append each stage's call profile after the summary
+    """
+    lines = [
+        f"LeadGenius profile: {report['name']}",
+        f"Started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['started_at']))}, "
+        f"engine {report['engine']}, memory tracking {'on' if report['memory'] else 'off'}",
+        f"Total {report['total_seconds']:.3f} s",
+        "",
+        f"{'Stage':<20}{'Seconds':>12}{'Peak alloc':>14}{'Net alloc':>14}"
+    ]
+    for stage in report['stages']:
+        peak = _format_bytes(stage['peak_bytes']) if 'peak_bytes' in stage else '-'
+        net = _format_bytes(stage['net_bytes']) if 'net_bytes' in stage else '-'
+        lines.append(f"{stage['stage']:<20}{stage['seconds']:>12.4f}{peak:>14}{net:>14}")
+
+    if report['top_allocations']:
+        lines += ["", "Largest live allocations at the end of the run:"]
+        lines += [f"  {_format_bytes(a['bytes']):>10}  {a['count']:>8} blocks  {a['location']}" for a in report['top_allocations']]
+
+    if with_profiles:
+        for stage in report['stages']:
+            lines += ["", f"=== {stage['stage']} ===", stage['profile'].rstrip()]
+    return '\n'.join(lines) + '\n'
+
+def save_report(report, session=None, directory=None):
+    """
+    Write a report as .txt and .json (plus .prof with cProfile).
+
+    Returns:
+        str: Path of the text report
+    """
+    directory = directory or get_profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', os.path.splitext(os.path.basename(report['name']))[0]).strip('-')[:40] or 'run'
+    started = time.strftime('%Y%m%d-%H%M%S', time.localtime(report['started_at']))
+    base = os.path.join(directory, f"{started}-{slug}-{uuid.uuid4().hex[:6]}")
+    with open(f"{base}.txt", 'w') as f:
+        f.write(format_report(report))
+    with open(f"{base}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    if session is not None:
+        session.dump_stats(f"{base}.prof")
+    return f"{base}.txt"
+
+def start_profile(name, engine=None, memory=None):
+    """
+    Profile the run on the current thread; stage() calls record into it.
+
+    Returns:
+        ProfileSession: The new active profile (replacing any unfinished one)
+    """
+    _local.session = ProfileSession(name, engine, memory)
+    return _local.session
+
+def active_profile():
+    """The current thread's ProfileSession, or None."""
+    return getattr(_local, 'session', None)
+
+def finish_profile(save=True):
+    """
+    Finish the current thread's profile.
+
+    Args:
+        save (bool): Also write it with save_report()
+
+    Returns:
+        dict: The report ('path' is set when saved), or None without an active profile
+    """
+    session = active_profile()
+    if session is None:
+        return None
+    _local.session = None
+    report = session.finish()
+    if save:
+        report['path'] = save_report(report, session)
+    return report
+
+def stage(name):
+    """Context manager profiling one stage when the current thread has an active profile."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        return _NULL_STAGE
+    return session.stage(name)
+
+@contextmanager
+def profile_run(name, enabled=None, engine=None, memory=None, sample_rate=None):
+    """
+    Profile a whole run when enabled (or when sampled, if enabled is None).
+
+    Sampled runs skip memory tracking unless memory is given: tracemalloc
+    slows every thread in the process, not just the sampled run.
+
+    Yields:
+        dict: Filled with the finished report's keys on exit (empty when not profiled)
+    """
+    report = {}
+    if enabled is None:
+        enabled = should_profile(sample_rate)
+        memory = bool(memory)
+    if not enabled:
+        yield report
+        return
+    start_profile(name, engine, memory)
+    try:
+        yield report
+    finally:
+        report.update(finish_profile() or {})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the headless pipeline on a lead file, stage by stage.")
+    parser.add_argument('path', help="Excel or CSV lead file")
+    parser.add_argument('--engine', choices=PROFILE_ENGINES, default=DEFAULT_PROFILE_ENGINE)
+    parser.add_argument('--no-memory', action='store_true', help="Skip tracemalloc peak allocation tracking")
+    parser.add_argument('--max-ai-requests', type=int,
+                        help="Cap OpenAI requests (0 profiles with template messages only); defaults to LEADGENIUS_MAX_REQUESTS")
+    parser.add_argument('--output', help="Report directory (defaults to LEADGENIUS_PROFILE_DIR or .leadgenius/profiles)")
+    args = parser.parse_args(argv)
+
+    import metrics
+    from generation_budget import GenerationBudget
+    from lead_pipeline import read_leads, process_leads
+
+    if args.output:
+        os.environ["LEADGENIUS_PROFILE_DIR"] = args.output
+    budget = GenerationBudget(max_requests=args.max_ai_requests) if args.max_ai_requests is not None else None
+
+    with profile_run(args.path, enabled=True, engine=args.engine, memory=not args.no_memory) as report:
+        with metrics.timer('pipeline_stage_seconds', stage='read'), stage('read'):
+            df = read_leads(args.path)
+        process_leads(df, budget=budget)
+
+    print(format_report(report, with_profiles=False))
+    print(f"Report written to {report['path']}")
+    return 0
+
+if __name__ == '__main__':
+    # Run the importable module's main, so the pipeline's stage() calls see the profile started here
+    from stage_profiler import main
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Local receiver for WhatsApp Cloud API delivery status webhooks.
+
+Run from the repository root and point the app's webhook URL at it (through
+a tunnel such as ngrok when Meta has to reach it):
+
+    python -m webhook_receiver --port 8090 --verify-token my-token
+
+GET requests answer Meta's subscription check (hub.challenge). POSTed
+callbacks are acknowledged immediately; their statuses[] entries are queued
+and written to the delivery status store in batches by a background thread.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+from delivery_status import DeliveryStatusStore
+
+logger = logging.getLogger(__name__)
+
+def parse_status_events(payload):
+    """
+    Pull the status callbacks out of a webhook body.
+
+    Args:
+        payload (dict): Decoded webhook JSON ({'entry': [{'changes': [{'value': {'statuses': [...]}}]}]})
+
+    Returns:
+        list: Status event dicts ('id', 'status', 'timestamp', 'recipient_id', ...);
+              entries that aren't objects are dropped
+    """
+    events = []
+    for entry in payload.get('entry') or []:
+        for change in entry.get('changes') or []:
+            statuses = (change.get('value') or {}).get('statuses') or []
+            events.extend(event for event in statuses if isinstance(event, dict))
+    return events
+
+def verify_signature(body, signature_header, app_secret):
+    """
+    Check the X-Hub-Signature-256 header Meta signs callbacks with.
+
+    Args:
+        body (bytes): Raw request body
+        signature_header (str): Header value ('sha256=<hex>')
+        app_secret (str): The Meta app secret
+
+    Returns:
+        bool: True when the signature matches
+    """
+    if not signature_header or not signature_header.startswith('sha256='):
+        return False
+    expected = hmac.new(app_secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len('sha256='):])
+
+class WebhookReceiver:
+    """
+    Threaded HTTP server that batches delivery status callbacks into a store.
+
+    Args:
+        store (DeliveryStatusStore): Where statuses are written (opened from
+                                     LEADGENIUS_STATUS_DB by default)
+        host (str), port (int): Bind address (port 0 picks a free port)
+        verify_token (str): Token for Meta's subscription check
+                            (defaults to WHATSAPP_WEBHOOK_VERIFY_TOKEN)
+        app_secret (str): When set, callbacks must carry a valid X-Hub-Signature-256
+                          (defaults to WHATSAPP_APP_SECRET)
+        flush_interval (float): Seconds between batch writes
+        max_batch (int): Events written per transaction at most
+        max_pending (int): Queued events at most; callbacks beyond it are answered
+                           with 503 so Meta redelivers them later
+    """
+
+    def __init__(self, store=None, host='127.0.0.1', port=8090, verify_token=None, app_secret=None,
+                 flush_interval=0.2, max_batch=5000, max_pending=100000):
+        self.store = store or DeliveryStatusStore()
+        self.verify_token = verify_token or os.environ.get("WHATSAPP_WEBHOOK_VERIFY_TOKEN")
+        self.app_secret = app_secret or os.environ.get("WHATSAPP_APP_SECRET")
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.stats = {'callbacks': 0, 'events_received': 0, 'events_written': 0, 'batches': 0, 'rejected': 0,
+                      'flush_errors': 0, 'events_dropped': 0, 'queue_full': 0}
+        self._stats_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._threads = []
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._flush_loop, daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and write whatever is still queued."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._stopping.set()
+        for thread in self._threads[1:]:
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def enqueue(self, events):
+        """
+        Queue status events for the next batch write.
+
+        Returns:
+            bool: False (nothing queued) when the queue is already at max_pending
+        """
+        with self._pending_lock:
+            full = len(self._pending) + len(events) > self.max_pending
+            if not full:
+                self._pending.extend(events)
+        if full:
+            self._count(queue_full=1)
+            return False
+        self._count(callbacks=1, events_received=len(events))
+        return True
+
+    def _count(self, **counts):
+        # Handlers run on many threads
+        with self._stats_lock:
+            for key, value in counts.items():
+                self.stats[key] += value
+
+    def snapshot(self):
+        """Copy of the counters."""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def flush(self):
+        """
+        Write queued events to the store, max_batch per transaction.
+
+        When the database is busy or unavailable (sqlite3.OperationalError)
+        the error is logged and the unwritten events go back to the front of
+        the queue for the next flush. Any other error means the batch itself
+        can't be written, so it is logged and dropped rather than retried
+        forever.
+
+        Returns:
+            int: Number of events written
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+
+        written = 0
+        for start in range(0, len(pending), self.max_batch):
+            batch = pending[start:start + self.max_batch]
+            try:
+                with metrics.timer('whatsapp_status_flush_seconds'):
+                    written += self.store.apply_statuses(batch)
+            except sqlite3.OperationalError:
+                logger.exception("Writing %d status events failed; keeping them queued", len(pending) - start)
+                metrics.increment('whatsapp_status_flush_errors_total')
+                with self._pending_lock:
+                    self._pending[:0] = pending[start:]
+                self._count(flush_errors=1, events_written=written)
+                return written
+            except Exception:
+                logger.exception("Dropping a batch of %d status events that could not be written", len(batch))
+                metrics.increment('whatsapp_status_flush_errors_total')
+                metrics.increment('whatsapp_status_events_dropped_total', len(batch))
+                self._count(flush_errors=1, events_dropped=len(batch))
+                continue
+            for status, count in Counter(event.get('status') for event in batch).items():
+                metrics.increment('whatsapp_status_events_total', count, status=str(status))
+            self._count(batches=1)
+        self._count(events_written=written)
+        return written
+
+    def _flush_loop(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Status flush failed")
+        self.flush()
+
+    def _handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                # Subscription check: echo hub.challenge when the token matches
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                if (query.get('hub.mode') == 'subscribe' and receiver.verify_token
+                        and query.get('hub.verify_token') == receiver.verify_token):
+                    self._send(200, query.get('hub.challenge', '').encode(), 'text/plain')
+                elif urlparse(self.path).path.rstrip('/') == '/stats':
+                    self._send(200, json.dumps(receiver.snapshot()).encode(), 'application/json')
+                else:
+                    self._send(403, b'Forbidden', 'text/plain')
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if receiver.app_secret and not verify_signature(
+                        body, self.headers.get('X-Hub-Signature-256'), receiver.app_secret):
+                    receiver._count(rejected=1)
+                    self._send(401, b'Invalid signature', 'text/plain')
+                    return
+                try:
+                    events = parse_status_events(json.loads(body or b'{}'))
+                except (ValueError, AttributeError):
+                    receiver._count(rejected=1)
+                    self._send(400, b'Invalid payload', 'text/plain')
+                    return
+
+                # Acknowledge right away; Meta retries callbacks that are slow to answer.
+                # A full queue answers 503 so Meta redelivers instead of the events being lost
+                if events and not receiver.enqueue(events):
+                    self._send(503, b'Status queue full', 'text/plain')
+                    return
+                self._send(200, b'OK', 'text/plain')
+
+            def _send(self, status, data, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receive WhatsApp delivery status webhooks into the status store.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--db', help="Status database (defaults to LEADGENIUS_STATUS_DB or .leadgenius/delivery_status.db)")
+    parser.add_argument('--verify-token', help="Subscription verify token (defaults to WHATSAPP_WEBHOOK_VERIFY_TOKEN)")
+    parser.add_argument('--flush-interval', type=float, default=0.2, help="Seconds between batch writes")
+    args = parser.parse_args(argv)
+
+    receiver = WebhookReceiver(DeliveryStatusStore(args.db), args.host, args.port,
+                               verify_token=args.verify_token, flush_interval=args.flush_interval)
+    print(f"Webhook receiver on {receiver.url} writing to {receiver.store.path} (Ctrl+C to stop)")
+    receiver.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,124 +1,629 @@
 import os
-from openai import OpenAI
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from adaptive_concurrency import AdaptiveLimiter, backoff_delay, retry_after_seconds
+from message_templates import render_message, render_messages
 
-# Initialize OpenAI client
+logger = logging.getLogger(__name__)
+
+# OpenAI client configuration
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-def generate_whatsapp_message(lead_name, risk_score):
+# Retries and concurrency are handled by the adaptive limiter below, not the SDK
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("LEADGENIUS_OPENAI_TIMEOUT", "30"))
+MAX_GENERATION_ATTEMPTS = int(os.environ.get("LEADGENIUS_OPENAI_MAX_ATTEMPTS", "4"))
+MAX_CONCURRENCY = int(os.environ.get("LEADGENIUS_OPENAI_MAX_CONCURRENCY", "16"))
+
+# Offline Batch API mode
+BATCH_WORK_DIR = os.path.join('.leadgenius', 'batches')
+BATCH_COMPLETION_WINDOW = '24h'
+BATCH_TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+# Created on first use: importing the SDK takes about a second and isn't needed for template-only runs
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+_generation_limiter = None
+
+def get_openai_client():
     """
-    Generate a personalized WhatsApp message using GPT based on the lead's risk score.
+    Return the shared OpenAI client, creating it on first use.
+    
+    The client (and its connection pool) lives at module level, so it is reused
+    across calls, Streamlit reruns and sessions in the same process.
+    """
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0, timeout=OPENAI_TIMEOUT_SECONDS)
+    return _openai_client
+
+def get_generation_limiter():
+    """Return the process-wide adaptive concurrency limiter for OpenAI requests."""
+    global _generation_limiter
+    if _generation_limiter is None:
+        with _openai_client_lock:
+            if _generation_limiter is None:
+                _generation_limiter = AdaptiveLimiter(initial_limit=min(4, MAX_CONCURRENCY), max_limit=MAX_CONCURRENCY)
+    return _generation_limiter
+
+def _classify_error(error):
+    """Map an OpenAI SDK exception to a limiter outcome ('throttled', 'timeout', 'server_error' or 'error')."""
+    import openai
+    
+    if isinstance(error, openai.RateLimitError):
+        return 'throttled'
+    if isinstance(error, openai.APITimeoutError):
+        return 'timeout'
+    if isinstance(error, openai.APIConnectionError) or isinstance(error, openai.InternalServerError):
+        return 'server_error'
+    return 'error'
+
+def _create_completion(request, budget=None):
+    """
+    Send one chat completion through the adaptive limiter.
+    
+    Throttling, timeouts and server errors are retried with jittered backoff
+    (honouring retry-after) up to MAX_GENERATION_ATTEMPTS; anything else, or
+    the last failure, is raised to the caller.
+    
+    Args:
+        request (dict): Keyword arguments for chat.completions.create
+        budget (GenerationBudget): Optional budget whose deadline caps the retries
+        
+    Returns:
+        The parsed ChatCompletion response
+    """
+    limiter = get_generation_limiter()
+    
+    for attempt in range(MAX_GENERATION_ATTEMPTS):
+        limiter.acquire()
+        request_start = time.perf_counter()
+        try:
+            raw_response = get_openai_client().chat.completions.with_raw_response.create(**request)
+        except Exception as e:
+            latency = time.perf_counter() - request_start
+            outcome = _classify_error(e)
+            headers = getattr(getattr(e, 'response', None), 'headers', None)
+            limiter.release(outcome, latency, headers)
+            metrics.observe('openai_request_seconds', latency, status=outcome)
+            
+            delay = backoff_delay(attempt, retry_after_seconds(headers))
+            out_of_time = budget is not None and budget.max_seconds is not None and budget.remaining_seconds() < delay
+            if outcome == 'error' or attempt == MAX_GENERATION_ATTEMPTS - 1 or out_of_time:
+                raise
+            metrics.increment('openai_retries_total', reason=outcome)
+            logger.info("OpenAI request %s, retrying in %.2fs (attempt %d)", outcome, delay, attempt + 1)
+            time.sleep(delay)
+            continue
+        
+        latency = time.perf_counter() - request_start
+        limiter.release('ok', latency, raw_response.headers)
+        metrics.observe('openai_request_seconds', latency, status='ok')
+        return raw_response.parse()
+
+def has_openai_api_key():
+    """Check whether a real OpenAI API key is configured (otherwise templates are used)."""
+    return bool(OPENAI_API_KEY) and OPENAI_API_KEY != "your-api-key-here"
+
+def _check_generated_message(content):
+    """
+    Validate a generated message.
+    
+    Returns:
+        tuple: (message, rejected_reason) where rejected_reason is 'too_long',
+               'too_short' or None if the message can be used
+    """
+    generated_message = content.strip() if content else ""
+    
+    if len(generated_message) > 200:  # Reasonable limit for WhatsApp
+        return generated_message, 'too_long'
+    if len(generated_message) < 10:
+        return generated_message, 'too_short'
+    return generated_message, None
+
+def build_completion_request(lead_name, risk_score):
+    """
+    Build the chat completion request for one lead.
+    
+    Shared by live generation and the Batch API file, so both modes send the
+    same prompt.
     
     Args:
         lead_name (str): Name of the lead
         risk_score (str): Risk category ('High', 'Medium', or 'Low')
         
     Returns:
-        str: Generated WhatsApp message
+        dict: Keyword arguments for chat.completions.create
     """
+    # Create context-aware prompt for GPT
+    risk_context = {
+        'High': "This lead is high risk - they have missed demos, have been inactive for a long time, or haven't engaged with our content. We need to be more direct and urgent in our approach to re-engage them.",
+        'Medium': "This lead is medium risk - they show some engagement but need gentle follow-up. They might need a bit more nurturing to move forward.",
+        'Low': "This lead is low risk - they are engaged and have shown up for demos or interacted recently. Keep the tone friendly and confirmatory."
+    }
+    
+    prompt = f"""
+    You are a sales outreach specialist. Generate a UNIQUE, personalized WhatsApp message for a lead named "{lead_name}" 
+    who has been categorized as "{risk_score}" risk.
     
-    # Fallback template messages in case API fails
-    fallback_messages = {
-        'High': f"Hi {lead_name}, your demo is scheduled but we missed you last time. Can we quickly reconnect today or tomorrow?",
-        'Medium': f"Hi {lead_name}, just checking in. Shall we go ahead with the demo this week?",
-        'Low': f"Hey {lead_name}, just a friendly nudge to confirm our upcoming demo. Excited to connect!"
+    Context for {risk_score} risk: {risk_context.get(risk_score, '')}
+    
+    IMPORTANT: Create a UNIQUE message that varies significantly from other messages. Use different:
+    - Conversation starters (Hi/Hey/Hello/Good day)
+    - Phrasing and sentence structure
+    - Call-to-action approaches
+    - Time references (today/tomorrow/this week/soon)
+    - Conversation tone (casual/professional/friendly)
+    
+    Guidelines:
+    - Keep the message under 160 characters for WhatsApp
+    - Use a friendly, professional tone
+    - Include the lead's name naturally
+    - Make it conversational and not too salesy
+    - For High risk: Be more direct and suggest immediate action
+    - For Medium risk: Be encouraging and suggest this week
+    - For Low risk: Be friendly and confirmatory
+    - Don't use excessive punctuation or emojis
+    - Vary the message structure and wording significantly
+    
+    Generate only the message text, no quotes or additional formatting.
+    """
+    
+    return {
+        "model": "gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        "messages": [
+            {"role": "system", "content": "You are a creative sales outreach specialist who creates unique, personalized WhatsApp messages. Never repeat the same phrasing or structure. Always vary your approach significantly for each lead."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 100,
+        "temperature": 0.9  # Increased temperature for more variation
     }
+
+def generate_whatsapp_message(lead_name, risk_score, budget=None):
+    """
+    Generate a personalized WhatsApp message using GPT based on the lead's risk score.
+    
+    Args:
+        lead_name (str): Name of the lead
+        risk_score (str): Risk category ('High', 'Medium', or 'Low')
+        budget (GenerationBudget): Optional run-level limits; templates are used once it is exhausted
+        
+    Returns:
+        str: Generated WhatsApp message
+    """
     
     # If no API key is provided or it's the default, use fallback
-    if OPENAI_API_KEY == "your-api-key-here" or not OPENAI_API_KEY:
-        return fallback_messages.get(risk_score, fallback_messages['Medium'])
+    if not has_openai_api_key():
+        metrics.increment('messages_generated_total', source='fallback', reason='no_api_key')
+        return render_message(lead_name, risk_score)
     
+    if budget is not None and not budget.acquire():
+        metrics.increment('messages_generated_total', source='fallback', reason=f'budget_{budget.exhausted_reason}')
+        return render_message(lead_name, risk_score)
+    
+    usage = None
     try:
-        # Create context-aware prompt for GPT
-        risk_context = {
-            'High': "This lead is high risk - they have missed demos, have been inactive for a long time, or haven't engaged with our content. We need to be more direct and urgent in our approach to re-engage them.",
-            'Medium': "This lead is medium risk - they show some engagement but need gentle follow-up. They might need a bit more nurturing to move forward.",
-            'Low': "This lead is low risk - they are engaged and have shown up for demos or interacted recently. Keep the tone friendly and confirmatory."
-        }
-        
-        prompt = f"""
-        You are a sales outreach specialist. Generate a UNIQUE, personalized WhatsApp message for a lead named "{lead_name}" 
-        who has been categorized as "{risk_score}" risk.
-        
-        Context for {risk_score} risk: {risk_context.get(risk_score, '')}
-        
-        IMPORTANT: Create a UNIQUE message that varies significantly from other messages. Use different:
-        - Conversation starters (Hi/Hey/Hello/Good day)
-        - Phrasing and sentence structure
-        - Call-to-action approaches
-        - Time references (today/tomorrow/this week/soon)
-        - Conversation tone (casual/professional/friendly)
-        
-        Guidelines:
-        - Keep the message under 160 characters for WhatsApp
-        - Use a friendly, professional tone
-        - Include the lead's name naturally
-        - Make it conversational and not too salesy
-        - For High risk: Be more direct and suggest immediate action
-        - For Medium risk: Be encouraging and suggest this week
-        - For Low risk: Be friendly and confirmatory
-        - Don't use excessive punctuation or emojis
-        - Vary the message structure and wording significantly
-        
-        Generate only the message text, no quotes or additional formatting.
-        """
-        
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            messages=[
-                {"role": "system", "content": "You are a creative sales outreach specialist who creates unique, personalized WhatsApp messages. Never repeat the same phrasing or structure. Always vary your approach significantly for each lead."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=100,
-            temperature=0.9  # Increased temperature for more variation
-        )
+        request_options = {}
+        if budget is not None and budget.max_seconds is not None:
+            # A time-limited run must not wait on a slow request past its deadline
+            request_options['timeout'] = max(budget.remaining_seconds(), 1.0)
         
-        generated_message = response.choices[0].message.content
-        if generated_message:
-            generated_message = generated_message.strip()
-        else:
-            generated_message = ""
+        request = build_completion_request(lead_name, risk_score)
+        request.update(request_options)
+        response = _create_completion(request, budget)
         
-        # Validate the generated message
-        if len(generated_message) > 200:  # Reasonable limit for WhatsApp
-            return fallback_messages.get(risk_score, fallback_messages['Medium'])
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            metrics.increment('openai_tokens_total', usage.prompt_tokens or 0, kind='prompt')
+            metrics.increment('openai_tokens_total', usage.completion_tokens or 0, kind='completion')
         
-        if not generated_message or len(generated_message.strip()) < 10:
-            return fallback_messages.get(risk_score, fallback_messages['Medium'])
+        generated_message, rejected_reason = _check_generated_message(response.choices[0].message.content)
+        if rejected_reason:
+            metrics.increment('messages_generated_total', source='fallback', reason=rejected_reason)
+            return render_message(lead_name, risk_score)
         
+        metrics.increment('messages_generated_total', source='openai', reason='ok')
         return generated_message
         
     except Exception as e:
-        # Log the error (in a real app, you'd use proper logging)
-        print(f"Error generating WhatsApp message: {str(e)}")
+        metrics.increment('messages_generated_total', source='fallback', reason=type(e).__name__)
+        logger.warning("Error generating WhatsApp message: %s", e)
         
         # Return fallback message
-        return fallback_messages.get(risk_score, fallback_messages['Medium'])
+        return render_message(lead_name, risk_score)
+    
+    finally:
+        if budget is not None:
+            budget.complete(usage)
 
-def generate_batch_messages(leads_data):
+def coalesce_requests(leads_data, variants_per_key=1):
     """
-    Generate WhatsApp messages for multiple leads efficiently.
+    Collapse identical (lead_name, risk_score) requests within a batch.
+    
+    Rows sharing a key take turns over at most variants_per_key distinct
+    requests, so a name repeated across sheets costs one API call (or one per
+    requested variant) instead of one per row.
     
     Args:
         leads_data (list): List of dictionaries with 'lead_name' and 'risk_score' keys
+        variants_per_key (int): Distinct messages to generate per identical key
         
+    Returns:
+        tuple: (unique_requests, request_index) where unique_requests is a list of
+               (lead_name, risk_score) to generate and request_index maps every
+               input row to its position in unique_requests
+    """
+    variants_per_key = max(1, int(variants_per_key))
+    unique_requests = []
+    request_index = []
+    positions = {}
+    occurrences = {}
+    
+    for lead in leads_data:
+        key = (lead.get('lead_name', 'there'), lead.get('risk_score', 'Medium'))
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        
+        variant_key = (key, occurrence % variants_per_key)
+        position = positions.get(variant_key)
+        if position is None:
+            position = positions[variant_key] = len(unique_requests)
+            unique_requests.append(key)
+        request_index.append(position)
+    
+    return unique_requests, request_index
+
+def generate_batch_messages(leads_data, seed=0, variants_per_key=1, budget=None, on_rows=None, order=None):
+    """
+    Generate WhatsApp messages for multiple leads efficiently.
+    
+    Same as generate_batch_messages_with_report, without the report.
+    
     Returns:
         list: List of generated messages corresponding to input leads
     """
+    messages, _ = generate_batch_messages_with_report(leads_data, seed, variants_per_key, budget, on_rows, order)
+    return messages
+
+def generate_batch_messages_with_report(leads_data, seed=0, variants_per_key=1, budget=None, on_rows=None,
+                                        order=None):
+    """
+    Generate WhatsApp messages for multiple leads and report what it cost.
     
-    messages = []
+    Identical (lead_name, risk_score) requests are generated once per variant
+    and fanned out to every matching lead.
     
-    for lead in leads_data:
-        lead_name = lead.get('lead_name', 'there')
-        risk_score = lead.get('risk_score', 'Medium')
+    Args:
+        leads_data (list): List of dictionaries with 'lead_name' and 'risk_score' keys
+        seed (int): Seed for template variants, so reruns produce the same messages
+        variants_per_key (int): Distinct AI messages to generate per identical key
+        budget (GenerationBudget): Optional run-level limits; once exhausted the
+                                   remaining leads get template messages
+        on_rows (callable): Called as on_rows(rows, messages) with the input
+                            positions of leads whose messages are ready, in
+                            processing order, while the rest is still generating
+        order: Optional processing order (input positions), e.g. from
+               priority_scheduler.priority_order so urgent leads come first
         
-        message = generate_whatsapp_message(lead_name, risk_score)
-        messages.append(message)
+    Returns:
+        tuple: (messages, report) - messages aligned with leads_data, and a report
+               dict with 'requests', 'api_calls', 'calls_saved' and, when
+               generated live, 'budget' and 'concurrency'
+    """
     
+    if order is not None:
+        # Generate in the requested order, then put the messages back in input order
+        order = list(order)
+        ordered_messages, report = generate_batch_messages_with_report(
+            [leads_data[i] for i in order], seed, variants_per_key, budget,
+            (lambda rows, messages: on_rows([order[row] for row in rows], messages)) if on_rows is not None else None
+        )
+        messages = [None] * len(leads_data)
+        for row, message in zip(order, ordered_messages):
+            messages[row] = message
+        return messages, report
+    
+    # Without an API key the whole batch is rendered from the template engine in one pass
+    if not has_openai_api_key():
+        metrics.increment('messages_generated_total', len(leads_data), source='fallback', reason='no_api_key')
+        messages = render_messages(
+            [lead.get('lead_name', 'there') for lead in leads_data],
+            [lead.get('risk_score', 'Medium') for lead in leads_data],
+            seed=seed
+        )
+        if on_rows is not None and messages:
+            on_rows(range(len(messages)), messages)
+        report = {'requests': len(leads_data), 'api_calls': 0, 'calls_saved': 0}
+        return messages, report
+    
+    unique_requests, request_index = coalesce_requests(leads_data, variants_per_key)
+    requests_before = budget.requests if budget is not None else 0
+    
+    def generate(request):
+        # Requests queued behind an exhausted budget are left for the bulk template pass
+        if budget is not None and budget.exhausted_reason is not None:
+            return None
+        return generate_whatsapp_message(request[0], request[1], budget)
+    
+    generated = [None] * len(unique_requests)
+    rows_emitted = 0
+    
+    def emit_ready_rows(ready):
+        # First occurrences come in input order, so the leads whose request is
+        # among the first `ready` results always form a prefix of the batch
+        nonlocal rows_emitted
+        end = rows_emitted
+        while end < len(request_index) and request_index[end] < ready:
+            end += 1
+        if end > rows_emitted:
+            on_rows(range(rows_emitted, end), [generated[position] for position in request_index[rows_emitted:end]])
+            rows_emitted = end
+    
+    # The limiter decides how many of these workers actually have a request in flight
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        streaming = on_rows is not None
+        for position, message in enumerate(executor.map(generate, unique_requests)):
+            generated[position] = message
+            # Once the budget runs out the rest is rendered in bulk below, then emitted
+            streaming = streaming and message is not None
+            if streaming:
+                emit_ready_rows(position + 1)
+    
+    # Budget ran out: the rest of the batch is rendered from templates in one pass
+    remaining = [position for position, message in enumerate(generated) if message is None]
+    if remaining:
+        budget.skip(len(remaining))
+        metrics.increment('messages_generated_total', len(remaining), source='fallback', reason=f'budget_{budget.exhausted_reason}')
+        rendered = render_messages(
+            [unique_requests[position][0] for position in remaining],
+            [unique_requests[position][1] for position in remaining],
+            seed=seed
+        )
+        for position, message in zip(remaining, rendered):
+            generated[position] = message
+    
+    if on_rows is not None:
+        emit_ready_rows(len(generated))
+    messages = [generated[position] for position in request_index]
+    
+    calls_saved = len(leads_data) - len(unique_requests)
+    metrics.increment('openai_calls_saved_total', calls_saved)
+    
+    report = {
+        'requests': len(leads_data),
+        'api_calls': budget.requests - requests_before if budget is not None else len(unique_requests),
+        'calls_saved': calls_saved
+    }
+    if budget is not None:
+        report['budget'] = budget.report()
+    report['concurrency'] = get_generation_limiter().snapshot()
+    return messages, report
+
+def _batch_client():
+    # File uploads and polling are cheap to retry and aren't covered by the adaptive limiter
+    return get_openai_client().with_options(max_retries=3)
+
+def write_batch_file(unique_requests, path):
+    """
+    Write one Batch API request line per unique (lead_name, risk_score).
+    
+    The custom_id of each line is its position in unique_requests, which is
+    how results are mapped back to leads.
+    
+    Args:
+        unique_requests (list): (lead_name, risk_score) pairs, e.g. from coalesce_requests
+        path (str): JSONL file to write
+        
+    Returns:
+        str: The path written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    with open(path, 'w') as f:
+        for position, (lead_name, risk_score) in enumerate(unique_requests):
+            f.write(json.dumps({
+                'custom_id': f'request-{position}',
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': build_completion_request(lead_name, risk_score)
+            }) + '\n')
+    return path
+
+def submit_message_batch(leads_data, work_dir=None, variants_per_key=1):
+    """
+    Write the leads' prompts to a batch file and submit it to the Batch API.
+    
+    Args:
+        leads_data (list): List of dictionaries with 'lead_name' and 'risk_score' keys
+        work_dir (str): Where the batch file and job file go (default .leadgenius/batches)
+        variants_per_key (int): Distinct messages to request per identical (name, risk) pair
+        
+    Returns:
+        dict: Batch job with 'batch_id', 'requests', 'request_index' and
+              'job_file', everything collect_batch_results needs later, also
+              saved to job_file so another process can collect it
+    """
+    work_dir = work_dir or BATCH_WORK_DIR
+    unique_requests, request_index = coalesce_requests(leads_data, variants_per_key)
+    input_path = write_batch_file(unique_requests, os.path.join(work_dir, f'messages_{int(time.time())}.jsonl'))
+    
+    client = _batch_client()
+    with open(input_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose='batch')
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint='/v1/chat/completions',
+        completion_window=BATCH_COMPLETION_WINDOW
+    )
+    metrics.increment('openai_batch_requests_total', len(unique_requests))
+    logger.info("Submitted batch %s with %d requests for %d leads", batch.id, len(unique_requests), len(leads_data))
+    
+    job = {
+        'batch_id': batch.id,
+        'input_file': input_path,
+        'requests': [list(request) for request in unique_requests],
+        'request_index': request_index,
+        'job_file': os.path.join(work_dir, f'{batch.id}.json')
+    }
+    with open(job['job_file'], 'w') as f:
+        json.dump(job, f)
+    return job
+
+def load_batch_job(path):
+    """Load a job saved by submit_message_batch."""
+    with open(path) as f:
+        return json.load(f)
+
+def wait_for_batch(batch_id, poll_interval=30.0, timeout=None):
+    """
+    Poll a batch until it reaches a terminal status.
+    
+    Args:
+        batch_id (str): Batch to poll
+        poll_interval (float): Seconds between polls
+        timeout (float): Give up after this many seconds (None = wait for the completion window)
+        
+    Returns:
+        The final Batch object
+        
+    Raises:
+        TimeoutError: If the batch is still running after timeout seconds
+    """
+    client = _batch_client()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            return batch
+        if deadline is not None and time.monotonic() + poll_interval > deadline:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout} seconds")
+        time.sleep(poll_interval)
+
+def collect_batch_results(job, batch=None, seed=0):
+    """
+    Map a finished batch's output back to leads.
+    
+    Lines that failed, are missing or don't pass message validation get a
+    template message, as does everything if the batch itself didn't complete.
+    
+    Args:
+        job (dict): Job returned by submit_message_batch (or load_batch_job)
+        batch: The finished Batch object (retrieved if not given)
+        seed (int): Seed for the fallback template variants
+        
+    Returns:
+        tuple: (messages aligned with the submitted leads, report dict)
+    """
+    client = _batch_client()
+    batch = batch or client.batches.retrieve(job['batch_id'])
+    requests = [tuple(request) for request in job['requests']]
+    generated = [None] * len(requests)
+    failed_lines = 0
+    
+    if batch.status == 'completed' and batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            position = int(result['custom_id'].rsplit('-', 1)[1])
+            response = result.get('response') or {}
+            if result.get('error') or response.get('status_code') != 200:
+                failed_lines += 1
+                continue
+            
+            body = response['body']
+            usage = body.get('usage') or {}
+            metrics.increment('openai_tokens_total', usage.get('prompt_tokens', 0), kind='prompt')
+            metrics.increment('openai_tokens_total', usage.get('completion_tokens', 0), kind='completion')
+            
+            message, rejected_reason = _check_generated_message(body['choices'][0]['message']['content'])
+            if rejected_reason:
+                metrics.increment('messages_generated_total', source='fallback', reason=rejected_reason)
+                continue
+            generated[position] = message
+            metrics.increment('messages_generated_total', source='openai_batch', reason='ok')
+    
+    if batch.status == 'completed' and batch.error_file_id:
+        # Failed lines are reported in a separate error file
+        error_text = client.files.content(batch.error_file_id).text
+        failed_lines += sum(1 for line in error_text.splitlines() if line.strip())
+    
+    fallbacks = [position for position, message in enumerate(generated) if message is None]
+    if fallbacks:
+        reason = 'batch_line_failed' if batch.status == 'completed' else f'batch_{batch.status}'
+        metrics.increment('messages_generated_total', len(fallbacks), source='fallback', reason=reason)
+        rendered = render_messages([requests[p][0] for p in fallbacks], [requests[p][1] for p in fallbacks], seed=seed)
+        for position, message in zip(fallbacks, rendered):
+            generated[position] = message
+    
+    messages = [generated[position] for position in job['request_index']]
+    report = {
+        'batch_id': job['batch_id'],
+        'status': batch.status,
+        'requests': len(job['request_index']),
+        'batch_requests': len(requests),
+        'succeeded': len(requests) - len(fallbacks),
+        'failed_lines': failed_lines,
+        'fallbacks': len(fallbacks)
+    }
+    return messages, report
+
+def generate_batch_messages_offline(leads_data, seed=0, variants_per_key=1, poll_interval=30.0,
+                                    timeout=None, work_dir=None):
+    """
+    Generate messages through the OpenAI Batch API (cheaper, results within 24h).
+    
+    Same as generate_batch_messages_offline_with_report, without the report.
+    
+    Returns:
+        list: Messages aligned with leads_data
+    """
+    messages, _ = generate_batch_messages_offline_with_report(
+        leads_data, seed, variants_per_key, poll_interval, timeout, work_dir
+    )
     return messages
 
+def generate_batch_messages_offline_with_report(leads_data, seed=0, variants_per_key=1, poll_interval=30.0,
+                                                timeout=None, work_dir=None):
+    """
+    Generate messages through the OpenAI Batch API and report the batch's outcome.
+    
+    Meant for overnight campaigns: submits every prompt as one batch, waits
+    for it and maps the results back to leads, with template fallbacks for
+    failed lines. Without an API key the templates are used directly.
+    
+    Args:
+        leads_data (list): List of dictionaries with 'lead_name' and 'risk_score' keys
+        seed (int): Seed for template variants
+        variants_per_key (int): Distinct messages per identical (name, risk) pair
+        poll_interval (float): Seconds between status polls
+        timeout (float): Stop waiting after this many seconds (raises TimeoutError;
+                         the job file can still be collected later)
+        work_dir (str): Where batch input and job files are written
+        
+    Returns:
+        tuple: (messages, report) - messages aligned with leads_data, and the
+               collect_batch_results report (the live report without an API key)
+    """
+    if not has_openai_api_key():
+        return generate_batch_messages_with_report(leads_data, seed=seed)
+    
+    job = submit_message_batch(leads_data, work_dir, variants_per_key)
+    batch = wait_for_batch(job['batch_id'], poll_interval, timeout)
+    return collect_batch_results(job, batch, seed)
+
 def validate_message_length(message):
     """
     Validate that the message is appropriate for WhatsApp.
@@ -1,7 +1,39 @@
 import os
-import requests
+import json
 import time
-from urllib.parse import unquote
+import asyncio
+import logging
+import metrics
+from adaptive_concurrency import backoff_delay, retry_after_seconds
+from recipient_index import get_recipient_index
+from message_payloads import (
+    get_text_skeleton, get_template_skeleton, get_media_skeleton, template_values,
+    DEFAULT_TEMPLATE_LANGUAGE
+)
+
+logger = logging.getLogger(__name__)
+
+# Graph API root; point it at benchmarks/fake_api_server.py to load-test sending without real messages
+WHATSAPP_API_BASE_URL = os.environ.get("WHATSAPP_API_BASE_URL", "https://graph.facebook.com/v18.0")
+
+# Bulk sending limits for AsyncWhatsAppSender (Cloud API numbers start at 80 messages per second)
+WHATSAPP_MAX_CONCURRENCY = int(os.environ.get("WHATSAPP_MAX_CONCURRENCY", "32"))
+WHATSAPP_MESSAGES_PER_SECOND = float(os.environ.get("WHATSAPP_MESSAGES_PER_SECOND", "80"))
+WHATSAPP_MAX_SEND_ATTEMPTS = 3
+
+# Optional per-region send caps on top of WHATSAPP_MESSAGES_PER_SECOND, as JSON: {"IN": 20, "GB": 10}
+WHATSAPP_REGION_RATES = json.loads(os.environ.get("WHATSAPP_REGION_RATES", "{}"))
+
+# Sends recorded in the status store per transaction
+STATUS_RECORD_BATCH = 500
+
+# Graph API error codes that mean "slow down" rather than "this message is bad"
+# (rate limit hit, spam rate limit, pair rate limit, account throughput)
+THROTTLE_ERROR_CODES = {4, 80007, 130429, 131048, 131056}
+
+# Of those, the limits on one business number / recipient pair; other
+# recipients can still be messaged from the same number
+PAIR_RATE_LIMIT_CODES = {131048, 131056}
 
 class WhatsAppSender:
     """
@@ -9,25 +41,47 @@ class WhatsAppSender:
     Provides both automatic sending and manual link generation.
     """
     
-    def __init__(self):
-        """Initialize WhatsApp sender with API credentials from environment variables."""
+    def __init__(self, recipient_index=None, access_token=None, phone_number_id=None, base_url=None):
+        """
+        Initialize WhatsApp sender with API credentials from environment variables.
+        
+        Args:
+            recipient_index (RecentRecipientIndex): When set, batch sends skip numbers
+                                                    messaged within its window
+            access_token (str), phone_number_id (str): Credentials of a specific sender
+                                                       number (default to the environment)
+            base_url (str): Graph API root (defaults to WHATSAPP_API_BASE_URL)
+        """
         # Meta WhatsApp Cloud API credentials
-        self.access_token = os.environ.get("WHATSAPP_ACCESS_TOKEN")
-        self.phone_number_id = os.environ.get("WHATSAPP_PHONE_NUMBER_ID")
+        self.access_token = access_token or os.environ.get("WHATSAPP_ACCESS_TOKEN")
+        self.phone_number_id = phone_number_id or os.environ.get("WHATSAPP_PHONE_NUMBER_ID")
         self.business_account_id = os.environ.get("WHATSAPP_BUSINESS_ACCOUNT_ID")
         
         # API endpoints
-        self.base_url = "https://graph.facebook.com/v18.0"
+        self.base_url = (base_url or WHATSAPP_API_BASE_URL).rstrip('/')
         self.messages_url = f"{self.base_url}/{self.phone_number_id}/messages"
         
         # Rate limiting
         self.last_request_time = 0
         self.min_request_interval = 1  # Minimum 1 second between requests
         
+        # Pooled HTTP session, created on first send
+        self._session = None
+        
+        # Numbers messaged recently, shared across batches and uploads
+        self.recipient_index = recipient_index
+        
     def is_configured(self):
         """Check if WhatsApp API is properly configured."""
         return bool(self.access_token and self.phone_number_id)
     
+    def _get_session(self):
+        """Return the pooled HTTP session so bulk sends reuse connections to the Graph API."""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+    
     def _rate_limit(self):
         """Implement basic rate limiting to avoid API throttling."""
         current_time = time.time()
@@ -35,6 +89,8 @@ class WhatsAppSender:
         
         if time_since_last_request < self.min_request_interval:
             sleep_time = self.min_request_interval - time_since_last_request
+            metrics.increment('whatsapp_rate_limit_sleeps_total')
+            metrics.increment('whatsapp_rate_limit_sleep_seconds_total', sleep_time)
             time.sleep(sleep_time)
         
         self.last_request_time = time.time()
@@ -63,10 +119,63 @@ class WhatsAppSender:
         """
         Send a text message via WhatsApp Cloud API.
         
+        Free-form text only reaches recipients inside the 24-hour customer
+        service window; use send_template_message to start a conversation.
+        
         Args:
             to_number (str): Recipient's phone number
             message_text (str): Message content
             
+        Returns:
+            dict: API response with success/error information
+        """
+        return self._send_payload(to_number, get_text_skeleton(), body=message_text)
+    
+    def send_template_message(self, to_number, template_name, parameters=(), language=DEFAULT_TEMPLATE_LANGUAGE,
+                              header_type=None, header_value=None):
+        """
+        Send a pre-approved template message (needed for business-initiated conversations).
+        
+        Args:
+            to_number (str): Recipient's phone number
+            template_name (str): Template name as approved in WhatsApp Manager
+            parameters: Body parameters substituted for {{1}}, {{2}}, ...
+            language (str): Template language code
+            header_type (str): None, 'text' or a media type ('image', 'video', 'document')
+            header_value (str): Header text or media link
+            
+        Returns:
+            dict: API response with success/error information
+        """
+        skeleton = get_template_skeleton(template_name, language, len(parameters), header_type)
+        return self._send_payload(to_number, skeleton, **template_values(parameters, header_type, header_value))
+    
+    def send_media_message(self, to_number, media_type, link, caption=None):
+        """
+        Send an image, video, document, audio or sticker by public link.
+        
+        Args:
+            to_number (str): Recipient's phone number
+            media_type (str): One of message_payloads.MEDIA_TYPES
+            link (str): HTTPS URL of the media
+            caption (str): Optional caption (image, video and document only)
+            
+        Returns:
+            dict: API response with success/error information
+        """
+        skeleton = get_media_skeleton(media_type, with_caption=caption is not None)
+        values = {'link': link} if caption is None else {'link': link, 'caption': caption}
+        return self._send_payload(to_number, skeleton, **values)
+    
+    def _send_payload(self, to_number, skeleton, **values):
+        """
+        Render a payload skeleton for one recipient and post it.
+        
+        Args:
+            to_number (str): Recipient's phone number
+            skeleton (PayloadSkeleton): Pre-serialized message body
+            **values: Values for the skeleton's slots other than 'to'
+            
         Returns:
             dict: API response with success/error information
         """
@@ -86,57 +195,33 @@ class WhatsAppSender:
                 "message_id": None
             }
         
+        # Imported here so processes that never send don't pay for it at startup
+        import requests
+        
         # Apply rate limiting
         self._rate_limit()
         
-        # Prepare request
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "messaging_product": "whatsapp",
-            "recipient_type": "individual",
-            "to": formatted_number,
-            "type": "text",
-            "text": {
-                "body": message_text
-            }
-        }
-        
+        request_start = time.perf_counter()
         try:
-            response = requests.post(
+            response = self._get_session().post(
                 self.messages_url,
-                headers=headers,
-                json=payload,
+                headers=self._headers(),
+                data=skeleton.render(to=formatted_number, **values),
                 timeout=30
             )
+            self._record_request(request_start, response.status_code)
             
-            response_data = response.json()
-            
-            if response.status_code == 200:
-                return {
-                    "success": True,
-                    "error": None,
-                    "message_id": response_data.get("messages", [{}])[0].get("id"),
-                    "response": response_data
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response_data.get("error", {}).get("message", "Unknown error"),
-                    "message_id": None,
-                    "response": response_data
-                }
+            return self._parse_response(response.status_code, response.json())
                 
         except requests.exceptions.Timeout:
+            self._record_request(request_start, 'timeout')
             return {
                 "success": False,
                 "error": "Request timeout - WhatsApp API did not respond in time",
                 "message_id": None
             }
         except requests.exceptions.RequestException as e:
+            self._record_request(request_start, 'network_error')
             return {
                 "success": False,
                 "error": f"Network error: {str(e)}",
@@ -149,39 +234,172 @@ class WhatsAppSender:
                 "message_id": None
             }
     
-    def send_batch_messages(self, messages_data):
+    def _headers(self):
+        """Authorization headers for the Graph API."""
+        return {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+    
+    def _batch_request(self, data, lead_name, template):
+        """
+        Pick the skeleton and slot values for one row of a batch.
+        
+        Returns:
+            tuple: (skeleton, values), or None when the row can't be sent
+        """
+        if not data.get('phone'):
+            return None
+        if template is None:
+            if not data.get('message'):
+                return None
+            return get_text_skeleton(), {'body': data['message']}
+        
+        parameters = data.get('parameters')
+        if parameters is None:
+            parameters = [lead_name]
+        header_type = template.get('header_type')
+        skeleton = get_template_skeleton(
+            template['name'], template.get('language', DEFAULT_TEMPLATE_LANGUAGE), len(parameters), header_type
+        )
+        return skeleton, template_values(parameters, header_type, data.get('header_value', template.get('header_value')))
+    
+    def _preflight(self, messages_data):
+        """
+        Validate every recipient of a batch before anything is sent.
+        
+        Returns:
+            pd.DataFrame: validate_phone_numbers result aligned with messages_data
+                          ('valid', 'reason', 'region', ...)
+        """
+        # pandas and numpy are only needed once a batch is sent, so importing the sender stays light
+        from phone_validation import validate_phone_numbers
+        
+        return validate_phone_numbers([data.get('phone') for data in messages_data])
+    
+    def _invalid_result(self, lead_name, reason):
+        """Result for a recipient rejected by _preflight, without calling the API."""
+        metrics.increment('whatsapp_messages_sent_total', result='invalid')
+        return {
+            "lead_name": lead_name,
+            "success": False,
+            "error": f"Invalid phone number ({reason})",
+            "message_id": None
+        }
+    
+    def _claim_recipient(self, phone, lead_name):
+        """
+        Reserve a recipient in the recent-recipient index.
+        
+        Returns:
+            dict: None when the message may be sent, otherwise the skipped result
+                  with 'retry_at' (epoch seconds) for rescheduling
+        """
+        if self.recipient_index is None:
+            return None
+        retry_at = self.recipient_index.claim(self.format_phone_number(phone))
+        if retry_at is None:
+            self.recipient_index.checkpoint()
+            return None
+        metrics.increment('whatsapp_messages_sent_total', result='deduplicated')
+        return {
+            "lead_name": lead_name,
+            "success": False,
+            "error": f"Already messaged within the last {self.recipient_index.window_seconds / 3600:g} hours",
+            "message_id": None,
+            "retry_at": retry_at
+        }
+    
+    def _release_recipient(self, phone, result):
+        """Let a number be retried when its send failed."""
+        if self.recipient_index is not None and not result['success']:
+            self.recipient_index.release(self.format_phone_number(phone))
+    
+    def _save_recipient_index(self):
+        if self.recipient_index is not None and self.recipient_index.path:
+            self.recipient_index.save()
+    
+    def _parse_response(self, status_code, response_data):
+        """Turn a Graph API response into the result dict returned by the send methods."""
+        if status_code == 200:
+            return {
+                "success": True,
+                "error": None,
+                "message_id": response_data.get("messages", [{}])[0].get("id"),
+                "response": response_data
+            }
+        error = response_data.get("error", {})
+        return {
+            "success": False,
+            "error": error.get("message", "Unknown error"),
+            "message_id": None,
+            "response": response_data,
+            "throttled": status_code == 429 or error.get("code") in THROTTLE_ERROR_CODES,
+            "pair_rate_limited": error.get("code") in PAIR_RATE_LIMIT_CODES
+        }
+    
+    def _record_request(self, request_start, status_code):
+        """Record latency and status of one Graph API call."""
+        metrics.observe('whatsapp_request_seconds', time.perf_counter() - request_start, status_code=str(status_code))
+        metrics.increment('whatsapp_requests_total', status_code=str(status_code))
+    
+    def send_batch_messages(self, messages_data, order=None, on_result=None, template=None):
         """
         Send multiple messages with proper rate limiting.
         
         Args:
             messages_data (list): List of dicts with 'phone' and 'message' keys
+                                  ('parameters' and optionally 'header_value' with a template)
+            order: Optional sending order (input positions), e.g. from
+                   priority_scheduler.priority_order so urgent leads are messaged first
+            on_result (callable): Called as on_result(index, result) after each message
+            template (dict): Send a template instead of the text message: 'name' and
+                             optionally 'language', 'header_type' and 'header_value'.
+                             Rows without 'parameters' get [lead_name].
             
         Returns:
-            list: List of results for each message
+            list: List of results for each message, in input order. Numbers that
+                  fail phone validation are rejected without an API call. With a
+                  recipient_index, numbers messaged within its window (by this or
+                  an earlier batch) are skipped with a 'retry_at' time.
         """
-        results = []
+        results = [None] * len(messages_data)
+        validation = self._preflight(messages_data)
+        valid, reasons = validation['valid'].to_numpy(), validation['reason'].to_numpy()
         
-        for i, data in enumerate(messages_data):
-            phone = data.get('phone')
-            message = data.get('message')
+        for sent, i in enumerate(order if order is not None else range(len(messages_data))):
+            data = messages_data[i]
             lead_name = data.get('lead_name', f"Lead {i+1}")
+            request = self._batch_request(data, lead_name, template)
             
-            if not phone or not message:
-                results.append({
+            if request is None:
+                metrics.increment('whatsapp_messages_sent_total', result='skipped')
+                result = {
                     "lead_name": lead_name,
                     "success": False,
-                    "error": "Missing phone number or message",
+                    "error": "Missing phone number" if template is not None else "Missing phone number or message",
                     "message_id": None
-                })
-                continue
+                }
+            elif not valid[i]:
+                result = self._invalid_result(lead_name, reasons[i])
+            else:
+                result = self._claim_recipient(data['phone'], lead_name)
             
-            result = self.send_text_message(phone, message)
-            result["lead_name"] = lead_name
-            results.append(result)
+            if result is None:
+                skeleton, values = request
+                result = self._send_payload(data['phone'], skeleton, **values)
+                result["lead_name"] = lead_name
+                self._release_recipient(data['phone'], result)
+                
+                # Progress feedback
+                metrics.increment('whatsapp_messages_sent_total', result='success' if result['success'] else 'failure')
+                logger.debug("Sent message %d/%d to %s", sent + 1, len(messages_data), lead_name)
             
-            # Progress feedback
-            print(f"Sent message {i+1}/{len(messages_data)} to {lead_name}")
+            results[i] = result
+            if on_result is not None:
+                on_result(i, result)
         
+        self._save_recipient_index()
         return results
     
     def get_setup_instructions(self):
@@ -253,6 +471,228 @@ class WhatsAppSender:
         
         return f"https://wa.me/{formatted_number}?text={encoded_message}"
 
+class AsyncWhatsAppSender(WhatsAppSender):
+    """
+    asyncio sender for high-concurrency bulk sends.
+
+    Keeps up to max_concurrency requests in flight on one pooled httpx
+    connection pool, paced to messages_per_second instead of the one second
+    gap of WhatsAppSender, and optionally to a lower rate per recipient
+    region (regions come from the batch's phone validation). Throttled (429) and 5xx responses are retried with
+    jittered backoff. With a status_store, every accepted message is recorded
+    by message_id so webhook_receiver can attach delivered/read/failed
+    statuses to it.
+    
+    Args:
+        max_concurrency (int): Requests in flight at most
+        messages_per_second (float): Send rate cap
+        region_rates (dict): Extra caps in messages per second by region code, e.g.
+                             {'IN': 20} (defaults to WHATSAPP_REGION_RATES)
+        status_store (DeliveryStatusStore): Optional store for sent message ids
+        recipient_index (RecentRecipientIndex): Optional dedupe window, as in WhatsAppSender
+        access_token (str), phone_number_id (str), base_url (str): Sender account, as in WhatsAppSender
+    """
+    
+    def __init__(self, max_concurrency=None, messages_per_second=None, status_store=None, recipient_index=None,
+                 access_token=None, phone_number_id=None, region_rates=None, base_url=None):
+        super().__init__(recipient_index, access_token, phone_number_id, base_url)
+        self.max_concurrency = max_concurrency or WHATSAPP_MAX_CONCURRENCY
+        self.messages_per_second = messages_per_second or WHATSAPP_MESSAGES_PER_SECOND
+        self.region_rates = WHATSAPP_REGION_RATES if region_rates is None else region_rates
+        self.status_store = status_store
+        self._next_send_time = 0.0
+        self._next_region_send_time = {}
+    
+    async def _pace(self, region=None):
+        """Wait for the next send slot so the batch stays under messages_per_second (and region's rate)."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_send_time)
+        self._next_send_time = slot + 1 / self.messages_per_second
+        region_rate = self.region_rates.get(region)
+        if region_rate:
+            slot = max(slot, self._next_region_send_time.get(region, 0.0))
+            self._next_region_send_time[region] = slot + 1 / region_rate
+        if slot > now:
+            metrics.increment('whatsapp_rate_limit_sleeps_total')
+            metrics.increment('whatsapp_rate_limit_sleep_seconds_total', slot - now)
+            await asyncio.sleep(slot - now)
+    
+    async def send_text_message_async(self, client, to_number, message_text):
+        """
+        Send one text message on an httpx.AsyncClient.
+        
+        Args:
+            client (httpx.AsyncClient): Client from send_batch_messages_async
+            to_number (str): Recipient's phone number
+            message_text (str): Message content
+            
+        Returns:
+            dict: Same shape as send_text_message
+        """
+        return await self._send_payload_async(client, to_number, get_text_skeleton(), body=message_text)
+    
+    async def send_template_message_async(self, client, to_number, template_name, parameters=(),
+                                          language=DEFAULT_TEMPLATE_LANGUAGE, header_type=None, header_value=None):
+        """Async send_template_message on an httpx.AsyncClient."""
+        skeleton = get_template_skeleton(template_name, language, len(parameters), header_type)
+        return await self._send_payload_async(
+            client, to_number, skeleton, **template_values(parameters, header_type, header_value)
+        )
+    
+    async def _send_payload_async(self, client, to_number, skeleton, max_attempts=WHATSAPP_MAX_SEND_ATTEMPTS,
+                                  region=None, **values):
+        """
+        Async _send_payload with retries on throttling and 5xx, paced for the
+        recipient's region when one is given.
+        
+        A result that still failed because of throttling has 'throttled' set
+        and the server's 'retry_after' seconds (None if it gave none); one that
+        failed on timeouts, network errors or 5xx has 'transient' set. A pair
+        rate limit ('pair_rate_limited') is returned without retrying, since
+        the same recipient can't be messaged again for a while.
+        """
+        import httpx
+        
+        formatted_number = self.format_phone_number(to_number)
+        if not formatted_number:
+            return {
+                "success": False,
+                "error": "Invalid phone number format",
+                "message_id": None
+            }
+        
+        body = skeleton.render(to=formatted_number, **values)
+        throttled = False
+        for attempt in range(max_attempts):
+            await self._pace(region)
+            retry_after = None
+            request_start = time.perf_counter()
+            try:
+                response = await client.post(self.messages_url, content=body)
+            except httpx.TimeoutException:
+                self._record_request(request_start, 'timeout')
+                error = "Request timeout - WhatsApp API did not respond in time"
+            except httpx.HTTPError as e:
+                self._record_request(request_start, 'network_error')
+                error = f"Network error: {str(e)}"
+            else:
+                self._record_request(request_start, response.status_code)
+                try:
+                    response_data = response.json()
+                except ValueError:
+                    response_data = {}
+                result = self._parse_response(response.status_code, response_data)
+                throttled = result.get("throttled", False)
+                if not throttled and response.status_code < 500:
+                    return result
+                if result.get("pair_rate_limited"):
+                    result["retry_after"] = retry_after_seconds(response.headers)
+                    return result
+                error = result["error"] if response_data else f"WhatsApp API returned {response.status_code}"
+                retry_after = retry_after_seconds(response.headers)
+            
+            if attempt + 1 < max_attempts:
+                metrics.increment('whatsapp_retries_total')
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        
+        return {
+            "success": False,
+            "error": error,
+            "message_id": None,
+            "throttled": throttled,
+            "transient": not throttled,
+            "retry_after": retry_after
+        }
+    
+    def create_client(self):
+        """httpx.AsyncClient with this sender's credentials and a connection pool sized to max_concurrency."""
+        import httpx
+        
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(headers=self._headers(), timeout=30, limits=limits)
+    
+    async def send_batch_messages_async(self, messages_data, order=None, on_result=None, template=None):
+        """
+        Send multiple messages concurrently.
+        
+        Args:
+            messages_data (list): List of dicts with 'phone' and 'message' keys
+            order: Optional sending order (input positions), as in send_batch_messages
+            on_result (callable): Called as on_result(index, result) after each message
+            template (dict): Optional template to send instead, as in send_batch_messages
+            
+        Returns:
+            list: List of results for each message, in input order
+        """
+        if not self.is_configured():
+            error = "WhatsApp API not configured. Please add WHATSAPP_ACCESS_TOKEN and WHATSAPP_PHONE_NUMBER_ID to your environment variables."
+            return [
+                {"lead_name": data.get('lead_name', f"Lead {i+1}"), "success": False, "error": error, "message_id": None}
+                for i, data in enumerate(messages_data)
+            ]
+        
+        results = [None] * len(messages_data)
+        validation = self._preflight(messages_data)
+        valid, reasons, regions = (validation[column].to_numpy() for column in ('valid', 'reason', 'region'))
+        pending = iter(order if order is not None else range(len(messages_data)))
+        sent_records = []
+        
+        async def worker(client):
+            # Workers share one iterator, so sends start in the requested order
+            for i in pending:
+                data = messages_data[i]
+                lead_name = data.get('lead_name', f"Lead {i+1}")
+                request = self._batch_request(data, lead_name, template)
+                
+                if request is None:
+                    metrics.increment('whatsapp_messages_sent_total', result='skipped')
+                    result = {
+                        "lead_name": lead_name,
+                        "success": False,
+                        "error": "Missing phone number" if template is not None else "Missing phone number or message",
+                        "message_id": None
+                    }
+                elif not valid[i]:
+                    result = self._invalid_result(lead_name, reasons[i])
+                else:
+                    result = self._claim_recipient(data['phone'], lead_name)
+                
+                if result is None:
+                    skeleton, values = request
+                    result = await self._send_payload_async(client, data['phone'], skeleton, region=regions[i], **values)
+                    result["lead_name"] = lead_name
+                    self._release_recipient(data['phone'], result)
+                    metrics.increment('whatsapp_messages_sent_total', result='success' if result['success'] else 'failure')
+                    if result['success'] and self.status_store is not None:
+                        sent_records.append({'message_id': result['message_id'], 'lead_name': lead_name, 'phone': data['phone']})
+                        if len(sent_records) >= STATUS_RECORD_BATCH:
+                            self.status_store.record_sent(sent_records)
+                            sent_records.clear()
+                
+                results[i] = result
+                if on_result is not None:
+                    on_result(i, result)
+        
+        async with self.create_client() as client:
+            await asyncio.gather(*(worker(client) for _ in range(min(self.max_concurrency, len(messages_data)))))
+        
+        if sent_records:
+            self.status_store.record_sent(sent_records)
+        self._save_recipient_index()
+        return results
+    
+    def send_batch_messages(self, messages_data, order=None, on_result=None, template=None):
+        """
+        Blocking wrapper around send_batch_messages_async (not for use inside a running event loop).
+        """
+        return asyncio.run(self.send_batch_messages_async(messages_data, order, on_result, template))
+
+_whatsapp_sender = None
+
 def get_whatsapp_sender():
-    """Factory function to get WhatsApp sender instance."""
-    return WhatsAppSender()
\ No newline at end of file
+    """Factory function to get the shared WhatsApp sender instance (reused across reruns)."""
+    global _whatsapp_sender
+    if _whatsapp_sender is None:
+        _whatsapp_sender = WhatsAppSender(recipient_index=get_recipient_index())
+    return _whatsapp_sender
\ No newline at end of file